@@ -0,0 +1,2 @@
+from .profiling import ProfilingMiddleware
+from .admission import AdmissionControlMiddleware
\ No newline at end of file
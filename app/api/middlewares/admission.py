@@ -0,0 +1,66 @@
+# app/api/middlewares/admission.py
+
+import logging
+from typing import List, Tuple
+
+import orjson
+
+from app.services.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI de controle de admissão. Cada prefixo de rota usa seu próprio
+    AdmissionController; acima do limite a requisição recebe 503 com Retry-After
+    imediatamente, antes mesmo de o corpo ser lido.
+    """
+
+    def __init__(self, app, routes: List[Tuple[str, AdmissionController]]):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        controller = self._controller_for(scope["path"])
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not controller.try_acquire():
+            await self._reject(send, controller)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
+
+    def _controller_for(self, path: str):
+        for prefix, controller in self.routes:
+            if path.startswith(prefix):
+                return controller
+        return None
+
+    async def _reject(self, send, controller: AdmissionController) -> None:
+        retry_after = controller.retry_after()
+        logger.debug("Requisição recusada pelo controle de admissão '%s' (%s em andamento, limite %s).",
+                       controller.name, controller.in_flight, controller.limit)
+        body = orjson.dumps({
+            "status": "error",
+            "detail": "Serviço sobrecarregado, tente novamente mais tarde.",
+        })
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
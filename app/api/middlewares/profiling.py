@@ -0,0 +1,123 @@
+# app/api/middlewares/profiling.py
+
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import time
+from typing import Optional, Sequence
+
+from app.observability.loop_lag import loop_lag_monitor
+from app.observability.profiling import request_deferred_profile
+from app.observability.stages import start_stage_collection
+
+try:
+    from pyinstrument import Profiler
+except ImportError: # pyinstrument é opcional; sem ele só o log de requisições lentas funciona
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que:
+    - perfila a requisição com o pyinstrument (amostragem) quando o cabeçalho
+      `X-Profile-Token` confere com o token configurado ou quando a taxa de
+      amostragem sorteia a requisição, gravando o perfil HTML em `output_dir`;
+    - loga requisições acima de `slow_threshold_ms` com o tempo de cada etapa
+      e o atraso recente do event loop.
+
+    Nas rotas de `dispatched_prefixes` o processamento roda em uma task do dispatcher
+    particionado, que o pyinstrument não seguiria a partir da requisição (o perfil mostraria só
+    a espera no `submit`). Nelas o pedido de profiling vai pelo contexto copiado para o trabalho
+    despachado, que é perfilado na própria task; requisições que não chegam ao dispatcher (ex: o
+    caminho rápido dos postbacks não concluídos) não geram perfil.
+
+    Só deve ser registrado quando alguma das funções estiver ligada, assim o
+    caminho da requisição não paga nada quando o recurso está desabilitado.
+    """
+
+    def __init__(self,
+                 app,
+                 header_token: str = "",
+                 sample_rate: float = 0.0,
+                 output_dir: str = "/tmp/webhook-profiles",
+                 slow_threshold_ms: float = 0.0,
+                 dispatched_prefixes: Sequence[str] = ()):
+        self.app = app
+        self.dispatched_prefixes = tuple(dispatched_prefixes)
+        self.header_token = header_token.encode("utf-8")
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.slow_threshold_ms = slow_threshold_ms
+        self.profiling_available = Profiler is not None and (bool(header_token) or sample_rate > 0)
+
+        if Profiler is None and (header_token or sample_rate > 0):
+            logger.warning("pyinstrument não está instalado; o profiling de requisições ficará desabilitado.")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        deferred = None
+        if self.profiling_available and self._should_profile(scope):
+            if scope["path"].startswith(self.dispatched_prefixes):
+                deferred = request_deferred_profile()
+            else:
+                profiler = self._start_profiler(scope)
+        timings = start_stage_collection() if self.slow_threshold_ms > 0 else None
+        start = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if profiler is not None:
+                profiler.stop()
+                await asyncio.to_thread(self._store_profile, profiler, scope, elapsed_ms)
+            elif deferred is not None and deferred.profiler is not None:
+                await asyncio.to_thread(self._store_profile, deferred.profiler, scope, elapsed_ms, "-dispatched")
+
+            if timings is not None and elapsed_ms > self.slow_threshold_ms:
+                stages = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items())
+                logger.warning(
+                    "Requisição lenta: %s %s levou %.1fms. Etapas: [%s]. Atraso do event loop: último=%.1fms, máx. recente=%.1fms",
+                    scope["method"], scope["path"], elapsed_ms, stages or "sem etapas registradas",
+                    loop_lag_monitor.last_lag_ms, loop_lag_monitor.recent_max_lag_ms,
+                )
+
+    def _should_profile(self, scope) -> bool:
+        if self.header_token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.header_token):
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start_profiler(self, scope) -> Optional["Profiler"]:
+        profiler = Profiler(async_mode="enabled")
+        try:
+            profiler.start()
+        except RuntimeError as e: # Outro profiler já ativo neste contexto
+            logger.debug("Profiling ignorado para %s: %s", scope["path"], e)
+            return None
+        return profiler
+
+    def _store_profile(self, profiler, scope, elapsed_ms: float, suffix: str = "") -> None:
+        safe_path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        file_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{safe_path}-{elapsed_ms:.0f}ms{suffix}.html"
+        file_path = os.path.join(self.output_dir, file_name)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            logger.info("Perfil da requisição %s %s gravado em %s", scope["method"], scope["path"], file_path)
+        except OSError as e:
+            logger.error("Erro ao gravar o perfil da requisição em %s: %s", file_path, e)
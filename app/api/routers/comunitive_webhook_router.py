@@ -1,68 +1,189 @@
 # app/api/endpoints/notifications.py
 
 import logging
+import time
 import traceback
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+
 from app.services.slack import send_slack_message
-from app.api.schemas.scorm_postback import ScormRegistrationPostback
+from app.api.schemas.scorm_postback import (
+    ScormRegistrationPostback,
+    ScormPostbackCompletionProbe,
+    inline_json_schema,
+    is_completed,
+)
 
 from app.usecases.process_scorm_postback import (
     ProcessScormPostbackUseCase,
+    not_completed_response,
     MappingNotFoundError,
     ComunitiveNotificationError,
-    ScormPostbackProcessingError
+    ScormPostbackProcessingError,
+    DeadlineExceededError
 )
 from app.services.gcs_mapper import gcs_mapper
+from app.services.postback_event import PostbackEvent
 from app.services.comunitive import notificacao_curso
+from app.services.comunitive_batch import comunitive_batch_notifier
+from app.services.traffic_capture import traffic_capture
+from app.services.inflight import inflight_tracker
+from app.services.admission import postback_admission
+from app.services.event_log import completion_event_log
+from app.services.delivery_history import delivery_history
+from app.services.course_stats import course_stats
+from app.services.dispatcher import postback_dispatcher, postback_partition_key, PartitionQueueFullError
+from app.services.dead_letter import dead_letters
+from app.settings import settings
+from app.observability.log_config import log_context
+from app.observability.deadline import Deadline
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/notifications", tags=["Comunitive Webhook"])
+# Destinos dos registros de entrega de cada postback concluído
+DELIVERY_EVENT_SINKS = [
+    sink.record for sink in (completion_event_log, delivery_history, course_stats) if sink is not None
+]
+# No replay da fila de mensagens mortas: as estatísticas por curso contam só postbacks recebidos
+REPLAY_EVENT_SINKS = [
+    sink.record for sink in (completion_event_log, delivery_history) if sink is not None
+]
 
-@router.post("/scorm-comunitive")
-async def receber_postback(postback_data: ScormRegistrationPostback):
-    
-    use_case = ProcessScormPostbackUseCase(
+def build_postback_use_case(event_sinks=DELIVERY_EVENT_SINKS, slack_messenger=None) -> ProcessScormPostbackUseCase:
+    """Use case com as dependências de produção (também usado no replay da fila de mensagens mortas)."""
+    return ProcessScormPostbackUseCase(
         gcs_mapper=gcs_mapper,
-        slack_messenger=send_slack_message,
-        comunitive_notifier=notificacao_curso
+        slack_messenger=slack_messenger or send_slack_message,
+        comunitive_notifier=comunitive_batch_notifier or notificacao_curso,
+        downstream_latency_observer=postback_admission.observe_downstream_latency,
+        event_sinks=event_sinks
     )
 
+router = APIRouter(prefix="/notifications", tags=["Comunitive Webhook"], default_response_class=ORJSONResponse)
+
+# O corpo é validado manualmente a partir dos bytes; isto mantém o schema documentado no OpenAPI
+POSTBACK_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": inline_json_schema(ScormRegistrationPostback)}},
+    }
+}
+
+async def capture_postback(request: Request) -> None:
+    """Grava o corpo bruto do postback quando a captura de tráfego está habilitada."""
+    if traffic_capture is not None:
+        traffic_capture.record(await request.body(), arrived_at=time.time())
+
+def read_completion_status(body: bytes) -> Optional[ScormPostbackCompletionProbe]:
+    """
+    Lê apenas activityDetails.activityCompletion do corpo bruto. Retorna None se o corpo
+    não tiver esse formato; nesse caso a validação completa produz o erro 422 adequado.
+    """
+    try:
+        probe = ScormPostbackCompletionProbe.model_validate_json(body)
+    except ValidationError:
+        return None
+    return probe if probe.activityDetails is not None else None
+
+def parse_postback(body: bytes) -> ScormRegistrationPostback:
+    """Valida o postback direto dos bytes JSON, com o mesmo formato de erro 422 do FastAPI."""
+    try:
+        return ScormRegistrationPostback.model_validate_json(body)
+    except ValidationError as e:
+        errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=body)
+
+@router.post("/scorm-comunitive", dependencies=[Depends(capture_postback)], openapi_extra=POSTBACK_OPENAPI)
+async def receber_postback(request: Request):
+    # O prazo total começa a contar na chegada: inclui a espera na fila do dispatcher
+    deadline = Deadline(settings.POSTBACK_DEADLINE_SECONDS) if settings.POSTBACK_DEADLINE_SECONDS > 0 else None
+    body = await request.body()
+
+    # Caminho rápido: a maioria dos postbacks são atualizações intermediárias de progresso,
+    # confirmadas sem montar o grafo completo do ScormRegistrationPostback.
+    probe = read_completion_status(body)
+    if probe is not None and not is_completed(probe.activityDetails.activityCompletion):
+        return ORJSONResponse(not_completed_response(probe.activityDetails.activityCompletion))
+
+    # Convertido uma única vez no evento compacto: o grafo Pydantic não fica retido na fila do dispatcher
+    event = PostbackEvent.from_postback(parse_postback(body))
+
+    # Falhas vão para a fila de mensagens mortas com o corpo original, para replay
+    event_sinks = DELIVERY_EVENT_SINKS if dead_letters is None else [*DELIVERY_EVENT_SINKS, dead_letters.sink_for(body)]
+    use_case = build_postback_use_case(event_sinks)
+
+    with log_context(registration_id=event.registration_id, course_id=event.course_id):
+        async with inflight_tracker.track(body):
+            if postback_dispatcher is None:
+                return ORJSONResponse(await _process_postback(use_case, event, deadline))
+
+            # Postbacks da mesma chave (aluno ou registro) são entregues em ordem; chaves diferentes, em paralelo
+            try:
+                response = await postback_dispatcher.submit(
+                    postback_partition_key(event), lambda: _process_postback(use_case, event, deadline), label=event.course_id
+                )
+            except PartitionQueueFullError as e:
+                logger.warning("Postback recusado: %s", e)
+                return ORJSONResponse(
+                    {"status": "error", "detail": "Serviço sobrecarregado, tente novamente mais tarde."},
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(postback_admission.retry_after())},
+                )
+            return ORJSONResponse(response)
+
+async def _process_postback(use_case: ProcessScormPostbackUseCase,
+                            event: PostbackEvent,
+                            deadline: Optional[Deadline] = None):
     try:
-        response = await use_case.execute(postback_data)
+        response = await use_case.execute(event, deadline=deadline)
         return response
     
+    except DeadlineExceededError as e:
+        # Sem alerta ao Slack: o postback fica na fila de mensagens mortas e o SCORM Cloud reenvia
+        logger.error("Postback abandonado: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Prazo do postback esgotado na etapa {e.stage}."
+        )
     except MappingNotFoundError as e:
-        logger.warning(f"Erro de mapeamento no postback SCORM: {e}")
-        return {
-            "status": "warning",
-            "detail": f"Postback recebido, mas sem mapeamento para Comunitive para o curso {e.course_id}. {e.message}"
-        }
+        logger.warning("Erro de mapeamento no postback SCORM: %s", e)
+        if dead_letters is not None:
+            # Guardado na fila de mensagens mortas para replay depois de mapear o curso: basta um aviso
+            return {
+                "status": "warning",
+                "detail": f"Postback recebido, mas sem mapeamento para Comunitive para o curso {e.course_id}. {e.message}"
+            }
+        # Sem a fila, responde 500 para o SCORM Cloud reenviar. O Slack já foi avisado na busca do mapeamento.
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Postback recebido, mas sem mapeamento para Comunitive para o curso {e.course_id}. {e.message}"
+        )
     except ComunitiveNotificationError as e:
-        logger.error(f"Erro ao notificar Comunitive via webhook: {e}")
-        send_slack_message(f"❌ ERRO: Falha ao notificar Comunitive na URI `{e.uri}`. Status: `{e.status_code}`. Detalhes: `{e.detail}`")
+        logger.error("Erro ao notificar Comunitive via webhook: %s", e)
+        await use_case.send_alert(f"❌ ERRO: Falha ao notificar Comunitive na URI `{e.uri}`. Status: `{e.status_code}`. Detalhes: `{e.detail}`", deadline)
         raise HTTPException(
             status_code=e.status_code if e.status_code >= 400 else status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao enviar dados para o webhook da Comunitive: {e.detail}"
         )
     except ScormPostbackProcessingError as e:
-        logger.error(f"Erro no processamento do postback SCORM: {e}")
-        send_slack_message(f"🚨 ERRO INESPERADO: No processamento do postback SCORM: `{e.message}`. Original: `{e.original_exception}`")
+        logger.error("Erro no processamento do postback SCORM: %s", e)
+        await use_case.send_alert(f"🚨 ERRO INESPERADO: No processamento do postback SCORM: `{e.message}`. Original: `{e.original_exception}`", deadline)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro interno no processamento do postback SCORM: {e.message}"
         )
     except Exception as ex:
         tb = traceback.format_exc()
-        logger.error(f"Erro geral e não tratado no webhook /scorm-comunitive: {ex}\n{tb}")
+        logger.error("Erro geral e não tratado no webhook /scorm-comunitive: %s\n%s", ex, tb)
         
         debug_info = f"Erro geral no webhook /scorm-comunitive:\n{ex}\n{tb}\n"
-        if 'postback_data' in locals() and postback_data:
-            debug_info += f"Payload recebido (validado): {postback_data.model_dump(indent=4)}"
-        else:
-            debug_info += "Payload não pôde ser validado ou está ausente."
+        debug_info += f"Postback recebido (validado): {event.to_dict()}"
         
-        send_slack_message(debug_info)
+        await use_case.send_alert(debug_info, deadline)
         
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno no servidor: {ex}")
     
\ No newline at end of file
@@ -0,0 +1,25 @@
+# app/api/routers/health_router.py
+
+from fastapi import APIRouter, status
+from fastapi.responses import ORJSONResponse
+
+from app.observability.health import health_monitor
+
+router = APIRouter(tags=["Health"], default_response_class=ORJSONResponse)
+
+@router.get("/healthz")
+async def liveness():
+    """
+    Liveness: o processo está de pé e o event loop responde. Não depende de GCS nem da Comunitive.
+    """
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readiness():
+    """
+    Readiness: 200 depois que os mapeamentos foram carregados e o pool HTTP inicializado; 503 antes disso.
+    Informa o último estado conhecido de cada dependência, sem chamá-las a cada sonda.
+    """
+    snapshot = health_monitor.snapshot()
+    status_code = status.HTTP_200_OK if health_monitor.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return ORJSONResponse(snapshot, status_code=status_code)
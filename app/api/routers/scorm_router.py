@@ -1,8 +1,24 @@
 # app/api/routers/scorm_router.py
 
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, status, Depends
-from app.api.schemas.scorm_data import ScormCourseLinkList, ScormCourseConfiguration
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from app.api.schemas.scorm_data import ScormCourseLinkList, ScormCourseConfiguration, ScormRoutingRuleList
+from app.services.routing import RULES_KEY
+from app.api.schemas.delivery_history import DeliveryHistoryPage
+from app.services.delivery_history import delivery_history, DeliveryHistoryError, InvalidCursorError
+from app.api.schemas.course_stats import CourseStatsResponse
+from app.services.course_stats import course_stats, CourseStatsError
+from app.services.dispatcher import postback_dispatcher
+from app.services.comunitive_batch import comunitive_batch_notifier
+from app.observability.deadline import deadline_metrics
+from app.api.schemas.dead_letter import DeadLetterPage, DeadLetterReplayRequest, DeadLetterReplay
+from app.services.dead_letter import dead_letters, DeadLetterError, InvalidDeadLetterCursorError
+from app.services.delivery_events import OUTCOMES
+from app.usecases.replay_dead_letters import ReplayDeadLettersUseCase
+from app.api.routers.comunitive_webhook_router import build_postback_use_case, REPLAY_EVENT_SINKS
 from app.services.gcs_mapper import gcs_mapper, GCSMapperError
 from app.settings import settings
 from app.services.slack import send_slack_message
@@ -14,6 +30,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/scorm", tags=["SCORM Webhook Configuration"])
 
+# Replays em andamento neste worker (referência forte até terminarem; cancelados no shutdown)
+replay_tasks: set = set()
+
 def get_scorm_service() -> ScormService:
     return ScormService(settings_obj=settings, slack_messenger=send_slack_message)
 
@@ -67,15 +86,48 @@ async def update_course_links(
 ):
     logger.info(f"Requisição para atualizar vínculos SCORM recebida do usuário: {current_user.username}.")
     
-    mappings = {link.course_id: str(link.comunitive_webhook_uri) for link in course_links.links}
+    # Um único destino continua gravado como string, no formato original do arquivo
+    mappings = {
+        link.course_id: link.destinations[0] if len(link.destinations) == 1 else link.destinations
+        for link in course_links.links
+    }
 
     try:
-        await gcs_mapper.update_mapping(mappings)
-        return {"status": "success", "detail": "Vínculos atualizados com sucesso no GCS."}
+        # As regras de roteamento não fazem parte dos vínculos e são preservadas pelo armazenamento
+        await gcs_mapper.replace_links(mappings)
+        return {"status": "success", "detail": f"Vínculos atualizados com sucesso em {gcs_mapper.backend.name}."}
     
     except GCSMapperError as e:
-        logger.error(f"Erro ao salvar vínculos no GCS: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao salvar dados no GCS: {e}")
+        logger.error(f"Erro ao salvar vínculos em {gcs_mapper.backend.name}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao salvar dados em {gcs_mapper.backend.name}: {e}")
+
+@router.put("/rules")
+async def update_routing_rules(
+    routing_rules: ScormRoutingRuleList,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Substitui as regras de roteamento (prefixo, glob, tags e versão do curso), mantendo os vínculos exatos.
+    Esta rota requer autenticação JWT.
+    """
+    logger.info("Requisição para atualizar %s regra(s) de roteamento recebida do usuário %s.", len(routing_rules.rules), current_user.username)
+
+    rules = [
+        {
+            **rule.model_dump(exclude_none=True, exclude_defaults=True, exclude={"destinations"}),
+            "destinations": [str(uri) for uri in rule.destinations],
+        }
+        for rule in routing_rules.rules
+    ]
+
+    try:
+        # Altera só a chave das regras (no SQLite, um upsert de uma linha)
+        await gcs_mapper.upsert_mappings({RULES_KEY: rules or None})
+        return {"status": "success", "detail": f"{len(rules)} regra(s) de roteamento salvas em {gcs_mapper.backend.name}."}
+
+    except GCSMapperError as e:
+        logger.error("Erro ao salvar regras de roteamento em %s: %s", gcs_mapper.backend.name, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao salvar dados em {gcs_mapper.backend.name}: {e}")
 
 @router.get("/data")
 async def get_course_links(
@@ -88,5 +140,210 @@ async def get_course_links(
         return mappings
     
     except GCSMapperError as e:
-        logger.error(f"Erro ao carregar vínculos do GCS: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao carregar dados do GCS: {e}")
+        logger.error(f"Erro ao carregar vínculos de {gcs_mapper.backend.name}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro interno ao carregar dados de {gcs_mapper.backend.name}: {e}")
+
+
+@router.get("/deliveries", response_model=DeliveryHistoryPage)
+async def get_delivery_history(
+    learner_id: Optional[str] = Query(default=None, description="ID (e-mail) do aluno"),
+    course_id: Optional[str] = Query(default=None, description="ID do curso no SCORM Cloud"),
+    outcome: Optional[str] = Query(default=None, description="delivered, partial, no_mapping, comunitive_error ou error"),
+    since: Optional[str] = Query(default=None, description="Data de conclusão mínima (ISO 8601, inclusiva)"),
+    until: Optional[str] = Query(default=None, description="Data de conclusão máxima (ISO 8601, exclusiva)"),
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None, description="`next_cursor` da página anterior"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Consulta o histórico de entregas à Comunitive, da conclusão mais recente para a mais antiga.
+    Esta rota requer autenticação JWT.
+    """
+    logger.info("Consulta ao histórico de entregas pelo usuário %s (aluno=%s, curso=%s).", current_user.username, learner_id, course_id)
+
+    if delivery_history is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Histórico de entregas desabilitado (DELIVERY_HISTORY_ENABLED).")
+    if outcome is not None and outcome not in OUTCOMES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"outcome inválido: {outcome}. Use um de: {', '.join(OUTCOMES)}.")
+
+    try:
+        return await asyncio.to_thread(
+            delivery_history.query,
+            learner_id=learner_id,
+            course_id=course_id,
+            outcome=outcome,
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DeliveryHistoryError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/stats", response_model=CourseStatsResponse)
+async def get_course_stats(
+    course_id: Optional[str] = Query(default=None, description="ID do curso; ausente retorna todos os cursos"),
+    since: Optional[date] = Query(default=None, description="Primeiro dia (data de conclusão), inclusivo"),
+    until: Optional[date] = Query(default=None, description="Último dia (data de conclusão), inclusivo"),
+    by_day: bool = Query(default=False, description="Uma linha por curso e dia em vez de por curso"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Estatísticas das conclusões por curso: aprovações, pontuação e tempo registrado.
+    Lidas dos agregados por curso/dia (atualizados a cada COURSE_STATS_CHECKPOINT_SECONDS).
+    Esta rota requer autenticação JWT.
+    """
+    logger.info("Consulta às estatísticas por curso pelo usuário %s (curso=%s).", current_user.username, course_id)
+
+    if course_stats is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estatísticas por curso desabilitadas (COURSE_STATS_ENABLED).")
+
+    try:
+        courses = await asyncio.to_thread(
+            course_stats.query,
+            course_id=course_id,
+            since=since.isoformat() if since else None,
+            until=until.isoformat() if until else None,
+            by_day=by_day,
+        )
+        return {"courses": courses}
+
+    except CourseStatsError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/dispatcher")
+async def get_dispatcher_state(
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Profundidade da fila de cada partição do dispatcher deste worker, com as chaves (alunos)
+    e cursos com mais postbacks pendentes, para identificar alunos ou cursos "quentes".
+    Esta rota requer autenticação JWT.
+    """
+    if postback_dispatcher is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dispatcher particionado desabilitado (DISPATCH_PARTITIONS=0).")
+    return postback_dispatcher.snapshot()
+
+@router.get("/deadlines")
+async def get_deadline_metrics(
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Postbacks com prazo iniciados neste worker e quantos estouraram o prazo em cada etapa
+    (queue, mapping_lookup, comunitive_notify, slack), além dos alertas ao Slack descartados.
+    Esta rota requer autenticação JWT.
+    """
+    return {"deadline_seconds": settings.POSTBACK_DEADLINE_SECONDS, **deadline_metrics.snapshot()}
+
+@router.get("/comunitive-batches")
+async def get_comunitive_batches(
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    Lotes enviados à Comunitive por este worker: quantidade, conclusões por lote e chamadas
+    idênticas agrupadas na mesma janela. Esta rota requer autenticação JWT.
+    """
+    if comunitive_batch_notifier is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notificação em lotes desabilitada (COMUNITIVE_NOTIFIER=webhook).")
+    return {"window_seconds": comunitive_batch_notifier.window_seconds, **comunitive_batch_notifier.snapshot()}
+
+@router.get("/dead-letters", response_model=DeadLetterPage)
+async def get_dead_letters(
+    course_id: Optional[str] = Query(default=None, description="ID do curso no SCORM Cloud"),
+    webhook_uri: Optional[str] = Query(default=None, description="URI da Comunitive que falhou"),
+    error_type: Optional[str] = Query(default=None, description="no_mapping, comunitive_error, error ou partial"),
+    state: Optional[str] = Query(default="pending", description="pending, replaying ou resolved"),
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None, description="`next_cursor` da página anterior"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lista os postbacks concluídos que não chegaram à Comunitive, do mais recente para o mais antigo.
+    Esta rota requer autenticação JWT.
+    """
+    logger.info("Consulta à fila de mensagens mortas pelo usuário %s (curso=%s, uri=%s).", current_user.username, course_id, webhook_uri)
+
+    if dead_letters is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fila de mensagens mortas desabilitada (DEAD_LETTER_ENABLED).")
+
+    try:
+        return await asyncio.to_thread(
+            dead_letters.query,
+            course_id=course_id,
+            webhook_uri=webhook_uri,
+            error_type=error_type,
+            state=state,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    except InvalidDeadLetterCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DeadLetterError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+def _replay_slack_messenger(message: str) -> None:
+    """As mensagens por postback do replay ficam só no log; o Slack recebe apenas o resumo."""
+    logger.debug("Replay: %s", message)
+
+@router.post("/dead-letters/replay", status_code=status.HTTP_202_ACCEPTED, response_model=DeadLetterReplay)
+async def replay_dead_letters(
+    replay_request: DeadLetterReplayRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reenvia à Comunitive, em segundo plano, as mensagens pendentes que casam com os filtros,
+    com concorrência e taxa limitadas. O progresso é consultado em /scorm/dead-letters/replay/{id}.
+    Esta rota requer autenticação JWT.
+    """
+    if dead_letters is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fila de mensagens mortas desabilitada (DEAD_LETTER_ENABLED).")
+
+    filters = replay_request.model_dump(include={"ids", "course_id", "webhook_uri", "error_type"}, exclude_none=True)
+    use_case = ReplayDeadLettersUseCase(
+        store=dead_letters,
+        use_case_factory=lambda event_sinks: build_postback_use_case(event_sinks, slack_messenger=_replay_slack_messenger),
+        event_sinks=REPLAY_EVENT_SINKS,
+        concurrency=replay_request.concurrency or settings.DEAD_LETTER_REPLAY_CONCURRENCY,
+        rate_per_second=(
+            replay_request.rate_per_second if replay_request.rate_per_second is not None
+            else settings.DEAD_LETTER_REPLAY_RATE_PER_SECOND
+        ),
+        dispatcher=postback_dispatcher,
+    )
+
+    try:
+        letters = await use_case.claim(filters, limit=replay_request.limit)
+        replay_id = await asyncio.to_thread(dead_letters.create_replay, filters, current_user.username, len(letters))
+    except DeadLetterError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    logger.info("Replay %s de %s mensagem(ns) morta(s) solicitado pelo usuário %s.", replay_id, len(letters), current_user.username)
+    task = asyncio.create_task(use_case.execute(replay_id, letters), name=f"dead-letter-replay-{replay_id}")
+    replay_tasks.add(task)
+    task.add_done_callback(replay_tasks.discard)
+
+    return await asyncio.to_thread(dead_letters.get_replay, replay_id)
+
+@router.get("/dead-letters/replay/{replay_id}", response_model=DeadLetterReplay)
+async def get_dead_letter_replay(
+    replay_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Progresso de um replay (de qualquer worker).
+    Esta rota requer autenticação JWT.
+    """
+    if dead_letters is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fila de mensagens mortas desabilitada (DEAD_LETTER_ENABLED).")
+
+    try:
+        replay = await asyncio.to_thread(dead_letters.get_replay, replay_id)
+    except DeadLetterError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if replay is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Replay {replay_id} não encontrado.")
+    return replay
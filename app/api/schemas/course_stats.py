@@ -0,0 +1,35 @@
+# app/api/schemas/course_stats.py
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ScoreBucket(BaseModel):
+    range: str # Ex: "70-79"
+    count: int
+
+class ScoreStats(BaseModel):
+    count: int # Conclusões com pontuação
+    mean: Optional[float] = None
+    histogram: List[ScoreBucket]
+
+class TimeTrackedStats(BaseModel):
+    """
+    Percentis de totalSecondsTracked, estimados por um sketch com erro relativo de até 2%.
+    """
+    count: int
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+class CourseStats(BaseModel):
+    course_id: str
+    day: Optional[str] = None # Presente apenas com by_day=true
+    completions: int
+    passed: int
+    failed: int
+    pass_rate: Optional[float] = None # passed / (passed + failed)
+    score: ScoreStats
+    time_tracked_seconds: TimeTrackedStats
+
+class CourseStatsResponse(BaseModel):
+    courses: List[CourseStats]
@@ -0,0 +1,55 @@
+# app/api/schemas/dead_letter.py
+
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class DeadLetterItem(BaseModel):
+    """
+    Um postback concluído que não chegou (ou chegou só em parte) à Comunitive.
+    """
+    id: int
+    registration_id: str
+    course_id: str
+    learner_id: str
+    error_type: str # "no_mapping", "comunitive_error", "error" ou "partial"
+    failed_uris: List[str]
+    status_code: Optional[int] = None
+    reason: Optional[str] = None
+    attempts: int
+    state: str # "pending", "replaying" ou "resolved"
+    first_failed_at: float # Epoch (segundos)
+    last_failed_at: float
+    resolved_at: Optional[float] = None
+
+class DeadLetterPage(BaseModel):
+    """
+    Uma página de resultados; `next_cursor` é passado como `cursor` para obter a próxima.
+    """
+    items: List[DeadLetterItem]
+    next_cursor: Optional[str] = None
+
+class DeadLetterReplayRequest(BaseModel):
+    """
+    Filtros das mensagens pendentes a reenviar; sem filtros, reenvia as mais antigas até `limit`.
+    """
+    ids: Optional[List[int]] = None
+    course_id: Optional[str] = None
+    webhook_uri: Optional[str] = None
+    error_type: Optional[str] = None
+    limit: int = Field(default=1000, ge=1, le=50000)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=200)
+    rate_per_second: Optional[float] = Field(default=None, ge=0)
+
+class DeadLetterReplay(BaseModel):
+    """
+    Estado de um replay: "running", "finished" ou "failed" (interrompido).
+    """
+    id: str
+    state: str
+    requested_by: Optional[str] = None
+    filters: dict
+    total: int
+    succeeded: int
+    failed: int
+    created_at: float
+    finished_at: Optional[float] = None
@@ -0,0 +1,30 @@
+# app/api/schemas/delivery_history.py
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+class DeliveryHistoryItem(BaseModel):
+    """
+    Uma entrega registrada: o postback concluído e o resultado da notificação à Comunitive.
+    """
+    id: int
+    registration_id: str
+    course_id: str
+    course_version: Optional[int] = None
+    learner_id: str
+    outcome: str # "delivered", "no_mapping", "comunitive_error" ou "error"
+    registration_success: Optional[str] = None
+    completed_date: str
+    score: Optional[float] = None
+    webhook_uri: Optional[str] = None
+    comunitive_status: Optional[int] = None
+    comunitive_latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    occurred_at: float # Epoch (segundos) do processamento
+
+class DeliveryHistoryPage(BaseModel):
+    """
+    Uma página de resultados; `next_cursor` é passado como `cursor` para obter a próxima.
+    """
+    items: List[DeliveryHistoryItem]
+    next_cursor: Optional[str] = None
@@ -1,7 +1,7 @@
 # app/schemas/scorm_data.py
 
-from pydantic import BaseModel, HttpUrl
-from typing import List
+from pydantic import BaseModel, ConfigDict, HttpUrl, model_validator
+from typing import List, Optional
 
 class ScormCourseConfiguration(BaseModel):
     """
@@ -11,10 +11,23 @@ class ScormCourseConfiguration(BaseModel):
 
 class ScormCourseLink(BaseModel):
     """
-    Representa o mapeamento de um ID de curso SCORM para uma URI de webhook da Comunitive.
+    Representa o mapeamento de um ID de curso SCORM para uma ou mais URIs de webhook da Comunitive.
+    Use `comunitive_webhook_uri` para um único destino ou `comunitive_webhook_uris` para vários.
     """
     course_id: str
-    comunitive_webhook_uri: HttpUrl # HttpUrl garante que a URI seja uma URL válida
+    comunitive_webhook_uri: Optional[HttpUrl] = None # HttpUrl garante que a URI seja uma URL válida
+    comunitive_webhook_uris: List[HttpUrl] = []
+
+    @model_validator(mode="after")
+    def check_destinations(self) -> "ScormCourseLink":
+        if not self.destinations:
+            raise ValueError("Informe comunitive_webhook_uri ou comunitive_webhook_uris.")
+        return self
+
+    @property
+    def destinations(self) -> List[str]:
+        uris = ([self.comunitive_webhook_uri] if self.comunitive_webhook_uri else []) + self.comunitive_webhook_uris
+        return list(dict.fromkeys(str(uri) for uri in uris))
 
 class ScormCourseLinkList(BaseModel):
     """
@@ -22,3 +35,33 @@ class ScormCourseLinkList(BaseModel):
     que atualiza múltiplos vínculos de uma vez.
     """
     links: List[ScormCourseLink]
+
+class ScormRoutingRule(BaseModel):
+    """
+    Regra de roteamento usada quando o curso não tem uma chave exata no mapeamento.
+    Todas as condições informadas precisam casar; vence a regra de maior `priority` (no empate, a primeira da lista).
+    Exige ao menos uma condição: uma regra sem condição casaria com qualquer curso sem chave exata.
+    """
+    model_config = ConfigDict(extra="forbid") # Campo desconhecido (ex: "prefix") não pode virar uma regra sem condição
+
+    course_id: Optional[str] = None
+    course_id_prefix: Optional[str] = None # Ex: "onboarding-"
+    course_id_glob: Optional[str] = None # Ex: "seguranca-*-v?"
+    tags: List[str] = [] # O postback precisa ter todas
+    course_version: Optional[int] = None
+    priority: int = 0
+    destinations: List[HttpUrl]
+
+    @model_validator(mode="after")
+    def check_destinations(self) -> "ScormRoutingRule":
+        if not self.destinations:
+            raise ValueError("Informe ao menos um destino em destinations.")
+        if not (self.course_id or self.course_id_prefix or self.course_id_glob or self.tags or self.course_version is not None):
+            raise ValueError("Informe ao menos uma condição: course_id, course_id_prefix, course_id_glob, tags ou course_version.")
+        return self
+
+class ScormRoutingRuleList(BaseModel):
+    """
+    Lista completa de regras de roteamento; substitui as regras atuais.
+    """
+    rules: List[ScormRoutingRule]
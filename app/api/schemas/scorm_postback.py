@@ -34,6 +34,18 @@ class ActivityDetailsModel(BaseModel):
     staticProperties: Optional[dict] = None # Se precisar de mais detalhes, crie um modelo para isso
     activityProgress: Optional[ActivityProgressModel] = None # Adicionado para a estrutura do score
 
+def is_completed(completion_status: Optional[str]) -> bool:
+    """Indica se o status de conclusão (activityCompletion) é "completed"."""
+    return bool(completion_status) and completion_status.lower() == "completed"
+
+# Modelos mínimos para o pré-check de conclusão: só leem activityDetails.activityCompletion
+# e ignoram o restante do payload, sem montar o grafo completo de modelos.
+class _ActivityCompletionProbe(BaseModel):
+    activityCompletion: Optional[str] = None
+
+class ScormPostbackCompletionProbe(BaseModel):
+    activityDetails: Optional[_ActivityCompletionProbe] = None
+
 # Modelo principal para o postback
 class ScormRegistrationPostback(BaseModel):
     id: str
@@ -71,8 +83,33 @@ class ScormRegistrationPostback(BaseModel):
         
         return 0
 
+    @property
+    def has_pontuacao(self) -> bool:
+        """Indica se o postback traz alguma pontuação (raw ou scaled); sem ela `processed_pontuacao` é 0."""
+        progress = self.activityDetails.activityProgress if self.activityDetails else None
+        score = progress.score if progress else None
+        return score is not None and (score.raw is not None or score.scaled is not None)
+
     @property
     def learner_full_name(self) -> str:
         first = self.learner.firstName or ''
         last = self.learner.lastName or ''
         return f"{first} {last}".strip()
+
+
+def inline_json_schema(model: type[BaseModel]) -> dict:
+    """JSON Schema do modelo com as definições aninhadas ($defs) expandidas, para uso no OpenAPI."""
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref and ref.startswith("#/$defs/"):
+                return resolve(definitions[ref.split("/")[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(item) for item in node]
+        return node
+
+    return resolve(schema)
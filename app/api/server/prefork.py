@@ -0,0 +1,34 @@
+# app/api/server/prefork.py
+
+"""
+Hooks usados pelo gunicorn.conf.py com `preload_app = True`.
+
+A aplicação é importada uma vez no processo master (schemas Pydantic, rotas e o hash bcrypt
+da senha do admin ficam prontos) e os workers herdam esse estado por fork. O cache de
+mapeamentos também é carregado antes do fork. Conexões de rede e threads não podem ser
+compartilhadas entre processos, então o cliente GCS e as conexões SQLite do mapeamento são
+descartados antes do fork e o logging é
+reiniciado em cada worker.
+"""
+
+import asyncio
+import logging
+
+from app.google_cloud_storage.conn_cloud_storage import storage as gcs_storage
+from app.observability.log_config import reset_logging_after_fork
+from app.services.gcs_mapper import gcs_mapper
+
+logger = logging.getLogger(__name__)
+
+
+def warm_shared_state() -> None:
+    """Executado no master antes de criar os workers."""
+    mappings = asyncio.run(gcs_mapper.load_mappings(force_reload=True))
+    logger.info("Cache de mapeamentos pré-carregado antes do fork: %s curso(s).", len(mappings))
+    gcs_storage.reset_client()
+    gcs_mapper.backend.close()
+
+
+def reinitialize_after_fork() -> None:
+    """Executado em cada worker logo após o fork."""
+    reset_logging_after_fork()
@@ -1,14 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.observability.log_config import setup_logging
+setup_logging() # Antes dos demais imports, para que os logs de inicialização já passem pela fila
+
 from fastapi import FastAPI
 from app.api.routers.comunitive_webhook_router import router as webhook_router
-from app.api.routers.scorm_router import router as scorm_router
+from app.api.routers.scorm_router import router as scorm_router, replay_tasks
 from app.api.routers.authentication_router import router as authentication_router
+from app.api.routers.health_router import router as health_router
+from app.api.middlewares import ProfilingMiddleware, AdmissionControlMiddleware
+from app.services.admission import postback_admission, admin_admission
+from app.observability.loop_lag import loop_lag_monitor
+from app.services.traffic_capture import traffic_capture
+from app.services.inflight import inflight_tracker
+from app.services.event_log import completion_event_log
+from app.services.delivery_history import delivery_history
+from app.services.course_stats import course_stats
+from app.services.dispatcher import postback_dispatcher
+from app.services.dead_letter import dead_letters
+from app.services.gcs_mapper import gcs_mapper
+from app.services.comunitive import start_http_client, close_http_client
+from app.services.comunitive_batch import comunitive_batch_notifier
+from app.observability.health import health_monitor
+from app.settings import settings
+
+LOCAL_STORES = [store for store in (completion_event_log, delivery_history, course_stats, dead_letters) if store is not None]
+
+async def start_local_stores() -> str:
+    """Cria os bancos locais e inicia as threads de gravação (em paralelo, fora do event loop)."""
+    # O log de eventos também recupera e envia segmentos deixados por execuções anteriores
+    await asyncio.gather(*(asyncio.to_thread(store.start) for store in LOCAL_STORES))
+    return f"{len(LOCAL_STORES)} armazenamento(s) local(is) iniciado(s)"
 
-app = FastAPI()
+health_monitor.register("mapping", gcs_mapper.check_health)
+health_monitor.register("http_pool", start_http_client)
+health_monitor.register("local_stores", start_local_stores, required=False)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SLOW_REQUEST_THRESHOLD_MS > 0:
+        loop_lag_monitor.interval = settings.LOOP_LAG_INTERVAL_SECONDS
+        loop_lag_monitor.start()
+    # Warm-up: mapeamentos (cliente do GCS + carga + compilação), pool HTTP e bancos locais, em paralelo
+    await health_monitor.warm_up(timeout=settings.STARTUP_WARMUP_TIMEOUT_SECONDS)
+    health_monitor.start(interval=settings.HEALTH_CHECK_INTERVAL_SECONDS)
+    yield
+    await health_monitor.stop()
+    await inflight_tracker.wait_until_idle(timeout=2.0)
+    for task in list(replay_tasks):
+        task.cancel() # O que não foi reenviado volta a ficar pendente na fila
+    if replay_tasks:
+        await asyncio.gather(*replay_tasks, return_exceptions=True)
+    if postback_dispatcher is not None:
+        await postback_dispatcher.stop()
+    await loop_lag_monitor.stop()
+    if traffic_capture is not None:
+        traffic_capture.close()
+    if completion_event_log is not None:
+        completion_event_log.close()
+    if delivery_history is not None:
+        delivery_history.close()
+    if course_stats is not None:
+        course_stats.close()
+    if dead_letters is not None:
+        dead_letters.close()
+    if comunitive_batch_notifier is not None:
+        await comunitive_batch_notifier.close() # Envia o lote em aberto antes de fechar o pool HTTP
+    await close_http_client()
+    inflight_tracker.close()
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(health_router)
 app.include_router(authentication_router)
 app.include_router(scorm_router)
 app.include_router(webhook_router)
 
+if settings.ADMISSION_MAX_INFLIGHT_POSTBACKS > 0:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        routes=[
+            ("/notifications/", postback_admission),
+            ("/auth/", admin_admission),
+            ("/scorm/", admin_admission),
+        ],
+    )
+
+# Registrado apenas quando habilitado, para não adicionar custo ao caminho da requisição
+if settings.PROFILING_ENABLED or settings.SLOW_REQUEST_THRESHOLD_MS > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        header_token=settings.PROFILING_HEADER_TOKEN if settings.PROFILING_ENABLED else "",
+        sample_rate=settings.PROFILING_SAMPLE_RATE if settings.PROFILING_ENABLED else 0.0,
+        output_dir=settings.PROFILING_OUTPUT_DIR,
+        slow_threshold_ms=settings.SLOW_REQUEST_THRESHOLD_MS,
+        # Com o dispatcher, os postbacks são processados fora da task da requisição
+        dispatched_prefixes=("/notifications/scorm-comunitive",) if postback_dispatcher is not None else (),
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Bem-vindo à API de Integrações SCORM!"}
\ No newline at end of file
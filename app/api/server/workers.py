@@ -0,0 +1,33 @@
+# app/api/server/workers.py
+
+import logging
+
+from uvicorn_worker import UvicornWorker
+
+from app.settings import settings
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """
+    Worker do gunicorn para produção: uvloop + httptools e desligamento coordenado.
+
+    Com `timeout_graceful_shutdown` o uvicorn para de aceitar conexões, aguarda as
+    requisições em andamento e, ao fim do prazo, cancela as restantes (que são então
+    persistidas pelo InFlightTracker) antes de executar o shutdown do lifespan.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "timeout_graceful_shutdown": settings.DRAIN_TIMEOUT_SECONDS,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # O UvicornWorker liga os loggers do uvicorn aos handlers do gunicorn;
+        # devolvemos para o root logger, que escreve pela fila de logging.
+        for name in ("uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
@@ -10,6 +10,7 @@ from fastapi.security import OAuth2PasswordBearer
 
 from app.api.schemas.authentication import User
 from app.settings import settings
+from app.observability.stages import track_stage
 
 # --- Configuração de Hashing de Senha ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -62,7 +63,9 @@ async def authenticate_user(email: str, password: str) -> Optional[User]:
     user = await get_user_by_email(email)
     if not user:
         return None
-    if not verify_password(password, ADMIN_USER_PASSWORD_HASHED):
+    with track_stage("bcrypt_verify"):
+        password_ok = verify_password(password, ADMIN_USER_PASSWORD_HASHED)
+    if not password_ok:
         return None
     return user
 
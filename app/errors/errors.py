@@ -26,3 +26,11 @@ class ScormPostbackProcessingError(UseCaseError):
         self.message = message
         self.original_exception = original_exception
         super().__init__(self.message)
+
+class DeadlineExceededError(UseCaseError):
+    """Raised when the postback's total deadline runs out before a stage can finish."""
+    def __init__(self, stage: str, budget_seconds: float, message: str = "Prazo do postback esgotado."):
+        self.stage = stage
+        self.budget_seconds = budget_seconds
+        self.message = message
+        super().__init__(f"{self.message} Etapa: {self.stage}. Prazo total: {self.budget_seconds:.1f}s")
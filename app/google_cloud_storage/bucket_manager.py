@@ -9,9 +9,8 @@ from tempfile import mkdtemp
 from .conn_cloud_storage import GoogleCloudStorage, storage as storage_client
 from google.cloud import storage
 from google.cloud.storage import Bucket
+from app.settings import settings
 
-# Configuração básica do logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class BucketManager:
@@ -20,16 +19,16 @@ class BucketManager:
     """
     
     def __init__(self, bucket_name: str, google_cloud_storage: GoogleCloudStorage = storage_client) -> None:
-        self.__gcs_client = google_cloud_storage.client
+        self.__google_cloud_storage = google_cloud_storage # O cliente é obtido sob demanda
         self.bucket_name = bucket_name
-        logger.info(f"Inicializando GCSBucketManager para o bucket: {bucket_name}")
+        logger.debug("Inicializando GCSBucketManager para o bucket: %s", bucket_name)
         
     def __get_bucket(self) -> storage.Bucket: # Tipo de retorno Storage.Bucket
-        logger.info(f"Obtendo bucket: {self.bucket_name}")
-        return self.__gcs_client.bucket(bucket_name=self.bucket_name)
+        logger.debug("Obtendo bucket: %s", self.bucket_name)
+        return self.__google_cloud_storage.client.bucket(bucket_name=self.bucket_name)
     
     def download_blob(self, blob_name: str, file_name: Optional[str] = None) -> str:
-        logger.info(f"Fazendo download do blob: {blob_name}")
+        logger.debug("Fazendo download do blob: %s", blob_name)
         bucket = self.__get_bucket()
         blob = bucket.blob(blob_name=blob_name)
         
@@ -38,34 +37,34 @@ class BucketManager:
         file_path = os.path.join(temp_dir, file_name if file_name is not None else blob_name)
         
         try:
-            blob.download_to_filename(file_path) # Usa download_to_filename para garantir o arquivo local
-            logger.info(f"Blob {blob_name} baixado para {file_path}")
+            blob.download_to_filename(file_path, timeout=settings.GCS_TIMEOUT_SECONDS) # Usa download_to_filename para garantir o arquivo local
+            logger.debug("Blob %s baixado para %s", blob_name, file_path)
             return file_path
         
         except Exception as e:
-            logger.error(f"Erro ao baixar o blob {blob_name} para {file_path}: {e}")
+            logger.error("Erro ao baixar o blob %s para %s: %s", blob_name, file_path, e)
             raise
     
     def upload_blob(self, source_file_name: str, destination_blob_name: str) -> None:
-        logger.info(f"Fazendo upload do arquivo: {source_file_name} para blob: {destination_blob_name}")
+        logger.debug("Fazendo upload do arquivo: %s para blob: %s", source_file_name, destination_blob_name)
         bucket = self.__get_bucket()
         blob = bucket.blob(destination_blob_name)
 
         try:
-            blob.upload_from_filename(source_file_name)
-            logger.info(f"Arquivo {source_file_name} enviado para {destination_blob_name}")
+            blob.upload_from_filename(source_file_name, timeout=settings.GCS_TIMEOUT_SECONDS)
+            logger.debug("Arquivo %s enviado para %s", source_file_name, destination_blob_name)
         
         except Exception as e:
-            logger.error(f"Erro ao fazer upload de arquivo {source_file_name} para {destination_blob_name}: {e}")
+            logger.error("Erro ao fazer upload de arquivo %s para %s: %s", source_file_name, destination_blob_name, e)
             raise
         
     def get_latest_file_content(self) -> Optional[BytesIO]:
-        logger.info("Recuperando conteúdo do arquivo mais recente no bucket")
+        logger.debug("Recuperando conteúdo do arquivo mais recente no bucket")
         bucket = self.__get_bucket()
         blobs = list(bucket.list_blobs())
 
         if not blobs:
-            logger.info("Nenhum blob encontrado no bucket")
+            logger.debug("Nenhum blob encontrado no bucket")
             return None
 
         # Ordena os blobs pela data de criação, do mais recente ao mais antigo
@@ -73,7 +72,7 @@ class BucketManager:
 
         # Pega o blob mais recente
         latest_blob = blobs[0]
-        logger.info(f"Blob mais recente encontrado: {latest_blob.name}")
+        logger.debug("Blob mais recente encontrado: %s", latest_blob.name)
 
         # Baixa o conteúdo do blob para um BytesIO
         file_content = BytesIO()
@@ -82,7 +81,7 @@ class BucketManager:
             file_content.seek(0)  # Reseta o ponteiro do BytesIO para o início
             return file_content
         except Exception as e:
-            logger.error(f"Erro ao baixar o conteúdo do blob mais recente {latest_blob.name}: {e}")
+            logger.error("Erro ao baixar o conteúdo do blob mais recente %s: %s", latest_blob.name, e)
             return None
 
     # --- NOVOS MÉTODOS PARA GCSMapper ---
@@ -93,21 +92,21 @@ class BucketManager:
         :param blob_name: Nome do blob no GCS.
         :return: String contendo o conteúdo do blob, ou None se o blob não for encontrado/erro.
         """
-        logger.info(f"Lendo blob '{blob_name}' como texto.")
+        logger.debug("Lendo blob '%s' como texto.", blob_name)
         bucket = self.__get_bucket()
         blob = bucket.blob(blob_name)
 
-        if not blob.exists():
-            logger.warning(f"Blob '{blob_name}' não encontrado no bucket '{self.bucket_name}'.")
+        if not blob.exists(timeout=settings.GCS_TIMEOUT_SECONDS):
+            logger.warning("Blob '%s' não encontrado no bucket '%s'.", blob_name, self.bucket_name)
             return None
         
         try:
-            content = blob.download_as_string().decode('utf-8')
-            logger.info(f"Blob '{blob_name}' lido com sucesso.")
+            content = blob.download_as_string(timeout=settings.GCS_TIMEOUT_SECONDS).decode('utf-8')
+            logger.debug("Blob '%s' lido com sucesso.", blob_name)
             return content
         
         except Exception as e:
-            logger.error(f"Erro ao ler blob '{blob_name}' como texto: {e}")
+            logger.error("Erro ao ler blob '%s' como texto: %s", blob_name, e)
             return None
 
     def upload_string_to_blob(self, content: str, destination_blob_name: str, content_type: Optional[str] = None) -> None:
@@ -119,14 +118,14 @@ class BucketManager:
         :param content_type: Tipo de conteúdo (ex: "application/json").
         :raises Exception: Se ocorrer um erro durante o upload.
         """
-        logger.info(f"Fazendo upload de string para blob: {destination_blob_name}")
+        logger.debug("Fazendo upload de string para blob: %s", destination_blob_name)
         bucket = self.__get_bucket()
         blob = bucket.blob(destination_blob_name)
 
         try:
-            blob.upload_from_string(content, content_type=content_type)
-            logger.info(f"String enviada para {destination_blob_name} com sucesso.")
+            blob.upload_from_string(content, content_type=content_type, timeout=settings.GCS_TIMEOUT_SECONDS)
+            logger.debug("String enviada para %s com sucesso.", destination_blob_name)
         
         except Exception as e:
-            logger.error(f"Erro ao fazer upload de string para {destination_blob_name}: {e}")
+            logger.error("Erro ao fazer upload de string para %s: %s", destination_blob_name, e)
             raise
\ No newline at end of file
@@ -1,13 +1,12 @@
 # app/google_cloud_storage/conn_cloud_storage.py
 
 import logging
+import threading
 from typing import Any, Optional
 from google.cloud import storage
 import os
 from app.settings import settings
 
-# Configuração básica do logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GoogleCloudStorage:
@@ -23,10 +22,26 @@ class GoogleCloudStorage:
 
     def __init__(self) -> None:
         """
-        Inicializa o cliente do Google Cloud Storage.
+        Prepara o singleton. O cliente do Google Cloud Storage só é criado no primeiro uso,
+        assim importar a aplicação não exige credenciais nem acesso à rede.
         """
-        if not hasattr(self, 'client'):
-            self.client = self.__get_cloud_storage_client()
+        if not hasattr(self, '_client'):
+            self._client = None
+            self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Cliente do Google Cloud Storage, criado sob demanda."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.__get_cloud_storage_client()
+        return self._client
+
+    def reset_client(self) -> None:
+        """Descarta o cliente atual (ex: antes de um fork); um novo é criado no próximo uso."""
+        with self._client_lock:
+            self._client = None
 
     def __get_cloud_storage_client(self):
         """
@@ -48,7 +63,7 @@ class GoogleCloudStorage:
                 return storage.Client.from_service_account_info(settings.SERVICE_ACCOUNT_DATA)
         
         except Exception as e:
-            logger.error(f"Erro ao criar o cliente do Google Cloud Storage: {e}")
+            logger.error("Erro ao criar o cliente do Google Cloud Storage: %s", e)
             raise
         
 storage = GoogleCloudStorage()
@@ -0,0 +1,80 @@
+# app/observability/deadline.py
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Dict
+
+from app.errors import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineMetrics:
+    """Contadores dos prazos dos postbacks, por etapa, expostos em /scorm/deadlines."""
+
+    def __init__(self):
+        self.started = 0
+        self.overruns: Counter = Counter() # Etapa -> postbacks que estouraram o prazo nela
+        self.skipped_alerts = 0 # Mensagens ao Slack abandonadas por falta de prazo
+
+    def record_overrun(self, stage: str) -> None:
+        self.overruns[stage] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "overruns": dict(self.overruns),
+            "total_overruns": sum(self.overruns.values()),
+            "skipped_alerts": self.skipped_alerts,
+        }
+
+
+deadline_metrics = DeadlineMetrics()
+
+
+class Deadline:
+    """
+    Prazo total de um postback, criado quando a requisição chega e repassado a cada etapa
+    (fila do dispatcher, consulta ao mapeamento, notificação à Comunitive, Slack). Cada etapa
+    recebe o que sobrou do prazo; os clientes de GCS, Comunitive e Slack têm ainda seus próprios
+    timeouts, para que nenhuma chamada fique presa mesmo sem prazo (ex: no replay).
+    """
+    __slots__ = ("budget", "expires_at")
+
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+        deadline_metrics.started += 1
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str) -> None:
+        """Levanta DeadlineExceededError (e conta o estouro) se o prazo já acabou."""
+        if self.expired:
+            self.overrun(stage)
+
+    def overrun(self, stage: str) -> None:
+        deadline_metrics.record_overrun(stage)
+        logger.warning("Prazo de %.1fs do postback esgotado na etapa '%s'.", self.budget, stage)
+        raise DeadlineExceededError(stage=stage, budget_seconds=self.budget)
+
+    async def run(self, stage: str, awaitable: Awaitable[Any]) -> Any:
+        """
+        Aguarda `awaitable` dentro do prazo restante. Se não terminar a tempo, ela é cancelada
+        (o trabalho é abandonado) e DeadlineExceededError é levantada.
+        """
+        if self.expired:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close() # Nem chega a começar
+            self.overrun(stage)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            self.overrun(stage)
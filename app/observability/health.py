@@ -0,0 +1,144 @@
+# app/observability/health.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HealthCheck = Callable[[], Awaitable[Optional[str]]]
+
+
+class DependencyStatus:
+    """Último resultado conhecido de uma dependência (GCS, pool HTTP, Comunitive...)."""
+    __slots__ = ("name", "required", "ok", "detail", "checked_at", "latency_ms", "ever_ok")
+
+    def __init__(self, name: str, required: bool):
+        self.name = name
+        self.required = required
+        self.ok: Optional[bool] = None # None: ainda não verificada
+        self.detail: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self.ever_ok = False
+
+    def update(self, ok: bool, detail: Optional[str] = None, latency_ms: Optional[float] = None) -> None:
+        self.ok = ok
+        self.detail = detail
+        self.checked_at = time.time()
+        self.latency_ms = latency_ms
+        self.ever_ok = self.ever_ok or ok
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "required": self.required,
+            "detail": self.detail,
+            "checked_at": self.checked_at,
+            "latency_ms": self.latency_ms,
+        }
+
+
+class HealthMonitor:
+    """
+    Estado das dependências para /readyz, mantido em memória: a sonda só lê este estado,
+    nunca chama GCS ou Comunitive.
+
+    - Verificações ativas (`register`) rodam todas em paralelo no warm-up e depois a cada
+      `interval` segundos em segundo plano.
+    - Dependências passivas (`observe`) são atualizadas pelo próprio tráfego, ex: o resultado
+      das chamadas à Comunitive.
+
+    A instância fica pronta quando todas as verificações obrigatórias passaram pelo menos uma
+    vez; uma falha posterior aparece no relatório, mas não a tira do balanceamento (o cache
+    de mapeamentos continua servindo).
+    """
+
+    def __init__(self):
+        self.dependencies: Dict[str, DependencyStatus] = {}
+        self._checks: Dict[str, HealthCheck] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+
+    def register(self, name: str, check: HealthCheck, required: bool = True) -> None:
+        """Registra uma verificação ativa; ela retorna um detalhe opcional ou levanta exceção."""
+        self._checks[name] = check
+        self.dependencies.setdefault(name, DependencyStatus(name, required))
+
+    def observe(self, name: str, ok: bool, detail: Optional[str] = None, latency_ms: Optional[float] = None) -> None:
+        """Atualiza uma dependência passiva (não obrigatória para a prontidão)."""
+        status = self.dependencies.get(name)
+        if status is None:
+            status = self.dependencies[name] = DependencyStatus(name, required=False)
+        status.update(ok, detail, latency_ms)
+
+    @property
+    def ready(self) -> bool:
+        if self.ready_at is not None:
+            return True
+        if all(status.ever_ok for status in self.dependencies.values() if status.required):
+            self.ready_at = time.time()
+            logger.info("Instância pronta em %.2fs.", self.ready_at - self.started_at)
+            return True
+        return False
+
+    async def run_checks(self) -> bool:
+        """Executa todas as verificações ativas em paralelo; retorna a prontidão."""
+        await asyncio.gather(*(self._run_check(name, check) for name, check in self._checks.items()))
+        return self.ready
+
+    async def _run_check(self, name: str, check: HealthCheck) -> None:
+        status = self.dependencies[name]
+        started = time.perf_counter()
+        try:
+            detail = await check()
+        except Exception as e:
+            status.update(False, str(e) or type(e).__name__, round((time.perf_counter() - started) * 1000, 2))
+            logger.warning("Verificação de saúde '%s' falhou: %s", name, e)
+            return
+        status.update(True, detail, round((time.perf_counter() - started) * 1000, 2))
+
+    async def warm_up(self, timeout: float) -> bool:
+        """
+        Verificações iniciais, em paralelo, com prazo. Se o prazo estourar a aplicação sobe
+        mesmo assim e /readyz responde 503 até a verificação periódica ter sucesso.
+        """
+        try:
+            return await asyncio.wait_for(self.run_checks(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up não concluído em %ss; a instância ainda não está pronta.", timeout)
+            return False
+
+    def start(self, interval: float) -> None:
+        """Inicia as verificações periódicas em segundo plano."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(interval), name="health-monitor")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            # Antes de ficar pronta, tenta de novo com mais frequência
+            await asyncio.sleep(interval if self.ready else min(interval, 2.0))
+            await self.run_checks()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "dependencies": {name: status.to_dict() for name, status in self.dependencies.items()},
+        }
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,160 @@
+# app/observability/log_config.py
+
+import atexit
+import json
+import logging
+import queue
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.settings import settings
+
+# IDs de correlação da requisição atual (ex: registration_id, course_id).
+_correlation_ids: ContextVar[Dict[str, str]] = ContextVar("correlation_ids", default={})
+
+# Atributos padrão de um LogRecord, usados para separar os campos extras (logger.info(..., extra={...}))
+_RESERVED_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation", "color_message"}
+
+_listener: Optional[QueueListener] = None
+
+
+@contextmanager
+def log_context(**ids):
+    """
+    Adiciona IDs de correlação a todos os logs emitidos dentro do bloco.
+    Valores None são ignorados.
+    """
+    merged = {**_correlation_ids.get(), **{k: str(v) for k, v in ids.items() if v is not None}}
+    token = _correlation_ids.set(merged)
+    try:
+        yield
+    finally:
+        _correlation_ids.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON, incluindo IDs de correlação e campos extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "correlation", {}))
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato texto para desenvolvimento local, com os IDs de correlação ao final da linha."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        correlation = getattr(record, "correlation", None)
+        if correlation:
+            line += " " + " ".join(f"{k}={v}" for k, v in correlation.items())
+        return line
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que apenas enfileira o registro no caminho da requisição.
+
+    Diferente do QueueHandler padrão, não formata a mensagem ao enfileirar: a formatação
+    (lazy, `logger.info("... %s", valor)`) acontece na thread do QueueListener. Se a fila
+    estiver cheia o registro é descartado em vez de bloquear o event loop.
+    """
+
+    dropped: int = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation = _correlation_ids.get()
+        if record.exc_info and not record.exc_text:
+            # O traceback referencia frames vivos; formata agora para liberá-los
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def _parse_module_levels(spec: str) -> Dict[str, str]:
+    """Converte "app.google_cloud_storage=WARNING,app.services=DEBUG" em um dicionário."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    Configura o logging da aplicação uma única vez: o root logger recebe um
+    NonBlockingQueueHandler e uma thread de fundo (QueueListener) faz a escrita em stdout.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT.lower() == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # Os logs do uvicorn passam pela mesma fila em vez de escrever direto no stderr
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    for name, level in _parse_module_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def reset_logging_after_fork() -> None:
+    """
+    Recria a fila e a thread de escrita em um processo filho (workers do gunicorn com
+    preload_app): a thread do QueueListener não sobrevive ao fork.
+    """
+    global _listener
+    _listener = None
+    setup_logging()
+
+
+def shutdown_logging() -> None:
+    """Esvazia a fila e encerra a thread de escrita dos logs."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,55 @@
+# app/observability/loop_lag.py
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    Mede o atraso do event loop: uma tarefa dorme por `interval` segundos e registra
+    quanto tempo a mais levou para acordar. Atrasos altos indicam chamadas síncronas
+    (GCS, Slack, bcrypt) bloqueando o loop.
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 20):
+        self.interval = interval
+        self.last_lag_ms: float = 0.0
+        self._recent = deque(maxlen=window) # Últimas amostras, para o máximo recente
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def recent_max_lag_ms(self) -> float:
+        """Maior atraso observado nas últimas `window` amostras."""
+        return max(self._recent, default=0.0)
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self.last_lag_ms = lag_ms
+            self._recent.append(lag_ms)
+
+
+loop_lag_monitor = LoopLagMonitor()
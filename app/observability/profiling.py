@@ -0,0 +1,53 @@
+# app/observability/profiling.py
+
+from contextvars import Context, ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+try:
+    from pyinstrument import Profiler
+except ImportError: # pyinstrument é opcional
+    Profiler = None
+
+
+class DeferredProfile:
+    """Pedido de profiling repassado ao trabalho do dispatcher; recebe o profiler ao final."""
+    __slots__ = ("profiler",)
+
+    def __init__(self):
+        self.profiler = None
+
+
+# Pedido de profiling da requisição atual. O dispatcher copia o contexto de quem enviou o
+# trabalho, então o pedido chega à task da partição, onde o processamento de fato acontece.
+_deferred_profile: ContextVar[Optional[DeferredProfile]] = ContextVar("deferred_profile", default=None)
+
+
+def request_deferred_profile() -> DeferredProfile:
+    """Pede que os trabalhos despachados a partir do contexto atual sejam perfilados."""
+    request = DeferredProfile()
+    _deferred_profile.set(request)
+    return request
+
+
+def deferred_profile_requested(context: Context) -> bool:
+    """Indica se o contexto copiado de um trabalho pediu profiling (custa só uma consulta)."""
+    return Profiler is not None and context.get(_deferred_profile) is not None
+
+
+async def run_profiled(factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Executa `factory()` com um profiler do pyinstrument iniciado na própria task (o modo
+    assíncrono segue só a task onde o profiler começou) e o entrega ao pedido do contexto.
+    """
+    request = _deferred_profile.get()
+    profiler = Profiler(async_mode="enabled")
+    try:
+        profiler.start()
+    except RuntimeError: # Outro profiler já ativo neste contexto
+        return await factory()
+    try:
+        return await factory()
+    finally:
+        profiler.stop()
+        if request is not None:
+            request.profiler = profiler
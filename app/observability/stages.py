@@ -0,0 +1,39 @@
+# app/observability/stages.py
+
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Dicionário de tempos por etapa da requisição atual. Fica None quando nenhuma
+# coleta está ativa, o que faz `track_stage` custar apenas um ContextVar.get().
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+_NO_OP_STAGE = nullcontext()
+
+
+@contextmanager
+def _timed_stage(timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start)
+
+
+def track_stage(name: str):
+    """
+    Mede o tempo gasto em uma etapa (ex: "mapping_lookup", "comunitive_notify")
+    se a requisição atual estiver coletando tempos; caso contrário não faz nada.
+    """
+    timings = _stage_timings.get()
+    if timings is None:
+        return _NO_OP_STAGE
+    return _timed_stage(timings, name)
+
+
+def start_stage_collection() -> Dict[str, float]:
+    """Ativa a coleta de tempos por etapa para o contexto atual e retorna o dicionário."""
+    timings: Dict[str, float] = {}
+    _stage_timings.set(timings)
+    return timings
@@ -0,0 +1,97 @@
+# app/services/admission.py
+
+import logging
+import random
+from typing import Optional
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """
+    Limita quantas requisições de um grupo ficam em processamento ao mesmo tempo.
+
+    `try_acquire` nunca espera: acima do limite a requisição deve ser recusada na hora
+    (503 + Retry-After), em vez de enfileirar e degradar todas as demais. No modo adaptativo
+    o limite segue um AIMD sobre a latência observada da Comunitive: cresce de 1 em 1
+    enquanto a média móvel fica abaixo do alvo e cai 10% quando passa dele.
+    """
+
+    def __init__(self,
+                 name: str,
+                 limit: int,
+                 adaptive: bool = False,
+                 min_limit: int = 1,
+                 target_latency_ms: float = 1000.0,
+                 retry_after_seconds: int = 5):
+        self.name = name
+        self.max_limit = limit
+        self.limit = limit
+        self.adaptive = adaptive
+        self.min_limit = max(1, min(min_limit, limit))
+        self.target_latency_s = target_latency_ms / 1000
+        self.retry_after_seconds = retry_after_seconds
+
+        self.in_flight = 0
+        self.rejected = 0
+        self.latency_ewma_s: Optional[float] = None
+        self._observations = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos no Retry-After, com jitter para espalhar as novas tentativas."""
+        return self.retry_after_seconds + random.randint(0, self.retry_after_seconds)
+
+    def observe_downstream_latency(self, seconds: float) -> None:
+        """Registra a latência de uma chamada à Comunitive (usado apenas no modo adaptativo)."""
+        if not self.adaptive:
+            return
+        self.latency_ewma_s = seconds if self.latency_ewma_s is None else 0.8 * self.latency_ewma_s + 0.2 * seconds
+        self._observations += 1
+        if self._observations % 10:
+            return
+
+        previous = self.limit
+        if self.latency_ewma_s > self.target_latency_s:
+            self.limit = max(self.min_limit, int(self.limit * 0.9))
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+        if self.limit != previous:
+            logger.info("Limite de admissão '%s' ajustado de %s para %s (latência média da Comunitive: %.0fms).",
+                        self.name, previous, self.limit, self.latency_ewma_s * 1000)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "latency_ewma_ms": round(self.latency_ewma_s * 1000, 1) if self.latency_ewma_s is not None else None,
+        }
+
+
+# Capacidade separada para os postbacks e para os endpoints administrativos autenticados,
+# assim um pico de postbacks nunca consome a capacidade reservada ao /auth e /scorm.
+postback_admission = AdmissionController(
+    name="postbacks",
+    limit=settings.ADMISSION_MAX_INFLIGHT_POSTBACKS,
+    adaptive=settings.ADMISSION_ADAPTIVE,
+    min_limit=settings.ADMISSION_MIN_INFLIGHT_POSTBACKS,
+    target_latency_ms=settings.ADMISSION_TARGET_LATENCY_MS,
+    retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS,
+)
+admin_admission = AdmissionController(
+    name="admin",
+    limit=settings.ADMISSION_ADMIN_RESERVED,
+    retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS,
+)
@@ -1,11 +1,49 @@
 # app/services/comunitive.py
+import asyncio
 import logging
+import time
+from typing import Optional
 from fastapi import HTTPException
 from app.services.slack import send_slack_message
+from app.observability.health import health_monitor
+from app.settings import settings
 import httpx
 
 logger = logging.getLogger(__name__)
 
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Pool de conexões HTTP compartilhado pelas chamadas à Comunitive (reaproveita conexões e
+    handshakes TLS). Criado no warm-up ou no primeiro uso, um por event loop.
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            timeout=settings.COMUNITIVE_HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.COMUNITIVE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.COMUNITIVE_HTTP_MAX_CONNECTIONS,
+            ),
+        )
+        _http_client_loop = loop
+    return _http_client
+
+async def start_http_client() -> str:
+    """Inicializa o pool HTTP (warm-up da prontidão)."""
+    get_http_client()
+    return f"pool HTTP pronto (até {settings.COMUNITIVE_HTTP_MAX_CONNECTIONS} conexões)"
+
+async def close_http_client() -> None:
+    global _http_client, _http_client_loop
+    if _http_client is not None and _http_client_loop is asyncio.get_running_loop():
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
 async def notificacao_curso(user_email: str, comunitive_webhook_uri: str):
     """
     Envia uma notificação para a Comunitive através de um webhook.
@@ -19,40 +57,48 @@ async def notificacao_curso(user_email: str, comunitive_webhook_uri: str):
     }
     
     # Faz a chamada POST para o webhook da Comunitive
+    started = time.perf_counter()
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(comunitive_webhook_uri, json=payload)
-            
-            response.raise_for_status()  # Lança uma exceção para códigos de status 4xx e 5xx automaticamente
-
-            # Verifica a estrutura esperada da resposta
-            response_data = response.json()
-            if "id" not in response_data:
-                slack_error_message = (
-                    f"Comunitive Webhook Erro\n"
-                    f"❌ Erro ao notificar Comunitive: `{response.status_code}` - `{response.text}`\n"
-                    f"Payload enviado: {payload}"
-                )
-                send_slack_message(slack_error_message)
-                
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Resposta inválida da Comunitive: {response.status_code} - {response.text}"
-                )
+        response = await get_http_client().post(comunitive_webhook_uri, json=payload)
+        # Saúde passiva da Comunitive para /readyz: só falhas de rede e 5xx indicam indisponibilidade
+        health_monitor.observe(
+            "comunitive",
+            ok=response.status_code < 500,
+            detail=f"último status {response.status_code}",
+            latency_ms=round((time.perf_counter() - started) * 1000, 2),
+        )
+        
+        response.raise_for_status()  # Lança uma exceção para códigos de status 4xx e 5xx automaticamente
+
+        # Verifica a estrutura esperada da resposta
+        response_data = response.json()
+        if "id" not in response_data:
+            slack_error_message = (
+                f"Comunitive Webhook Erro\n"
+                f"❌ Erro ao notificar Comunitive: `{response.status_code}` - `{response.text}`\n"
+                f"Payload enviado: {payload}"
+            )
+            send_slack_message(slack_error_message)
             
-            logger.info(f"Notificação enviada para a Comunitive com sucesso para o usuário {user_email}.")
-            return {"status": "sucesso", "detalhe": "Notificação enviada à Comunitive com sucesso."}
+            raise HTTPException(
+                status_code=400,
+                detail=f"Resposta inválida da Comunitive: {response.status_code} - {response.text}"
+            )
+        
+        logger.info("Notificação enviada para a Comunitive com sucesso para o usuário %s.", user_email)
+        return {"status": "sucesso", "detalhe": "Notificação enviada à Comunitive com sucesso."}
 
     except httpx.RequestError as e:
-        logger.error(f"Erro de rede ao acessar Comunitive: {e}")
+        health_monitor.observe("comunitive", ok=False, detail=f"erro de rede: {e}")
+        logger.error("Erro de rede ao acessar Comunitive: %s", e)
         raise HTTPException(status_code=502, detail="Erro de rede ao acessar Comunitive.")
 
     except HTTPException as e:
-        logger.error(f"Erro HTTP ao notificar Comunitive: {e.detail}")
+        logger.error("Erro HTTP ao notificar Comunitive: %s", e.detail)
         raise
 
     except Exception as e:
-        logger.error(f"Erro inesperado ao notificar Comunitive: {e}")
+        logger.error("Erro inesperado ao notificar Comunitive: %s", e)
         send_slack_message(f"Erro inesperado ao notificar Comunitive: {e}")
         raise HTTPException(status_code=500, detail="Erro interno ao notificar Comunitive.")
     
\ No newline at end of file
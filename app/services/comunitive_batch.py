@@ -0,0 +1,213 @@
+# app/services/comunitive_batch.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from app.observability.health import health_monitor
+from app.services.comunitive import get_http_client
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Endpoint de lotes da API da Comunitive, relativo a COMUNITIVE_API_URL
+BATCH_PATH = "/v1/webhooks/batch"
+
+
+class _PendingCompletion:
+    """Uma conclusão aguardando o lote; chamadas iguais (usuário e URI) na mesma janela compartilham a entrada."""
+    __slots__ = ("ref", "user_email", "webhook_uri", "future", "waiters")
+
+    def __init__(self, ref: str, user_email: str, webhook_uri: str, future: asyncio.Future):
+        self.ref = ref
+        self.user_email = user_email
+        self.webhook_uri = webhook_uri
+        self.future = future
+        self.waiters = 1
+
+
+class ComunitiveBatchNotifier:
+    """
+    Notificador alternativo ao `notificacao_curso`, com a mesma assinatura, para o
+    `comunitive_notifier` do `ProcessScormPostbackUseCase`.
+
+    Em vez de um POST por conclusão e destino, junta as conclusões por até `window_seconds`
+    (ou até `max_batch_size`) e as envia em uma única chamada autenticada a
+    `{api_url}/v1/webhooks/batch`:
+
+        POST /v1/webhooks/batch  (Authorization: Bearer <COMUNITIVE_API_KEY>)
+        {"events": [{"ref": "1", "webhook_uri": "...", "payload": {"user": "..."}}, ...]}
+        -> {"results": [{"ref": "1", "status": 200, "id": "..."}, {"ref": "2", "status": 404, "error": "..."}]}
+
+    Cada chamador recebe o resultado do seu item, com os mesmos retornos e `HTTPException` do
+    webhook individual (as novas tentativas continuam com o use case). Uma falha do lote inteiro
+    (rede, 401, 429, 5xx) vale para todos os itens. Quem desistir antes do envio (ex: prazo do
+    postback) é retirado do lote.
+    """
+
+    def __init__(self, api_url: str, api_key: str, window_seconds: float = 0.05, max_batch_size: int = 100):
+        self.url = api_url.rstrip("/") + BATCH_PATH
+        self.api_key = api_key
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+
+        self.batches = 0
+        self.items = 0
+        self.coalesced = 0
+
+        self._buffer: Dict[Tuple[str, str], _PendingCompletion] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Set[asyncio.Task] = set()
+        self._next_ref = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __call__(self, user_email: str, comunitive_webhook_uri: str) -> Dict[str, Any]:
+        if not user_email or not comunitive_webhook_uri:
+            raise HTTPException(status_code=400, detail="user_email e comunitive_webhook_uri são obrigatórios.")
+        self._ensure_loop()
+
+        key = (user_email, comunitive_webhook_uri)
+        entry = self._buffer.get(key)
+        if entry is not None:
+            entry.waiters += 1
+            self.coalesced += 1
+        else:
+            self._next_ref += 1
+            entry = _PendingCompletion(str(self._next_ref), user_email, comunitive_webhook_uri, self._loop.create_future())
+            self._buffer[key] = entry
+            if len(self._buffer) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = self._loop.call_later(self.window_seconds, self._flush)
+
+        try:
+            # shield: o cancelamento de um chamador não cancela o resultado dos demais
+            return await asyncio.shield(entry.future)
+        except asyncio.CancelledError:
+            entry.waiters -= 1
+            if entry.waiters == 0 and self._buffer.get(key) is entry:
+                del self._buffer[key] # Ainda não enviado e ninguém mais espera: sai do lote
+            raise
+
+    def _ensure_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Novo event loop (ex: testes, worker recriado): o estado do anterior não vale mais
+            self._loop = loop
+            self._buffer = {}
+            self._timer = None
+            self._sending = set()
+
+    def _flush(self) -> None:
+        """Fecha o lote atual e o envia em segundo plano."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        batch = list(self._buffer.values())
+        self._buffer = {}
+        task = self._loop.create_task(self._send(batch), name="comunitive-batch")
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[_PendingCompletion]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        body = {
+            "events": [
+                {"ref": entry.ref, "webhook_uri": entry.webhook_uri, "payload": {"user": entry.user_email}}
+                for entry in batch
+            ]
+        }
+        started = time.perf_counter()
+        try:
+            response = await get_http_client().post(
+                self.url, json=body, headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        except httpx.RequestError as e:
+            health_monitor.observe("comunitive", ok=False, detail=f"erro de rede: {e}")
+            logger.error("Erro de rede ao enviar lote de %s conclusão(ões) à Comunitive: %s", len(batch), e)
+            self._fail_all(batch, HTTPException(status_code=502, detail="Erro de rede ao acessar Comunitive."))
+            return
+        except Exception as e:
+            logger.error("Erro inesperado ao enviar lote à Comunitive: %s", e)
+            self._fail_all(batch, HTTPException(status_code=500, detail="Erro interno ao notificar Comunitive."))
+            return
+
+        health_monitor.observe(
+            "comunitive",
+            ok=response.status_code < 500,
+            detail=f"último lote: {len(batch)} conclusão(ões), status {response.status_code}",
+            latency_ms=round((time.perf_counter() - started) * 1000, 2),
+        )
+        if response.status_code >= 400:
+            logger.error("Lote de %s conclusão(ões) recusado pela Comunitive: %s - %s", len(batch), response.status_code, response.text)
+            self._fail_all(batch, HTTPException(status_code=response.status_code, detail=f"Lote recusado pela Comunitive: {response.text}"))
+            return
+
+        try:
+            results = {str(item["ref"]): item for item in response.json()["results"]}
+        except Exception:
+            self._fail_all(batch, HTTPException(
+                status_code=400, detail=f"Resposta inválida da Comunitive: {response.status_code} - {response.text}"
+            ))
+            return
+
+        logger.info("Lote de %s conclusão(ões) enviado à Comunitive em %.0f ms.", len(batch), (time.perf_counter() - started) * 1000)
+        for entry in batch:
+            self._resolve(entry, results.get(entry.ref))
+
+    def _resolve(self, entry: _PendingCompletion, item: Optional[Dict[str, Any]]) -> None:
+        if item is None:
+            self._fail(entry, HTTPException(status_code=502, detail="Comunitive não retornou resultado para a notificação no lote."))
+            return
+        status_code = int(item.get("status", 500))
+        if status_code >= 400:
+            self._fail(entry, HTTPException(status_code=status_code, detail=item.get("error", "Erro ao notificar Comunitive.")))
+            return
+        if "id" not in item:
+            self._fail(entry, HTTPException(status_code=400, detail=f"Resposta inválida da Comunitive: {status_code} - {item}"))
+            return
+        if not entry.future.done():
+            entry.future.set_result({"status": "sucesso", "detalhe": "Notificação enviada à Comunitive com sucesso."})
+
+    def _fail(self, entry: _PendingCompletion, error: Exception) -> None:
+        # Sem ninguém esperando, a exceção nunca seria lida (e o asyncio avisaria no log)
+        if entry.waiters > 0 and not entry.future.done():
+            entry.future.set_exception(error)
+
+    def _fail_all(self, batch: List[_PendingCompletion], error: Exception) -> None:
+        for entry in batch:
+            self._fail(entry, error)
+
+    async def close(self) -> None:
+        """Envia o lote em aberto e aguarda os envios em andamento (desligamento)."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        self._flush()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "coalesced": self.coalesced,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._buffer),
+        }
+
+
+comunitive_batch_notifier: Optional[ComunitiveBatchNotifier] = None
+if settings.COMUNITIVE_NOTIFIER == "batch":
+    comunitive_batch_notifier = ComunitiveBatchNotifier(
+        api_url=str(settings.COMUNITIVE_API_URL),
+        api_key=settings.COMUNITIVE_API_KEY,
+        window_seconds=settings.COMUNITIVE_BATCH_WINDOW_SECONDS,
+        max_batch_size=settings.COMUNITIVE_BATCH_MAX_SIZE,
+    )
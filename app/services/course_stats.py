@@ -0,0 +1,387 @@
+# app/services/course_stats.py
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.delivery_events import DeliveryRecord, OUTCOME_DELIVERED, OUTCOME_PARTIAL
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SCORE_BUCKETS = 10 # Histograma de pontuação em faixas de 10 pontos (0-9, ..., 90-100)
+SKETCH_RELATIVE_ACCURACY = 0.02
+# Só conta como conclusão o postback entregue à Comunitive (em todos ou em parte dos destinos)
+COUNTED_OUTCOMES = (OUTCOME_DELIVERED, OUTCOME_PARTIAL)
+
+
+class CourseStatsError(Exception):
+    """Exceção customizada para erros nas estatísticas por curso."""
+    pass
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis com erro relativo limitado (no estilo DDSketch): cada valor positivo cai no
+    bucket ceil(log_gamma(x)), então inserir é O(1) e dois sketches se combinam somando os
+    contadores. Qualquer quantil estimado fica a no máximo `relative_accuracy` do valor real.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+
+    def bucket_for(self, value: float) -> int:
+        """Índice do bucket; valores <= 0 (ex: tempo não registrado) ficam no bucket 0."""
+        if value <= 1e-9:
+            return 0
+        return max(1, math.ceil(math.log(value) / self._log_gamma) + 1_000) # Deslocado para manter > 0
+
+    def value_for(self, bucket: int) -> float:
+        if bucket == 0:
+            return 0.0
+        index = bucket - 1_000
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.buckets[self.bucket_for(value)] += count
+        self.count += count
+
+    def add_bucket(self, bucket: int, count: int) -> None:
+        self.buckets[bucket] += count
+        self.count += count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return self.value_for(bucket)
+        return self.value_for(max(self.buckets))
+
+
+class _CourseDayDelta:
+    """Contadores das conclusões novas de um (curso, dia) em um checkpoint."""
+    __slots__ = ("completions", "passed", "failed", "score_count", "score_sum", "score_buckets", "time_buckets")
+
+    def __init__(self):
+        self.completions = 0
+        self.passed = 0
+        self.failed = 0
+        self.score_count = 0
+        self.score_sum = 0.0
+        self.score_buckets: Dict[int, int] = defaultdict(int)
+        self.time_buckets: Dict[int, int] = defaultdict(int)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS course_completions (
+    registration_id TEXT PRIMARY KEY, -- Uma conclusão por registro, mesmo com reenvios do SCORM Cloud
+    course_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    registration_success TEXT,
+    score REAL,
+    seconds_tracked REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS course_day_stats (
+    course_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    completions INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    score_count INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (course_id, day)
+);
+CREATE TABLE IF NOT EXISTS course_day_buckets (
+    course_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL, -- 'score' (faixa de 10 pontos) ou 'time' (bucket do QuantileSketch)
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (course_id, day, kind, bucket)
+);
+CREATE INDEX IF NOT EXISTS ix_course_day_stats_day ON course_day_stats (day);
+"""
+
+_INSERT_COMPLETION = """
+INSERT OR IGNORE INTO course_completions (registration_id, course_id, day, registration_success, score, seconds_tracked)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_STATS = """
+INSERT INTO course_day_stats (course_id, day, completions, passed, failed, score_count, score_sum)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (course_id, day) DO UPDATE SET
+    completions = completions + excluded.completions,
+    passed = passed + excluded.passed,
+    failed = failed + excluded.failed,
+    score_count = score_count + excluded.score_count,
+    score_sum = score_sum + excluded.score_sum
+"""
+
+_UPSERT_BUCKET = """
+INSERT INTO course_day_buckets (course_id, day, kind, bucket, count) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (course_id, day, kind, bucket) DO UPDATE SET count = count + excluded.count
+"""
+
+
+class CourseStatsAggregator:
+    """
+    Estatísticas por curso e por dia das conclusões: quantidade, aprovações/reprovações,
+    média e histograma da pontuação e percentis do tempo registrado (QuantileSketch).
+
+    Conta só postbacks entregues à Comunitive (`delivered` ou `partial`), uma vez por registro:
+    reenvios do SCORM Cloud, replays e novos postbacks COMPLETED do mesmo registro não somam.
+
+    Cada postback entregue só fica pendente em memória. A cada `checkpoint_seconds` uma thread
+    grava os pendentes em `course_completions` (chave primária registration_id, INSERT OR
+    IGNORE) e soma às linhas (curso, dia) apenas os registros efetivamente inseridos, na mesma
+    transação; assim os workers do gunicorn compartilham o banco sem contar um registro duas
+    vezes. As consultas leem as linhas agregadas, nunca o histórico.
+    """
+
+    def __init__(self, db_path: str, checkpoint_seconds: float = 10.0):
+        self.db_path = db_path
+        self.checkpoint_seconds = checkpoint_seconds
+        self._sketch = QuantileSketch()
+
+        self._pending: Dict[str, tuple] = {} # registration_id -> linha de course_completions
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self._connect()
+            try:
+                connection.executescript(_SCHEMA)
+            finally:
+                connection.close()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="course-stats-checkpoint", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Grava o último checkpoint e encerra a thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def record(self, record: DeliveryRecord) -> None:
+        """Guarda um postback entregue para o próximo checkpoint; os demais resultados são ignorados."""
+        if record.outcome not in COUNTED_OUTCOMES:
+            return
+        if self._thread is None:
+            self.start()
+        if record.completed_date:
+            day = record.completed_date[:10]
+        else:
+            day = datetime.fromtimestamp(record.occurred_at, tz=timezone.utc).strftime("%Y-%m-%d")
+
+        with self._pending_lock:
+            # O primeiro postback entregue do registro vale; os seguintes são reenvios
+            self._pending.setdefault(record.registration_id, (
+                record.registration_id, record.course_id, day,
+                record.registration_success, record.score, record.seconds_tracked,
+            ))
+
+    def _run(self) -> None:
+        connection = self._connect()
+        try:
+            while not self._stop.wait(self.checkpoint_seconds):
+                self.checkpoint(connection)
+            self.checkpoint(connection)
+        finally:
+            connection.close()
+
+    def checkpoint(self, connection: sqlite3.Connection) -> None:
+        """
+        Grava as conclusões pendentes e soma às linhas (curso, dia) só as que ainda não existiam,
+        em uma única transação.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        try:
+            with connection:
+                deltas: Dict[Tuple[str, str], _CourseDayDelta] = {}
+                for row in pending.values():
+                    if connection.execute(_INSERT_COMPLETION, row).rowcount:
+                        self._add(deltas, *row[1:])
+
+                stats_rows = []
+                bucket_rows = []
+                for (course_id, day), delta in deltas.items():
+                    stats_rows.append((course_id, day, delta.completions, delta.passed, delta.failed,
+                                       delta.score_count, delta.score_sum))
+                    bucket_rows.extend((course_id, day, "score", b, c) for b, c in delta.score_buckets.items())
+                    bucket_rows.extend((course_id, day, "time", b, c) for b, c in delta.time_buckets.items())
+                connection.executemany(_UPSERT_STATS, stats_rows)
+                connection.executemany(_UPSERT_BUCKET, bucket_rows)
+        except sqlite3.Error as e:
+            logger.error("Erro ao gravar checkpoint das estatísticas (%s conclusão(ões)): %s", len(pending), e)
+            self._restore(pending)
+            return
+        logger.debug("Checkpoint das estatísticas: %s conclusão(ões) nova(s) de %s pendente(s).",
+                     sum(delta.completions for delta in deltas.values()), len(pending))
+
+    def _add(self,
+             deltas: Dict[Tuple[str, str], _CourseDayDelta],
+             course_id: str,
+             day: str,
+             registration_success: Optional[str],
+             score: Optional[float],
+             seconds_tracked: Optional[float]) -> None:
+        """Soma uma conclusão nova aos contadores do seu (curso, dia)."""
+        delta = deltas.get((course_id, day))
+        if delta is None:
+            delta = deltas[(course_id, day)] = _CourseDayDelta()
+        success = (registration_success or "").upper()
+        delta.completions += 1
+        if success == "PASSED":
+            delta.passed += 1
+        elif success == "FAILED":
+            delta.failed += 1
+        if score is not None:
+            delta.score_count += 1
+            delta.score_sum += score
+            delta.score_buckets[min(SCORE_BUCKETS - 1, max(0, int(score) // 10))] += 1
+        if seconds_tracked is not None:
+            delta.time_buckets[self._sketch.bucket_for(seconds_tracked)] += 1
+
+    def _restore(self, pending: Dict[str, tuple]) -> None:
+        """Devolve um checkpoint que falhou para a memória, para a próxima tentativa."""
+        with self._pending_lock:
+            for registration_id, row in pending.items():
+                self._pending.setdefault(registration_id, row)
+
+    def query(self,
+              course_id: Optional[str] = None,
+              since: Optional[str] = None,
+              until: Optional[str] = None,
+              by_day: bool = False) -> List[Dict[str, Any]]:
+        """
+        Estatísticas agregadas por curso (ou por curso e dia, com `by_day`), para dias no
+        intervalo [since, until] (AAAA-MM-DD, inclusivos). Bloqueante: use via `asyncio.to_thread`.
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        if course_id is not None:
+            conditions.append("course_id = ?")
+            params.append(course_id)
+        if since is not None:
+            conditions.append("day >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("day <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        group = "course_id, day" if by_day else "course_id"
+        select_group = "course_id, day" if by_day else "course_id, NULL AS day"
+
+        try:
+            connection = self._reader()
+            totals = connection.execute(
+                f"SELECT {select_group}, SUM(completions) AS completions, SUM(passed) AS passed, "
+                f"SUM(failed) AS failed, SUM(score_count) AS score_count, SUM(score_sum) AS score_sum "
+                f"FROM course_day_stats {where} GROUP BY {group} ORDER BY {group}",
+                params,
+            ).fetchall()
+            buckets = connection.execute(
+                f"SELECT {select_group}, kind, bucket, SUM(count) AS count "
+                f"FROM course_day_buckets {where} GROUP BY {group}, kind, bucket",
+                params,
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Erro ao consultar as estatísticas por curso: %s", e)
+            raise CourseStatsError(f"Falha ao consultar as estatísticas por curso: {e}")
+
+        histograms: Dict[Tuple[str, Optional[str]], List[int]] = defaultdict(lambda: [0] * SCORE_BUCKETS)
+        sketches: Dict[Tuple[str, Optional[str]], QuantileSketch] = defaultdict(QuantileSketch)
+        for row in buckets:
+            key = (row["course_id"], row["day"])
+            if row["kind"] == "score":
+                histograms[key][row["bucket"]] += row["count"]
+            else:
+                sketches[key].add_bucket(row["bucket"], row["count"])
+
+        results = []
+        for row in totals:
+            key = (row["course_id"], row["day"])
+            sketch = sketches.get(key) or QuantileSketch()
+            decided = row["passed"] + row["failed"]
+            item = {
+                "course_id": row["course_id"],
+                "completions": row["completions"],
+                "passed": row["passed"],
+                "failed": row["failed"],
+                "pass_rate": round(row["passed"] / decided, 4) if decided else None,
+                "score": {
+                    "count": row["score_count"],
+                    "mean": round(row["score_sum"] / row["score_count"], 2) if row["score_count"] else None,
+                    "histogram": [
+                        {"range": f"{b * 10}-{b * 10 + 9 if b < SCORE_BUCKETS - 1 else 100}", "count": c}
+                        for b, c in enumerate(histograms[key])
+                    ],
+                },
+                "time_tracked_seconds": {
+                    "count": sketch.count,
+                    "p50": _round(sketch.quantile(0.50)),
+                    "p90": _round(sketch.quantile(0.90)),
+                    "p99": _round(sketch.quantile(0.99)),
+                },
+            }
+            if by_day:
+                item["day"] = row["day"]
+            results.append(item)
+        return results
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._thread is None:
+                self.start() # Garante o schema antes da primeira leitura
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+course_stats: Optional[CourseStatsAggregator] = None
+if settings.COURSE_STATS_ENABLED:
+    course_stats = CourseStatsAggregator(
+        db_path=settings.COURSE_STATS_DB_PATH,
+        checkpoint_seconds=settings.COURSE_STATS_CHECKPOINT_SECONDS,
+    )
@@ -0,0 +1,434 @@
+# app/services/dead_letter.py
+
+import base64
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.delivery_events import (
+    DeliveryRecord, DeliverySink,
+    OUTCOME_DELIVERED, OUTCOME_PARTIAL, OUTCOME_NO_MAPPING, OUTCOME_COMUNITIVE_ERROR, OUTCOME_ERROR,
+)
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Resultados que colocam o postback na fila de mensagens mortas
+DEAD_LETTER_OUTCOMES = frozenset((OUTCOME_PARTIAL, OUTCOME_NO_MAPPING, OUTCOME_COMUNITIVE_ERROR, OUTCOME_ERROR))
+
+STATE_PENDING = "pending" # Aguardando replay
+STATE_REPLAYING = "replaying" # Reservado por um replay em andamento
+STATE_RESOLVED = "resolved" # Entregue depois (replay ou reenvio do SCORM Cloud)
+
+# Reservas mais antigas que isto (ex: o worker morreu no meio do replay) voltam a ficar disponíveis
+CLAIM_TIMEOUT_SECONDS = 600
+
+
+class DeadLetterError(Exception):
+    """Exceção customizada para erros na fila de mensagens mortas."""
+    pass
+
+
+class InvalidDeadLetterCursorError(DeadLetterError):
+    """Cursor de paginação inválido: erro de quem consulta."""
+    pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registration_id TEXT NOT NULL UNIQUE,
+    course_id TEXT NOT NULL,
+    learner_id TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    failed_uris TEXT NOT NULL,
+    status_code INTEGER,
+    reason TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    state TEXT NOT NULL DEFAULT 'pending',
+    payload BLOB NOT NULL,
+    first_failed_at REAL NOT NULL,
+    last_failed_at REAL NOT NULL,
+    claimed_at REAL,
+    resolved_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_dead_letters_state ON dead_letters (state, id);
+CREATE INDEX IF NOT EXISTS ix_dead_letters_course ON dead_letters (course_id, state, id);
+CREATE INDEX IF NOT EXISTS ix_dead_letters_error_type ON dead_letters (error_type, state, id);
+CREATE TABLE IF NOT EXISTS dead_letter_replays (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    requested_by TEXT,
+    filters TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+"""
+
+# Uma nova falha do mesmo registro atualiza a linha existente e soma uma tentativa
+_UPSERT_FAILURE = """
+INSERT INTO dead_letters (
+    registration_id, course_id, learner_id, error_type, failed_uris, status_code, reason,
+    payload, first_failed_at, last_failed_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (registration_id) DO UPDATE SET
+    course_id = excluded.course_id,
+    error_type = excluded.error_type,
+    failed_uris = excluded.failed_uris,
+    status_code = excluded.status_code,
+    reason = excluded.reason,
+    payload = excluded.payload,
+    last_failed_at = excluded.last_failed_at,
+    attempts = dead_letters.attempts + 1,
+    state = 'pending',
+    claimed_at = NULL,
+    resolved_at = NULL
+"""
+
+_RESOLVE = "UPDATE dead_letters SET state = 'resolved', resolved_at = ?, claimed_at = NULL WHERE registration_id = ? AND state != 'resolved'"
+
+_LIST_COLUMNS = (
+    "id", "registration_id", "course_id", "learner_id", "error_type", "failed_uris", "status_code",
+    "reason", "attempts", "state", "first_failed_at", "last_failed_at", "resolved_at",
+)
+
+
+def encode_cursor(row_id: int) -> str:
+    return base64.urlsafe_b64encode(str(row_id).encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii"))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidDeadLetterCursorError("Cursor de paginação inválido.") from e
+
+
+def failed_destinations(record: DeliveryRecord) -> List[str]:
+    """URIs que falharam; em uma entrega parcial, só as que não receberam a notificação."""
+    if record.destinations:
+        return [destination["uri"] for destination in record.destinations if destination.get("status") != "sucesso"]
+    return [uri for uri in (record.webhook_uri or "").split(", ") if uri]
+
+
+class DeadLetter:
+    """Um postback reservado para replay: o corpo original e os destinos que devem ser notificados."""
+    __slots__ = ("id", "registration_id", "error_type", "failed_uris", "payload")
+
+    def __init__(self, id: int, registration_id: str, error_type: str, failed_uris: List[str], payload: bytes):
+        self.id = id
+        self.registration_id = registration_id
+        self.error_type = error_type
+        self.failed_uris = failed_uris
+        self.payload = payload
+
+    @property
+    def replay_destinations(self) -> Optional[List[str]]:
+        """
+        Destinos do replay. Em uma entrega parcial, apenas os que falharam (os demais já foram
+        notificados); nos outros casos None, e o mapeamento atual é consultado de novo.
+        """
+        if self.error_type == OUTCOME_PARTIAL and self.failed_uris:
+            return self.failed_uris
+        return None
+
+
+class DeadLetterStore:
+    """
+    Fila de mensagens mortas: postbacks concluídos que não chegaram à Comunitive (curso sem
+    mapeamento, erro da Comunitive, erro inesperado ou entrega parcial), em SQLite (modo WAL).
+
+    Cada registro guarda o corpo original do postback (comprimido com zlib), o tipo e o motivo
+    da falha, as URIs que falharam e a quantidade de tentativas. Uma nova falha do mesmo
+    registro (reenvio do SCORM Cloud ou replay) atualiza a linha e soma uma tentativa; uma
+    entrega bem-sucedida a marca como resolvida.
+
+    Como o histórico de entregas, `sink_for` é chamado no caminho da requisição e apenas
+    enfileira; a compressão e a gravação ficam com uma thread de escrita, em lotes.
+    """
+
+    def __init__(self, db_path: str, queue_size: int = 10000, batch_size: int = 500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def start(self) -> None:
+        """Cria o schema, se necessário, e inicia a thread de escrita."""
+        with self._lock:
+            if self._writer is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self._connect()
+            try:
+                connection.executescript(_SCHEMA)
+            finally:
+                connection.close()
+            self._writer = threading.Thread(target=self._run_writer, name="dead-letter-writer", daemon=True)
+            self._writer.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Grava o que está na fila e encerra a thread de escrita."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=timeout)
+        self._writer = None
+        if self.dropped:
+            logger.warning("%s mensagem(ns) morta(s) descartada(s) por fila cheia.", self.dropped)
+
+    def sink_for(self, payload: bytes) -> DeliverySink:
+        """Destino de `DeliveryRecord` ligado ao corpo bruto do postback (um por requisição)."""
+        def sink(record: DeliveryRecord) -> None:
+            self.record(record, payload)
+        return sink
+
+    def record(self, record: DeliveryRecord, payload: bytes) -> None:
+        """Enfileira uma falha (ou a resolução de uma falha anterior). Nunca bloqueia."""
+        if record.outcome == OUTCOME_DELIVERED:
+            item = ("resolve", record.registration_id, record.occurred_at)
+        elif record.outcome in DEAD_LETTER_OUTCOMES:
+            item = ("fail", record, payload)
+        else:
+            return
+        if self._writer is None:
+            self.start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run_writer(self) -> None:
+        connection = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                while item is not None and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+
+                failures = [self._to_row(entry[1], entry[2]) for entry in batch if entry is not None and entry[0] == "fail"]
+                resolutions = [(entry[2], entry[1]) for entry in batch if entry is not None and entry[0] == "resolve"]
+                if failures or resolutions:
+                    try:
+                        with connection:
+                            # Falhas antes das resoluções: um reenvio bem-sucedido no mesmo lote resolve a falha anterior
+                            if failures:
+                                connection.executemany(_UPSERT_FAILURE, failures)
+                            if resolutions:
+                                connection.executemany(_RESOLVE, resolutions)
+                    except sqlite3.Error as e:
+                        logger.error("Erro ao gravar %s mensagem(ns) morta(s): %s", len(failures) + len(resolutions), e)
+                if batch[-1] is None:
+                    break
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _to_row(record: DeliveryRecord, payload: bytes) -> tuple:
+        return (
+            record.registration_id,
+            record.course_id,
+            record.learner_id,
+            record.outcome,
+            json.dumps(failed_destinations(record)),
+            record.comunitive_status,
+            record.error,
+            zlib.compress(payload),
+            record.occurred_at,
+            record.occurred_at,
+        )
+
+    def _reader(self) -> sqlite3.Connection:
+        """Conexão por thread (as consultas rodam no pool de threads do asyncio)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._writer is None:
+                self.start() # Garante o schema antes da primeira leitura
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _filters(course_id: Optional[str],
+                 webhook_uri: Optional[str],
+                 error_type: Optional[str],
+                 ids: Optional[Sequence[int]] = None) -> Tuple[List[str], List[Any]]:
+        conditions: List[str] = []
+        params: List[Any] = []
+        for column, value in (("course_id", course_id), ("error_type", error_type)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if webhook_uri is not None:
+            conditions.append("EXISTS (SELECT 1 FROM json_each(failed_uris) WHERE value = ?)")
+            params.append(webhook_uri)
+        if ids:
+            conditions.append(f"id IN ({', '.join('?' for _ in ids)})")
+            params.extend(ids)
+        return conditions, params
+
+    def query(self,
+              course_id: Optional[str] = None,
+              webhook_uri: Optional[str] = None,
+              error_type: Optional[str] = None,
+              state: Optional[str] = STATE_PENDING,
+              limit: int = 50,
+              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Lista as mensagens mortas, da mais recente para a mais antiga (sem o corpo do postback).
+        Retorna {"items": [...], "next_cursor": str | None}. Bloqueante: use via `asyncio.to_thread`.
+        """
+        conditions, params = self._filters(course_id, webhook_uri, error_type)
+        if state is not None:
+            conditions.append("state = ?")
+            params.append(state)
+        if cursor is not None:
+            conditions.append("id < ?")
+            params.append(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT {', '.join(_LIST_COLUMNS)} FROM dead_letters {where} ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        try:
+            rows = self._reader().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Erro ao consultar a fila de mensagens mortas: %s", e)
+            raise DeadLetterError(f"Falha ao consultar a fila de mensagens mortas: {e}")
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(row)
+            item["failed_uris"] = json.loads(item["failed_uris"])
+            items.append(item)
+        next_cursor = encode_cursor(items[-1]["id"]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def claim(self,
+              course_id: Optional[str] = None,
+              webhook_uri: Optional[str] = None,
+              error_type: Optional[str] = None,
+              ids: Optional[Sequence[int]] = None,
+              limit: int = 1000) -> List[DeadLetter]:
+        """
+        Reserva (state=replaying) até `limit` mensagens pendentes, das mais antigas para as mais
+        recentes, para que dois replays simultâneos (em workers diferentes) não enviem a mesma.
+        Bloqueante: use via `asyncio.to_thread`.
+        """
+        conditions, params = self._filters(course_id, webhook_uri, error_type, ids)
+        now = time.time()
+        conditions.append("(state = 'pending' OR (state = 'replaying' AND claimed_at < ?))")
+        params.append(now - CLAIM_TIMEOUT_SECONDS)
+        sql = (
+            "UPDATE dead_letters SET state = 'replaying', claimed_at = ? WHERE id IN ("
+            f"SELECT id FROM dead_letters WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+            ") RETURNING id, registration_id, error_type, failed_uris, payload"
+        )
+
+        connection = self._reader()
+        try:
+            with connection:
+                rows = connection.execute(sql, [now, *params, limit]).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Erro ao reservar mensagens mortas para replay: %s", e)
+            raise DeadLetterError(f"Falha ao reservar mensagens mortas para replay: {e}")
+
+        letters = [
+            DeadLetter(row["id"], row["registration_id"], row["error_type"], json.loads(row["failed_uris"]), zlib.decompress(row["payload"]))
+            for row in rows
+        ]
+        letters.sort(key=lambda letter: letter.id)
+        return letters
+
+    def release(self, ids: Sequence[int], reason: Optional[str] = None) -> None:
+        """
+        Devolve mensagens reservadas à fila (replay interrompido ou corpo inválido). Com `reason`,
+        conta como uma tentativa com falha. Bloqueante: use via `asyncio.to_thread`.
+        """
+        if not ids:
+            return
+        if reason is None:
+            sql = "UPDATE dead_letters SET state = 'pending', claimed_at = NULL WHERE id = ? AND state = 'replaying'"
+            rows = [(row_id,) for row_id in ids]
+        else:
+            sql = (
+                "UPDATE dead_letters SET state = 'pending', claimed_at = NULL, attempts = attempts + 1, "
+                "reason = ?, last_failed_at = ? WHERE id = ? AND state = 'replaying'"
+            )
+            now = time.time()
+            rows = [(reason, now, row_id) for row_id in ids]
+        try:
+            with self._reader() as connection:
+                connection.executemany(sql, rows)
+        except sqlite3.Error as e:
+            logger.error("Erro ao devolver %s mensagem(ns) morta(s) à fila: %s", len(ids), e)
+
+    def create_replay(self, filters: Dict[str, Any], requested_by: Optional[str], total: int) -> str:
+        """Registra um replay (visível a todos os workers). Bloqueante: use via `asyncio.to_thread`."""
+        replay_id = uuid.uuid4().hex
+        try:
+            with self._reader() as connection:
+                connection.execute(
+                    "INSERT INTO dead_letter_replays (id, state, requested_by, filters, total, created_at) VALUES (?, 'running', ?, ?, ?, ?)",
+                    (replay_id, requested_by, json.dumps(filters), total, time.time()),
+                )
+        except sqlite3.Error as e:
+            raise DeadLetterError(f"Falha ao registrar o replay: {e}")
+        return replay_id
+
+    def update_replay(self, replay_id: str, succeeded: int, failed: int, state: Optional[str] = None) -> None:
+        """Atualiza o progresso de um replay; com `state`, encerra. Bloqueante: use via `asyncio.to_thread`."""
+        try:
+            with self._reader() as connection:
+                connection.execute(
+                    "UPDATE dead_letter_replays SET succeeded = ?, failed = ?, state = COALESCE(?, state), "
+                    "finished_at = CASE WHEN ? IS NULL THEN finished_at ELSE ? END WHERE id = ?",
+                    (succeeded, failed, state, state, time.time(), replay_id),
+                )
+        except sqlite3.Error as e:
+            logger.error("Erro ao atualizar o replay %s: %s", replay_id, e)
+
+    def get_replay(self, replay_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de um replay, ou None se não existir. Bloqueante: use via `asyncio.to_thread`."""
+        try:
+            row = self._reader().execute("SELECT * FROM dead_letter_replays WHERE id = ?", (replay_id,)).fetchone()
+        except sqlite3.Error as e:
+            raise DeadLetterError(f"Falha ao consultar o replay: {e}")
+        if row is None:
+            return None
+        replay = dict(row)
+        replay["filters"] = json.loads(replay["filters"])
+        return replay
+
+
+dead_letters: Optional[DeadLetterStore] = None
+if settings.DEAD_LETTER_ENABLED:
+    dead_letters = DeadLetterStore(db_path=settings.DEAD_LETTER_DB_PATH)
@@ -0,0 +1,51 @@
+# app/services/delivery_events.py
+
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Resultados possíveis de um postback concluído
+OUTCOME_DELIVERED = "delivered" # Comunitive notificada com sucesso (todos os destinos)
+OUTCOME_PARTIAL = "partial" # Parte dos destinos notificada; os demais falharam
+OUTCOME_NO_MAPPING = "no_mapping" # Curso sem URI mapeada
+OUTCOME_COMUNITIVE_ERROR = "comunitive_error" # Comunitive respondeu com erro (ou falha de rede)
+OUTCOME_ERROR = "error" # Erro inesperado no processamento
+OUTCOMES = (OUTCOME_DELIVERED, OUTCOME_PARTIAL, OUTCOME_NO_MAPPING, OUTCOME_COMUNITIVE_ERROR, OUTCOME_ERROR)
+
+
+@dataclass
+class DeliveryRecord:
+    """Resumo de um postback concluído e do que aconteceu com a entrega à Comunitive."""
+    registration_id: str
+    course_id: str
+    learner_id: str
+    outcome: str = OUTCOME_ERROR
+    course_version: Optional[int] = None
+    registration_success: Optional[str] = None
+    completed_date: Optional[str] = None
+    score: Optional[float] = None
+    seconds_tracked: Optional[float] = None
+    webhook_uri: Optional[str] = None # URIs separadas por ", " quando há mais de um destino
+    destinations: Optional[List[Dict[str, Any]]] = None # Resultado por destino
+    comunitive_status: Optional[int] = None
+    comunitive_latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    occurred_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+DeliverySink = Callable[[DeliveryRecord], None]
+
+
+def emit_delivery_record(sinks: Iterable[DeliverySink], record: DeliveryRecord) -> None:
+    """Entrega o registro a cada destino; uma falha em um deles nunca afeta o postback."""
+    for sink in sinks:
+        try:
+            sink(record)
+        except Exception as e:
+            logger.error("Erro ao registrar entrega do postback %s: %s", record.registration_id, e)
@@ -0,0 +1,224 @@
+# app/services/delivery_history.py
+
+import base64
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.delivery_events import DeliveryRecord
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryHistoryError(Exception):
+    """Exceção customizada para erros no histórico de entregas."""
+    pass
+
+
+class InvalidCursorError(DeliveryHistoryError):
+    """Cursor de paginação inválido: erro de quem consulta."""
+    pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registration_id TEXT NOT NULL,
+    course_id TEXT NOT NULL,
+    course_version INTEGER,
+    learner_id TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    registration_success TEXT,
+    completed_date TEXT NOT NULL,
+    score REAL,
+    webhook_uri TEXT,
+    comunitive_status INTEGER,
+    comunitive_latency_ms REAL,
+    error TEXT,
+    occurred_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_deliveries_learner ON deliveries (learner_id, course_id, completed_date, id);
+CREATE INDEX IF NOT EXISTS ix_deliveries_course ON deliveries (course_id, completed_date, id);
+CREATE INDEX IF NOT EXISTS ix_deliveries_completed ON deliveries (completed_date, id);
+"""
+
+_COLUMNS = (
+    "registration_id", "course_id", "course_version", "learner_id", "outcome", "registration_success",
+    "completed_date", "score", "webhook_uri", "comunitive_status", "comunitive_latency_ms", "error", "occurred_at",
+)
+
+_INSERT = f"INSERT INTO deliveries ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})"
+
+
+def encode_cursor(completed_date: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{completed_date}|{row_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        completed_date, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return completed_date, int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError("Cursor de paginação inválido.") from e
+
+
+class DeliveryHistoryStore:
+    """
+    Histórico consultável das entregas à Comunitive, em SQLite (modo WAL).
+
+    `record` é chamado no caminho da requisição e apenas enfileira o registro; uma thread de
+    escrita grava os registros em lotes, um lote por transação. As consultas usam índices
+    compostos (aluno, curso, data de conclusão, id), (curso, data, id) e (data, id) com
+    paginação por cursor (keyset): cada página custa o mesmo, independente do tamanho da tabela.
+    """
+
+    def __init__(self, db_path: str, queue_size: int = 10000, batch_size: int = 500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def start(self) -> None:
+        """Cria o schema, se necessário, e inicia a thread de escrita."""
+        with self._lock:
+            if self._writer is not None:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self._connect()
+            try:
+                connection.executescript(_SCHEMA)
+            finally:
+                connection.close()
+            self._writer = threading.Thread(target=self._run_writer, name="delivery-history-writer", daemon=True)
+            self._writer.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Grava o que está na fila e encerra a thread de escrita."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=timeout)
+        self._writer = None
+        if self.dropped:
+            logger.warning("%s registro(s) de entrega descartado(s) por fila cheia.", self.dropped)
+
+    def record(self, record: DeliveryRecord) -> None:
+        """Enfileira um registro de entrega (nunca bloqueia)."""
+        if self._writer is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run_writer(self) -> None:
+        connection = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                while item is not None and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+
+                rows = [self._to_row(r) for r in batch if r is not None]
+                if rows:
+                    try:
+                        with connection:
+                            connection.executemany(_INSERT, rows)
+                    except sqlite3.Error as e:
+                        logger.error("Erro ao gravar %s registro(s) no histórico de entregas: %s", len(rows), e)
+                if batch[-1] is None:
+                    break
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _to_row(record: DeliveryRecord) -> tuple:
+        values = record.to_dict()
+        if not values["completed_date"]:
+            values["completed_date"] = datetime.fromtimestamp(record.occurred_at, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return tuple(values[column] for column in _COLUMNS)
+
+    def query(self,
+              learner_id: Optional[str] = None,
+              course_id: Optional[str] = None,
+              outcome: Optional[str] = None,
+              since: Optional[str] = None,
+              until: Optional[str] = None,
+              limit: int = 50,
+              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Consulta as entregas, da conclusão mais recente para a mais antiga.
+        `since` (inclusivo) e `until` (exclusivo) são datas ISO 8601 comparadas com `completed_date`.
+        Retorna {"items": [...], "next_cursor": str | None}. Bloqueante: use via `asyncio.to_thread`.
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        for column, value in (("learner_id", learner_id), ("course_id", course_id), ("outcome", outcome)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("completed_date >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("completed_date < ?")
+            params.append(until)
+        if cursor is not None:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            conditions.append("(completed_date < ? OR (completed_date = ? AND id < ?))")
+            params.extend([cursor_date, cursor_date, cursor_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT id, {', '.join(_COLUMNS)} FROM deliveries {where} ORDER BY completed_date DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        try:
+            rows = self._reader().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error("Erro ao consultar o histórico de entregas: %s", e)
+            raise DeliveryHistoryError(f"Falha ao consultar o histórico de entregas: {e}")
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["completed_date"], last["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def _reader(self) -> sqlite3.Connection:
+        """Conexão de leitura por thread (as consultas rodam no pool de threads do asyncio)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._writer is None:
+                self.start() # Garante o schema antes da primeira leitura
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+
+delivery_history: Optional[DeliveryHistoryStore] = None
+if settings.DELIVERY_HISTORY_ENABLED:
+    delivery_history = DeliveryHistoryStore(db_path=settings.DELIVERY_HISTORY_DB_PATH)
@@ -0,0 +1,179 @@
+# app/services/dispatcher.py
+
+import asyncio
+import contextvars
+import logging
+import zlib
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.observability.profiling import deferred_profile_requested, run_profiled
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionQueueFullError(Exception):
+    """A fila da partição atingiu o limite; o chamador deve recusar a requisição (503)."""
+    def __init__(self, partition: int, depth: int):
+        self.partition = partition
+        self.depth = depth
+        super().__init__(f"Fila da partição {partition} cheia ({depth} itens).")
+
+
+def postback_partition_key(event) -> str:
+    """Chave de ordenação de um postback (DISPATCH_PARTITION_KEY): o registro ou o aluno."""
+    return event.registration_id if settings.DISPATCH_PARTITION_KEY == "registration" else event.learner_id
+
+
+class _Job:
+    __slots__ = ("factory", "future", "context", "key", "label")
+
+    def __init__(self, factory, future, context, key, label):
+        self.factory = factory
+        self.future = future
+        self.context = context
+        self.key = key
+        self.label = label
+
+
+class PartitionedDispatcher:
+    """
+    Executa trabalhos em N partições, cada uma com sua fila e um worker asyncio.
+
+    A chave (ex: learner.id) é mapeada sempre para a mesma partição (crc32 % N), então os
+    trabalhos de uma mesma chave rodam um de cada vez, na ordem de chegada, enquanto chaves
+    diferentes rodam em paralelo. `submit` aguarda o resultado do trabalho, preservando o
+    contexto (log_context, estágios) de quem chamou. Se quem chamou for cancelado, o trabalho
+    ainda na fila é descartado e o que está em execução é cancelado.
+    """
+
+    def __init__(self, partitions: int, queue_size: int = 100):
+        self.partitions = partitions
+        self.queue_size = queue_size
+        self.processed = [0] * partitions
+        self.rejected = 0
+
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._busy: List[Optional[_Job]] = [None] * partitions
+        self._pending_keys: List[Counter] = [Counter() for _ in range(partitions)]
+        self._pending_labels: List[Counter] = [Counter() for _ in range(partitions)]
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def partition_for(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.partitions
+
+    async def submit(self, key: str, factory: Callable[[], Awaitable[Any]], label: Optional[str] = None) -> Any:
+        """Enfileira `factory()` na partição da chave e aguarda o resultado."""
+        self._ensure_started()
+        index = self.partition_for(key)
+        queue = self._queues[index]
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(factory, future, contextvars.copy_context(), key, label)
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise PartitionQueueFullError(index, queue.qsize())
+        self._pending_keys[index][key] += 1
+        if label is not None:
+            self._pending_labels[index][label] += 1
+        return await future
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Primeira chamada neste event loop (ou um novo loop, ex: após o fork ou em testes)
+        self._loop = loop
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.partitions)]
+        self._workers = [
+            loop.create_task(self._run_partition(index), name=f"dispatch-partition-{index}")
+            for index in range(self.partitions)
+        ]
+        logger.info("Dispatcher iniciado com %s partição(ões).", self.partitions)
+
+    async def _run_partition(self, index: int) -> None:
+        queue = self._queues[index]
+        while True:
+            job: _Job = await queue.get()
+            self._release_pending(index, job)
+            if job.future.cancelled():
+                continue # Quem enviou desistiu enquanto o trabalho estava na fila
+
+            self._busy[index] = job
+            # Roda no contexto de quem enviou; a task herda uma cópia dele
+            if deferred_profile_requested(job.context):
+                task = job.context.run(asyncio.ensure_future, run_profiled(job.factory))
+            else:
+                task = job.context.run(asyncio.ensure_future, job.factory())
+            job.future.add_done_callback(lambda future, task=task: task.cancel() if future.cancelled() else None)
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._busy[index] = None
+                self.processed[index] += 1
+
+            if job.future.done() or task.cancelled():
+                continue
+            if task.exception() is not None:
+                job.future.set_exception(task.exception())
+            else:
+                job.future.set_result(task.result())
+
+    def _release_pending(self, index: int, job: _Job) -> None:
+        keys = self._pending_keys[index]
+        keys[job.key] -= 1
+        if keys[job.key] <= 0:
+            del keys[job.key]
+        if job.label is not None:
+            labels = self._pending_labels[index]
+            labels[job.label] -= 1
+            if labels[job.label] <= 0:
+                del labels[job.label]
+
+    async def stop(self) -> None:
+        """Cancela os workers (chamado no shutdown, depois de drenar as requisições)."""
+        for worker in self._workers:
+            worker.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    def snapshot(self, top: int = 3) -> Dict[str, Any]:
+        """Profundidade de cada fila e as chaves/rótulos com mais itens pendentes por partição."""
+        partitions = []
+        for index in range(self.partitions):
+            depth = self._queues[index].qsize() if self._queues else 0
+            partitions.append({
+                "partition": index,
+                "depth": depth,
+                "busy": self._busy[index] is not None,
+                "processed": self.processed[index],
+                "top_keys": _top(self._pending_keys[index], top),
+                "top_labels": _top(self._pending_labels[index], top),
+            })
+        return {
+            "partitions": self.partitions,
+            "queue_size": self.queue_size,
+            "total_depth": sum(p["depth"] for p in partitions),
+            "rejected": self.rejected,
+            "detail": partitions,
+        }
+
+
+def _top(counter: Counter, n: int) -> List[List[Any]]:
+    return [[key, count] for key, count in counter.most_common(n)]
+
+
+postback_dispatcher: Optional[PartitionedDispatcher] = None
+if settings.DISPATCH_PARTITIONS > 0:
+    postback_dispatcher = PartitionedDispatcher(
+        partitions=settings.DISPATCH_PARTITIONS,
+        queue_size=settings.DISPATCH_PARTITION_QUEUE_SIZE,
+    )
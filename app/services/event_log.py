@@ -0,0 +1,309 @@
+# app/services/event_log.py
+
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import List, Optional
+
+from app.google_cloud_storage.bucket_manager import BucketManager
+from app.services.delivery_events import DeliveryRecord
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class CompletionEventLog:
+    """
+    Log append-only dos postbacks concluídos (um `DeliveryRecord` por linha JSON).
+
+    O caminho da requisição apenas enfileira o registro. Uma thread de escrita anexa as linhas
+    ao segmento ativo (active-<inicio>-<pid>.jsonl, descomprimido e com flush a cada lote) e,
+    ao atingir o tamanho ou a idade máxima, sela o segmento como segment-*.jsonl.gz. Uma thread
+    de upload envia os segmentos selados ao GCS como um objeto por segmento e os remove do disco.
+
+    Recuperação: ao iniciar, segmentos ativos de processos que não existem mais (queda ou
+    kill -9) são reivindicados com um rename atômico (só um worker fica com cada um) e selados,
+    e segmentos selados que ficaram para trás são enviados. Se o GCS
+    ficar indisponível, os segmentos mais antigos são descartados quando o disco local passa
+    de `max_local_bytes`.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 bucket_manager: BucketManager,
+                 prefix: str = "completion-events",
+                 segment_max_bytes: int = 8 * 1024 * 1024,
+                 segment_max_seconds: float = 300,
+                 max_local_bytes: int = 512 * 1024 * 1024,
+                 upload_retry_seconds: float = 30,
+                 queue_size: int = 10000):
+        self.directory = directory
+        self.bucket_manager = bucket_manager
+        self.prefix = prefix.strip("/")
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.max_local_bytes = max_local_bytes
+        self.upload_retry_seconds = upload_retry_seconds
+
+        self.dropped = 0
+        self.uploaded_segments = 0
+        self.discarded_segments = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._upload_wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._uploader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self._file = None
+        self._file_path: Optional[str] = None
+        self._file_bytes = 0
+        self._file_opened_at = 0.0
+
+    # --- API usada pela aplicação ---
+
+    def record(self, record: DeliveryRecord) -> None:
+        """Enfileira um registro de entrega (chamado no caminho da requisição, nunca bloqueia)."""
+        if self._writer is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        """Recupera segmentos pendentes e inicia as threads de escrita e de upload."""
+        with self._lock:
+            if self._writer is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._stopping.clear()
+            self._recover()
+            self._writer = threading.Thread(target=self._run_writer, name="event-log-writer", daemon=True)
+            self._uploader = threading.Thread(target=self._run_uploader, name="event-log-uploader", daemon=True)
+            self._writer.start()
+            self._uploader.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Grava o que está na fila, sela o segmento ativo e faz uma última tentativa de upload."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=timeout)
+        self._stopping.set()
+        self._upload_wakeup.set()
+        self._uploader.join(timeout=timeout)
+        self._writer = None
+        self._uploader = None
+        if self.dropped:
+            logger.warning("%s evento(s) de conclusão descartado(s) por fila cheia.", self.dropped)
+
+    def pending_segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "segment-*.jsonl.gz")))
+
+    # --- Escrita ---
+
+    def _run_writer(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._seal_if_needed()
+                continue
+            batch = [item]
+            while item is not None and len(batch) < 500:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            records = [r for r in batch if r is not None]
+            if records:
+                try:
+                    self._append(records)
+                except Exception as e:
+                    logger.error("Erro ao gravar %s evento(s) de conclusão: %s", len(records), e)
+            if batch[-1] is None:
+                break
+        self._seal_active()
+
+    def _append(self, records: List[DeliveryRecord]) -> None:
+        data = "".join(
+            json.dumps(r.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n" for r in records
+        ).encode("utf-8")
+        self._seal_if_needed()
+        if self._file is None:
+            self._file_opened_at = time.time()
+            name = f"active-{time.strftime('%Y%m%dT%H%M%S')}-{int(self._file_opened_at * 1000) % 1000:03d}-{os.getpid()}.jsonl"
+            self._file_path = os.path.join(self.directory, name)
+            self._file = open(self._file_path, "ab")
+            self._file_bytes = 0
+        self._file.write(data)
+        self._file.flush() # Sobrevive à queda do processo; o lote seguinte não depende deste
+        self._file_bytes += len(data)
+        if self._file_bytes >= self.segment_max_bytes:
+            self._seal_active()
+
+    def _seal_if_needed(self) -> None:
+        if self._file is not None and time.time() - self._file_opened_at >= self.segment_max_seconds:
+            self._seal_active()
+
+    def _seal_active(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._seal(self._file_path)
+        self._file_path = None
+
+    def _seal(self, active_path: str) -> None:
+        """
+        Comprime um segmento ativo (ou um órfão reivindicado, active-*.jsonl.claimed-<pid>) em
+        segment-*.jsonl.gz e remove o original. O arquivo temporário leva o PID, então workers
+        diferentes nunca escrevem no mesmo, e a troca pelo nome final é atômica.
+        """
+        name = os.path.basename(active_path).split(".jsonl", 1)[0] + ".jsonl"
+        sealed_path = os.path.join(self.directory, "segment-" + name[len("active-"):] + ".gz")
+        tmp_path = f"{sealed_path}.{os.getpid()}.tmp"
+        try:
+            with open(active_path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, sealed_path)
+            os.remove(active_path)
+        except OSError as e:
+            logger.error("Erro ao selar o segmento de eventos %s: %s", active_path, e)
+            return
+        self._enforce_disk_limit()
+        self._upload_wakeup.set()
+
+    def _claim(self, path: str) -> Optional[str]:
+        """
+        Reivindica um segmento órfão renomeando-o (os.rename é atômico): só um worker consegue,
+        e os demais recebem FileNotFoundError e o ignoram.
+        """
+        claimed_path = f"{path.split('.jsonl', 1)[0]}.jsonl.claimed-{os.getpid()}"
+        try:
+            os.rename(path, claimed_path)
+        except FileNotFoundError:
+            return None # Reivindicado por outro worker
+        return claimed_path
+
+    def _recover(self) -> None:
+        for tmp_path in glob.glob(os.path.join(self.directory, "segment-*.tmp")):
+            try:
+                if time.time() - os.path.getmtime(tmp_path) > 60: # Compressão interrompida por uma queda
+                    os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+        orphans = []
+        for active_path in sorted(glob.glob(os.path.join(self.directory, "active-*.jsonl"))):
+            pid = int(active_path.rsplit("-", 1)[-1].split(".")[0])
+            try:
+                # Um segmento parado há mais que o dobro da idade máxima também é órfão (o PID pode ter sido reutilizado)
+                stale = time.time() - os.path.getmtime(active_path) > 2 * self.segment_max_seconds
+            except FileNotFoundError:
+                continue
+            if pid == os.getpid() or stale or not _pid_alive(pid):
+                orphans.append(active_path)
+        # Reivindicados por um worker que caiu antes de selar
+        for claimed_path in sorted(glob.glob(os.path.join(self.directory, "active-*.jsonl.claimed-*"))):
+            pid = int(claimed_path.rsplit("-", 1)[-1])
+            if pid == os.getpid() or not _pid_alive(pid):
+                orphans.append(claimed_path)
+
+        for orphan_path in orphans:
+            claimed_path = self._claim(orphan_path)
+            if claimed_path is None:
+                continue
+            logger.warning("Recuperando segmento de eventos não selado: %s", orphan_path)
+            self._truncate_partial_line(claimed_path)
+            self._seal(claimed_path)
+        pending = self.pending_segments()
+        if pending:
+            logger.info("%s segmento(s) de eventos pendente(s) de upload encontrados.", len(pending))
+            self._upload_wakeup.set()
+
+    @staticmethod
+    def _truncate_partial_line(path: str) -> None:
+        """Remove uma última linha incompleta (queda no meio de uma escrita)."""
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _enforce_disk_limit(self) -> None:
+        segments = self.pending_segments()
+        sizes = {path: os.path.getsize(path) for path in segments}
+        total = sum(sizes.values())
+        for path in segments:
+            if total <= self.max_local_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= sizes[path]
+            self.discarded_segments += 1
+            logger.error("Limite de disco do log de eventos atingido; segmento não enviado descartado: %s", path)
+
+    # --- Upload ---
+
+    def _run_uploader(self) -> None:
+        while True:
+            self._upload_wakeup.wait(timeout=self.upload_retry_seconds)
+            self._upload_wakeup.clear()
+            stopping = self._stopping.is_set()
+            self._upload_pending()
+            if stopping:
+                break
+
+    def _upload_pending(self) -> None:
+        for path in self.pending_segments():
+            name = os.path.basename(path)
+            day = name[len("segment-"):len("segment-") + 8] # AAAAMMDD
+            blob_name = f"{self.prefix}/{day[:4]}/{day[4:6]}/{day[6:8]}/{name}"
+            try:
+                self.bucket_manager.upload_blob(path, blob_name)
+            except FileNotFoundError:
+                continue # Já enviado e removido por outro worker
+            except Exception as e:
+                logger.warning("Upload do segmento de eventos %s falhou, nova tentativa em %ss: %s",
+                               name, self.upload_retry_seconds, e)
+                return
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.uploaded_segments += 1
+            logger.debug("Segmento de eventos enviado para gs://%s/%s", self.bucket_manager.bucket_name, blob_name)
+
+
+completion_event_log: Optional[CompletionEventLog] = None
+if settings.EVENT_LOG_ENABLED:
+    completion_event_log = CompletionEventLog(
+        directory=settings.EVENT_LOG_DIR,
+        bucket_manager=BucketManager(bucket_name=settings.EVENT_LOG_BUCKET or settings.bucket_name),
+        prefix=settings.EVENT_LOG_PREFIX,
+        segment_max_bytes=settings.EVENT_LOG_SEGMENT_MAX_MB * 1024 * 1024,
+        segment_max_seconds=settings.EVENT_LOG_SEGMENT_MAX_SECONDS,
+        max_local_bytes=settings.EVENT_LOG_MAX_LOCAL_MB * 1024 * 1024,
+        upload_retry_seconds=settings.EVENT_LOG_UPLOAD_RETRY_SECONDS,
+    )
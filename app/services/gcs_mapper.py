@@ -1,12 +1,15 @@
 # app/services/gcs_mapper.py
 
+import asyncio
 import json
 import logging
 import time
-from typing import Dict, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any
 
 # Importe o BucketManager do seu caminho correto
 from app.google_cloud_storage.bucket_manager import BucketManager
+from app.services.mapping_backends import MappingBackend, GCSMappingBackend, SQLiteMappingBackend
+from app.services.routing import CompiledRouter
 from app.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -16,85 +19,169 @@ class GCSMapperError(Exception):
     pass
 
 class GCSMapper:
-    def __init__(self, bucket_manager: BucketManager, file_name: str):
+    def __init__(self,
+                 bucket_manager: Optional[BucketManager] = None,
+                 file_name: str = "",
+                 backend: Optional[MappingBackend] = None,
+                 refresh_interval_seconds: float = 60):
         """
-        Inicializa o GCSMapper com uma instância de BucketManager e o nome do arquivo.
+        Inicializa o GCSMapper com o armazenamento dos mapeamentos: um `MappingBackend` ou, como
+        antes, uma instância de BucketManager e o nome do arquivo JSON no GCS.
         """
-        self.bucket_manager = bucket_manager
-        self.file_name = file_name # O nome específico do arquivo JSON de mapeamentos
+        self.backend: MappingBackend = backend if backend is not None else GCSMappingBackend(bucket_manager, file_name)
         
-        self._cache: Dict[str, str] = {}
+        self._cache: Dict[str, Any] = {}
         self._last_loaded_timestamp: float = 0
-        self._cache_refresh_interval_seconds: int = 60 # Recarrega o cache a cada 60 segundos
+        self._cache_refresh_interval_seconds = refresh_interval_seconds # Recarrega o cache a cada 60 segundos (padrão)
+        self._revision: Optional[int] = None # Revisão do armazenamento carregada no cache, se ele tiver uma
+        self._router: Optional[CompiledRouter] = None # Compilado a partir do cache a cada recarga
+        self.last_load_error: Optional[str] = None # Erro da última recarga (None se teve sucesso)
 
-    async def _load_from_gcs(self) -> Dict[str, str]:
-        """Carrega os mapeamentos do arquivo JSON no GCS usando BucketManager."""
+    async def _load_from_backend(self) -> Dict[str, Any]:
+        """Carrega os mapeamentos do armazenamento (GCS ou SQLite), fora do event loop."""
         try:
-            logger.info(f"Tentando carregar mapeamentos do arquivo '{self.file_name}' no bucket '{self.bucket_manager.bucket_name}'.")
-            
-            # --- CORREÇÃO AQUI: Usa o novo método read_blob_as_text do BucketManager ---
-            contents = self.bucket_manager.read_blob_as_text(self.file_name)
-            
-            if contents is None: # Arquivo não encontrado no GCS
-                logger.warning(f"Arquivo de mapeamento '{self.file_name}' não encontrado. Iniciando com mapeamento vazio.")
-                return {}
-            
-            return json.loads(contents)
+            # Os clientes são síncronos: a leitura roda em uma thread para não bloquear o event loop
+            return await asyncio.to_thread(self.backend.read_all)
         
         except json.JSONDecodeError as e:
-            logger.error(f"Erro ao decodificar JSON do arquivo de mapeamento '{self.file_name}': {e}")
-            raise GCSMapperError(f"Falha ao decodificar JSON do GCS: {e}")
+            logger.error("Erro ao decodificar JSON do arquivo de mapeamento em %s: %s", self.backend.describe(), e)
+            raise GCSMapperError(f"Falha ao decodificar JSON dos mapeamentos em {self.backend.name}: {e}")
         
         except Exception as e:
-            logger.error(f"Erro inesperado ao carregar mapeamentos do GCS via BucketManager: {e}")
-            raise GCSMapperError(f"Falha ao carregar mapeamentos do GCS: {e}")
+            logger.error("Erro inesperado ao carregar mapeamentos de %s: %s", self.backend.describe(), e)
+            raise GCSMapperError(f"Falha ao carregar mapeamentos de {self.backend.name}: {e}")
 
-    async def load_mappings(self, force_reload: bool = False) -> Dict[str, str]:
+    async def load_mappings(self, force_reload: bool = False) -> Dict[str, Any]:
         """
-        Retorna os mapeamentos, utilizando cache. Recarrega do GCS se o cache for antigo
-        ou se force_reload for True.
+        Retorna os mapeamentos, utilizando cache. Recarrega do armazenamento se o cache for antigo
+        ou se force_reload for True. Se o armazenamento informa uma revisão (SQLite) e ela não
+        mudou, a recarga periódica não relê nem recompila nada.
         """
         current_time = time.time()
         if force_reload or (current_time - self._last_loaded_timestamp > self._cache_refresh_interval_seconds):
             try:
-                self._cache = await self._load_from_gcs() 
+                revision = await asyncio.to_thread(self.backend.revision)
+                if not force_reload and revision is not None and revision == self._revision and self._last_loaded_timestamp:
+                    self._last_loaded_timestamp = current_time
+                    self.last_load_error = None
+                    return self._cache
+
+                mappings = await self._load_from_backend()
+                # Compila as regras fora do event loop e troca cache e matcher juntos
+                self._router = await asyncio.to_thread(self._compile_router, mappings)
+                self._cache = mappings
+                self._revision = revision # Lida antes dos dados: uma escrita no meio força nova recarga
                 self._last_loaded_timestamp = current_time
+                self.last_load_error = None
             
             except GCSMapperError as e:
-                logger.warning(f"Falha ao recarregar o cache de mapeamentos: {e}. Usando cache existente ou vazio.")
+                self.last_load_error = str(e)
+                logger.warning("Falha ao recarregar o cache de mapeamentos: %s. Usando cache existente ou vazio.", e)
                 if not self._cache: # Garante que o cache não é None se a carga inicial falhar
                     self._cache = {}
+
+            except Exception as e: # Falha ao ler a revisão
+                self.last_load_error = f"Falha ao consultar a revisão dos mapeamentos: {e}"
+                logger.warning("%s. Usando cache existente ou vazio.", self.last_load_error)
         
         return self._cache
 
+    async def check_health(self) -> str:
+        """
+        Verificação de prontidão: no warm-up faz a primeira carga; depois, periodicamente, recarrega
+        o cache quando ele expira (assim os postbacks não pagam a recarga). Levanta GCSMapperError
+        se a última carga falhou.
+        """
+        await self.load_mappings()
+        if self.last_load_error is not None:
+            if not self._last_loaded_timestamp:
+                raise GCSMapperError(self.last_load_error)
+            raise GCSMapperError(f"{self.last_load_error} (servindo cache de {time.time() - self._last_loaded_timestamp:.0f}s)")
+        return f"{len(self._cache)} mapeamento(s) em cache, carregados há {time.time() - self._last_loaded_timestamp:.0f}s"
+
+    async def resolve_destinations(self,
+                                   course_id: str,
+                                   tags: Optional[Iterable[str]] = None,
+                                   course_version: Optional[int] = None) -> List[str]:
+        """
+        Retorna as URIs de destino de um curso: a chave exata do mapeamento ou, na falta dela,
+        a regra de roteamento (prefixo, glob, tags, versão) de maior precedência.
+        """
+        mappings = await self.load_mappings()
+        router = self._router
+        if router is None or router.source is not mappings: # Cache vazio após falha de carga
+            router = self._router = self._compile_router(mappings)
+        return router.resolve(course_id, tags=tags, course_version=course_version)
+
+    @staticmethod
+    def _compile_router(mappings: Dict[str, Any]) -> CompiledRouter:
+        router = CompiledRouter(mappings)
+        logger.info("Roteamento compilado: %s chave(s) exata(s) e %s regra(s).", len(router.exact), router.rule_count)
+        return router
+
     async def update_mapping(self, new_mappings: Dict[str, Any]):
         """
-        Substitui o mapeamento completo no arquivo JSON do GCS usando BucketManager.
+        Substitui o mapeamento completo no armazenamento (arquivo JSON no GCS ou tabela no SQLite).
         """
-        logger.info(f"Iniciando atualização completa do mapeamento para '{self.file_name}' no GCS.")
+        logger.info("Iniciando atualização completa do mapeamento em %s.", self.backend.describe())
         
         try:
-            # --- JÁ ESTÁ CORRETO: Usa o novo método upload_string_to_blob do BucketManager ---
-            self.bucket_manager.upload_string_to_blob(
-                content=json.dumps(new_mappings, indent=4), 
-                destination_blob_name=self.file_name,
-                content_type="application/json" # Definir content type para JSON
-            )
-            logger.info(f"Mapeamento salvo com sucesso em '{self.file_name}' no bucket '{self.bucket_manager.bucket_name}'.")
+            await asyncio.to_thread(self.backend.replace_all, new_mappings)
             
             # Atualiza o cache local imediatamente após uma escrita bem-sucedida
+            self._router = await asyncio.to_thread(self._compile_router, new_mappings)
             self._cache = new_mappings
+            self._revision = None # A próxima recarga periódica relê a revisão
             self._last_loaded_timestamp = time.time()
 
         except Exception as e:
-            logger.error(f"Erro ao salvar mapeamento no GCS via BucketManager: {e}")
-            raise GCSMapperError(f"Falha ao salvar mapeamento no GCS: {e}")
+            logger.error("Erro ao salvar mapeamento em %s: %s", self.backend.describe(), e)
+            raise GCSMapperError(f"Falha ao salvar mapeamento em {self.backend.name}: {e}")
+
+    async def replace_links(self, links: Dict[str, Any]):
+        """
+        Substitui todos os vínculos curso -> destinos, preservando as regras de roteamento. A
+        preservação é feita pelo armazenamento (no SQLite, na mesma transação da escrita), e não
+        com uma leitura seguida de escrita aqui. O cache é recarregado em seguida.
+        """
+        logger.info("Substituindo os vínculos do mapeamento em %s (%s curso(s)).", self.backend.describe(), len(links))
+        try:
+            await asyncio.to_thread(self.backend.replace_links, links)
+        except Exception as e:
+            logger.error("Erro ao salvar vínculos em %s: %s", self.backend.describe(), e)
+            raise GCSMapperError(f"Falha ao salvar mapeamento em {self.backend.name}: {e}")
+        await self.load_mappings(force_reload=True)
+        if self.last_load_error is not None:
+            raise GCSMapperError(self.last_load_error)
+
+    async def upsert_mappings(self, changes: Dict[str, Any]):
+        """
+        Inclui ou altera apenas as chaves de `changes` (valor None remove a chave). No SQLite são
+        upserts de linhas; no GCS, leitura e regravação do arquivo. O cache é recarregado em seguida.
+        """
+        logger.info("Atualizando %s chave(s) do mapeamento em %s.", len(changes), self.backend.describe())
+        try:
+            await asyncio.to_thread(self.backend.upsert, changes)
+        except Exception as e:
+            logger.error("Erro ao atualizar mapeamento em %s: %s", self.backend.describe(), e)
+            raise GCSMapperError(f"Falha ao salvar mapeamento em {self.backend.name}: {e}")
+        await self.load_mappings(force_reload=True)
+        if self.last_load_error is not None:
+            raise GCSMapperError(self.last_load_error)
+
 
-# --- ATUALIZAÇÃO DA INSTANCIAÇÃO GLOBAL DO GCSMapper ---
-bucket_manager_instance = BucketManager(bucket_name=settings.bucket_name)
+def create_mapping_backend() -> MappingBackend:
+    """Armazenamento configurado em MAPPING_BACKEND ("gcs" ou "sqlite")."""
+    if settings.MAPPING_BACKEND == "sqlite":
+        return SQLiteMappingBackend(db_path=settings.MAPPING_DB_PATH)
+    if settings.MAPPING_BACKEND != "gcs":
+        raise ValueError(f"MAPPING_BACKEND inválido: {settings.MAPPING_BACKEND!r} (use 'gcs' ou 'sqlite').")
+    # --- ATUALIZAÇÃO DA INSTANCIAÇÃO GLOBAL DO GCSMapper ---
+    bucket_manager_instance = BucketManager(bucket_name=settings.bucket_name)
+    return GCSMappingBackend(bucket_manager=bucket_manager_instance, file_name=settings.file_blob_name)
 
-# Inicializa o GCSMapper com a instância do BucketManager e o nome do arquivo
+# Inicializa o GCSMapper com o armazenamento configurado
 gcs_mapper = GCSMapper(
-    bucket_manager=bucket_manager_instance,
-    file_name=settings.file_blob_name
-)
\ No newline at end of file
+    backend=create_mapping_backend(),
+    refresh_interval_seconds=settings.MAPPING_REFRESH_SECONDS
+)
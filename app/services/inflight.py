@@ -0,0 +1,96 @@
+# app/services/inflight.py
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightTracker:
+    """
+    Acompanha os postbacks em processamento para o desligamento coordenado.
+
+    Ao receber SIGTERM o servidor para de aceitar conexões e aguarda as requisições em
+    andamento até DRAIN_TIMEOUT_SECONDS. As que não terminam a tempo são canceladas; neste
+    momento o corpo bruto do postback é gravado em `spool_dir` (drain-*.jsonl.gz, mesmo
+    formato da captura de tráfego) para ser reenviado com scripts/replay_capture.py. O spool é
+    a única fonte desse reenvio: o use case não emite o `DeliveryRecord` de um postback
+    cancelado, então ele não vai também para a fila de mensagens mortas.
+    """
+
+    def __init__(self, spool_dir: str):
+        self.spool_dir = spool_dir
+        self.active = 0
+        self.persisted = 0
+        self._spool_file = None
+        self._idle: Optional[asyncio.Event] = None
+
+    @asynccontextmanager
+    async def track(self, body: bytes):
+        self.active += 1
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.persist(body)
+            raise
+        finally:
+            self.active -= 1
+            if self.active == 0 and self._idle is not None:
+                self._idle.set()
+
+    async def wait_until_idle(self, timeout: float) -> bool:
+        """
+        Aguarda até não haver postbacks em andamento. Usado no shutdown do lifespan: o uvicorn
+        cancela as requisições que estouraram o prazo logo antes, e elas precisam de algumas
+        iterações do loop para chegar ao `persist`.
+        """
+        if self.active == 0:
+            return True
+        self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.error("%s postback(s) ainda em andamento ao fim do desligamento.", self.active)
+            return False
+        finally:
+            self._idle = None
+
+    def persist(self, body: bytes) -> None:
+        """Grava um postback interrompido no spool de desligamento."""
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            logger.warning("Postback interrompido com corpo inválido não foi persistido.")
+            return
+
+        try:
+            if self._spool_file is None:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                path = os.path.join(self.spool_dir, f"drain-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl.gz")
+                self._spool_file = gzip.open(path, "ab")
+                logger.warning("Gravando postbacks interrompidos pelo desligamento em %s", path)
+            line = json.dumps({"ts": time.time(), "body": payload}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            self._spool_file.write(line.encode("utf-8"))
+            self._spool_file.flush()
+            self.persisted += 1
+        except OSError as e:
+            logger.error("Erro ao persistir postback interrompido: %s", e)
+
+    def close(self) -> None:
+        if self._spool_file is not None:
+            self._spool_file.close()
+            self._spool_file = None
+        if self.persisted:
+            logger.warning("%s postback(s) interrompido(s) persistido(s) em %s para reenvio.", self.persisted, self.spool_dir)
+
+
+inflight_tracker = InFlightTracker(spool_dir=settings.DRAIN_SPOOL_DIR)
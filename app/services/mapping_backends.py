@@ -0,0 +1,258 @@
+# app/services/mapping_backends.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.google_cloud_storage.bucket_manager import BucketManager
+from app.services.routing import RULES_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class MappingBackend(ABC):
+    """
+    Armazenamento do mapeamento curso -> destinos usado pelo GCSMapper. Os métodos são
+    síncronos (o GCSMapper os chama via `asyncio.to_thread`) e levantam exceção em falhas.
+
+    O mapeamento tem o formato do arquivo JSON original: `{"curso": URI ou [URIs], ...}`, com as
+    regras de roteamento na chave reservada `__rules__`.
+    """
+    name = "base"
+
+    @abstractmethod
+    def read_all(self) -> Dict[str, Any]:
+        """Mapeamento completo."""
+
+    @abstractmethod
+    def replace_all(self, mappings: Dict[str, Any]) -> None:
+        """Substitui o mapeamento completo."""
+
+    @abstractmethod
+    def upsert(self, changes: Dict[str, Any]) -> None:
+        """Inclui ou altera as chaves de `changes`; uma chave com valor None é removida."""
+
+    def replace_links(self, links: Dict[str, Any]) -> None:
+        """
+        Substitui todos os vínculos curso -> destinos, preservando as regras de roteamento atuais.
+        Esta versão lê e regrava sem transação; armazenamentos que oferecem uma a sobrescrevem.
+        """
+        current = self.read_all()
+        mappings = {course_id: value for course_id, value in links.items() if course_id != RULES_KEY}
+        if current.get(RULES_KEY):
+            mappings[RULES_KEY] = current[RULES_KEY]
+        self.replace_all(mappings)
+
+    def revision(self) -> Optional[int]:
+        """
+        Contador que muda a cada escrita, para a recarga periódica pular a leitura completa
+        quando nada mudou. None quando o armazenamento não oferece isso (sempre recarrega).
+        """
+        return None
+
+    def close(self) -> None:
+        """Libera conexões (ex: antes do fork dos workers)."""
+        pass
+
+    def describe(self) -> str:
+        return self.name
+
+
+class GCSMappingBackend(MappingBackend):
+    """
+    Um arquivo JSON no Google Cloud Storage (o formato original). Cada escrita regrava o arquivo
+    inteiro e vale a última: alterações simultâneas de workers diferentes podem se sobrescrever.
+    """
+    name = "gcs"
+
+    def __init__(self, bucket_manager: BucketManager, file_name: str):
+        self.bucket_manager = bucket_manager
+        self.file_name = file_name # O nome específico do arquivo JSON de mapeamentos
+
+    def read_all(self) -> Dict[str, Any]:
+        logger.info("Tentando carregar mapeamentos do arquivo '%s' no bucket '%s'.", self.file_name, self.bucket_manager.bucket_name)
+        contents = self.bucket_manager.read_blob_as_text(self.file_name)
+        if contents is None: # Arquivo não encontrado no GCS
+            logger.warning("Arquivo de mapeamento '%s' não encontrado. Iniciando com mapeamento vazio.", self.file_name)
+            return {}
+        return json.loads(contents)
+
+    def replace_all(self, mappings: Dict[str, Any]) -> None:
+        self.bucket_manager.upload_string_to_blob(
+            content=json.dumps(mappings, indent=4),
+            destination_blob_name=self.file_name,
+            content_type="application/json" # Definir content type para JSON
+        )
+        logger.info("Mapeamento salvo com sucesso em '%s' no bucket '%s'.", self.file_name, self.bucket_manager.bucket_name)
+
+    def upsert(self, changes: Dict[str, Any]) -> None:
+        # O GCS só guarda o arquivo inteiro: lê, altera e regrava
+        mappings = self.read_all()
+        for course_id, value in changes.items():
+            if value is None:
+                mappings.pop(course_id, None)
+            else:
+                mappings[course_id] = value
+        self.replace_all(mappings)
+
+    def describe(self) -> str:
+        return f"gcs://{self.bucket_manager.bucket_name}/{self.file_name}"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS course_mappings (
+    course_id TEXT PRIMARY KEY,
+    destinations TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mapping_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    revision INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO mapping_meta (id, revision) VALUES (1, 0);
+"""
+
+def _encode(value: Any) -> str:
+    # Uma única URI (o caso comum) é gravada como texto puro; listas e regras, em JSON
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _decode(value: str) -> Any:
+    return json.loads(value) if value[:1] in ("[", "{") else value
+
+
+_UPSERT = """
+INSERT INTO course_mappings (course_id, destinations, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (course_id) DO UPDATE SET destinations = excluded.destinations, updated_at = excluded.updated_at
+"""
+
+
+class SQLiteMappingBackend(MappingBackend):
+    """
+    Mapeamento em SQLite local (modo WAL), para rodar sem GCS (on-premises, testes de carga).
+
+    Uma linha por curso, indexada por course_id (chave primária), com a URI em texto ou a lista
+    em JSON; as regras de roteamento ficam na linha `__rules__`. Alterações são upserts das linhas
+    que mudaram (uma substituição completa só grava a diferença, calculada dentro da transação
+    de escrita, assim uma alteração concorrente não se perde), e cada escrita incrementa
+    `mapping_meta.revision`, que os workers consultam para só recarregar quando algo mudou. O
+    banco é compartilhado pelos workers do mesmo host.
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexão por thread (as chamadas rodam no pool de threads do asyncio)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self._ensure_schema()
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: as transações de escrita são abertas com BEGIN IMMEDIATE
+        connection = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _ensure_schema(self) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self._connect()
+            try:
+                connection.executescript(_SCHEMA)
+            finally:
+                connection.close()
+            self._schema_ready = True
+
+    def _write(self, plan: Callable[[sqlite3.Connection], List[Tuple[str, List[tuple]]]]) -> int:
+        """
+        Executa as instruções de `plan(connection)` em uma transação BEGIN IMMEDIATE: o que o plano
+        lê já está sob o bloqueio de escrita. Sem linhas a gravar, nada muda (nem a revisão).
+        Retorna a quantidade de linhas gravadas.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            statements = plan(connection)
+            written = 0
+            for sql, rows in statements:
+                if rows:
+                    connection.executemany(sql, rows)
+                    written += len(rows)
+            if not written:
+                connection.execute("ROLLBACK")
+                return 0
+            connection.execute("UPDATE mapping_meta SET revision = revision + 1 WHERE id = 1")
+            connection.execute("COMMIT")
+            return written
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def read_all(self) -> Dict[str, Any]:
+        rows = self._connection().execute("SELECT course_id, destinations FROM course_mappings").fetchall()
+        return {course_id: _decode(value) for course_id, value in rows}
+
+    def replace_all(self, mappings: Dict[str, Any]) -> None:
+        self._replace(mappings, keep=())
+
+    def replace_links(self, links: Dict[str, Any]) -> None:
+        # A linha das regras fica fora da diferença: preservada na mesma transação
+        self._replace({k: v for k, v in links.items() if k != RULES_KEY}, keep=(RULES_KEY,))
+
+    def _replace(self, mappings: Dict[str, Any], keep: Iterable[str]) -> None:
+        now = time.time()
+        counts = {}
+
+        def plan(connection: sqlite3.Connection) -> List[Tuple[str, List[tuple]]]:
+            existing = dict(connection.execute("SELECT course_id, destinations FROM course_mappings"))
+            # Só grava a diferença: chaves novas ou alteradas (upsert) e chaves removidas
+            changed = []
+            for course_id, value in mappings.items():
+                if value is None:
+                    continue
+                encoded = _encode(value)
+                if existing.get(course_id) != encoded:
+                    changed.append((course_id, encoded, now))
+            kept = {k for k, v in mappings.items() if v is not None}.union(keep)
+            removed = [(course_id,) for course_id in existing.keys() - kept]
+            counts.update(changed=len(changed), removed=len(removed))
+            return [("DELETE FROM course_mappings WHERE course_id = ?", removed), (_UPSERT, changed)]
+
+        self._write(plan)
+        logger.info("Mapeamento salvo com sucesso em '%s' (%s chave(s) alterada(s), %s removida(s)).", self.db_path, counts["changed"], counts["removed"])
+
+    def upsert(self, changes: Dict[str, Any]) -> None:
+        now = time.time()
+        upserts = [(course_id, _encode(value), now) for course_id, value in changes.items() if value is not None]
+        deletes = [(course_id,) for course_id, value in changes.items() if value is None]
+        self._write(lambda connection: [("DELETE FROM course_mappings WHERE course_id = ?", deletes), (_UPSERT, upserts)])
+
+    def revision(self) -> Optional[int]:
+        return self._connection().execute("SELECT revision FROM mapping_meta WHERE id = 1").fetchone()[0]
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+        self._local = threading.local()
+
+    def describe(self) -> str:
+        return f"sqlite://{self.db_path}"
@@ -0,0 +1,90 @@
+# app/services/postback_event.py
+
+from operator import attrgetter
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from app.api.schemas.scorm_postback import ScormRegistrationPostback, is_completed
+
+class PostbackEvent:
+    """
+    Representação interna e compacta de um postback, criada uma única vez na entrada a partir do
+    `ScormRegistrationPostback`. Guarda só os campos usados pelo pipeline (fila do dispatcher,
+    mapeamento, notificação e registro da entrega), sem o grafo de modelos aninhados nem os
+    dicionários livres (`staticProperties`, `completionAmount`) do payload original.
+
+    Sem `__dict__` (`__slots__`) e imutável por convenção. Só existe em memória: o que é persistido
+    (fila de mensagens mortas, spool do desligamento, captura) é o corpo original do postback.
+    """
+    __slots__ = (
+        "registration_id", "instance", "course_id", "course_version", "learner_id", "learner_name",
+        "completion", "success", "score", "seconds_tracked", "completed_date", "updated", "tags",
+    )
+
+    def __init__(self,
+                 registration_id: str,
+                 instance: int,
+                 course_id: str,
+                 learner_id: str,
+                 course_version: Optional[int] = None,
+                 learner_name: str = "",
+                 completion: Optional[str] = None,
+                 success: Optional[str] = None,
+                 score: Optional[int] = None,
+                 seconds_tracked: Optional[float] = None,
+                 completed_date: Optional[str] = None,
+                 updated: Optional[str] = None,
+                 tags: Sequence[str] = ()):
+        self.registration_id = registration_id
+        self.instance = instance
+        self.course_id = course_id
+        self.course_version = course_version
+        self.learner_id = learner_id # Geralmente o e-mail do aluno
+        self.learner_name = learner_name
+        self.completion = completion # activityDetails.activityCompletion
+        self.success = success # registrationSuccess
+        self.score = score # None quando o postback não traz pontuação
+        self.seconds_tracked = seconds_tracked
+        self.completed_date = completed_date
+        self.updated = updated
+        self.tags = tuple(tags)
+
+    @classmethod
+    def from_postback(cls, postback: ScormRegistrationPostback) -> "PostbackEvent":
+        return cls(
+            registration_id=postback.id,
+            instance=postback.instance,
+            course_id=postback.course.id,
+            course_version=postback.course.version,
+            learner_id=postback.learner.id,
+            learner_name=postback.learner_full_name,
+            completion=postback.activityDetails.activityCompletion,
+            success=postback.registrationSuccess,
+            score=postback.processed_pontuacao if postback.has_pontuacao else None,
+            seconds_tracked=postback.totalSecondsTracked,
+            completed_date=postback.completedDate,
+            updated=postback.updated,
+            tags=postback.tags or (),
+        )
+
+    @property
+    def completed(self) -> bool:
+        return is_completed(self.completion)
+
+    def to_tuple(self) -> Tuple[Any, ...]:
+        return _fields(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.__slots__, _fields(self)))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PostbackEvent) and self.to_tuple() == other.to_tuple()
+
+    def __hash__(self) -> int:
+        return hash(self.to_tuple())
+
+    def __repr__(self) -> str:
+        return f"PostbackEvent(registration_id={self.registration_id!r}, course_id={self.course_id!r}, learner_id={self.learner_id!r})"
+
+
+# Lê todos os campos de uma vez, na ordem de __slots__
+_fields = attrgetter(*PostbackEvent.__slots__)
@@ -0,0 +1,164 @@
+# app/services/routing.py
+
+import fnmatch
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Chave reservada do arquivo de mapeamentos com a lista de regras de roteamento
+RULES_KEY = "__rules__"
+
+_WILDCARDS = re.compile(r"[*?\[]")
+
+
+def normalize_destinations(value: Any) -> List[str]:
+    """
+    Destinos (URIs) de um curso no arquivo de mapeamentos. Aceita o formato antigo, uma URI
+    por curso (`"curso": "https://..."`), e o novo, uma lista (`"curso": ["https://...", ...]`).
+    URIs repetidas são ignoradas, mantendo a ordem.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(dict.fromkeys(uri for uri in value if uri))
+
+
+class RoutingRule:
+    """
+    Regra de roteamento compilada. Todas as condições presentes precisam ser atendidas:
+    course_id (exato), course_id_prefix, course_id_glob (fnmatch: *, ?, [...]), tags (o postback
+    precisa ter todas) e course_version. Entre várias regras que casam vence a de maior
+    `priority`; no empate, a que aparece primeiro no arquivo. Regras sem nenhuma condição são
+    recusadas, assim um arquivo editado à mão não cria uma rota que casa com qualquer curso.
+    """
+    __slots__ = ("order", "priority", "course_id", "prefix", "glob", "glob_regex", "tags", "course_version", "destinations")
+
+    def __init__(self, order: int, spec: Dict[str, Any]):
+        self.order = order
+        self.priority = int(spec.get("priority", 0))
+        self.course_id: Optional[str] = spec.get("course_id")
+        self.prefix: Optional[str] = spec.get("course_id_prefix")
+        self.glob: Optional[str] = spec.get("course_id_glob")
+        self.glob_regex = None # Compilada na primeira verificação, para a compilação do matcher ser barata
+        self.tags = frozenset(spec.get("tags") or ())
+        version = spec.get("course_version")
+        self.course_version: Optional[int] = int(version) if version is not None else None
+        self.destinations = normalize_destinations(spec.get("destinations"))
+        if not self.destinations:
+            raise ValueError("regra sem destinations")
+        if not (self.course_id or self.prefix or self.glob or self.tags or self.course_version is not None):
+            raise ValueError("regra sem condição (course_id, course_id_prefix, course_id_glob, tags ou course_version)")
+
+    def matches(self, course_id: str, tags: frozenset, course_version: Optional[int]) -> bool:
+        if self.course_id is not None and course_id != self.course_id:
+            return False
+        if self.prefix is not None and not course_id.startswith(self.prefix):
+            return False
+        if self.glob is not None:
+            if self.glob_regex is None:
+                self.glob_regex = re.compile(fnmatch.translate(self.glob))
+            if not self.glob_regex.match(course_id):
+                return False
+        if self.course_version is not None and course_version != self.course_version:
+            return False
+        return self.tags <= tags
+
+    def rank(self) -> tuple:
+        return (-self.priority, self.order)
+
+
+class _TrieNode:
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.rules: List[RoutingRule] = []
+
+
+class CompiledRouter:
+    """
+    Matcher compilado a partir do arquivo de mapeamentos, recriado a cada recarga.
+
+    - Chaves exatas (`"curso": URI ou [URIs]`) ficam em um dict: O(1), e sempre vencem as regras.
+    - Regras com course_id exato ficam em outro dict; regras com course_id_prefix, e regras com
+      course_id_glob pelo trecho literal antes do primeiro curinga, ficam em uma trie de
+      prefixos. A busca percorre a trie pelos caracteres do course_id, então o custo depende do
+      tamanho do ID e não da quantidade de regras.
+    - Regras só com tags entram em um índice tag -> regras; apenas as tags do postback são consultadas.
+    - O restante (glob iniciado por curinga, regras só com course_version) é verificado sempre.
+    """
+
+    def __init__(self, mappings: Dict[str, Any]):
+        self.source = mappings
+        self.exact: Dict[str, List[str]] = {}
+        self._exact_rules: Dict[str, List[RoutingRule]] = {}
+        self._trie = _TrieNode()
+        self._tag_index: Dict[str, List[RoutingRule]] = {}
+        self._unindexed: List[RoutingRule] = []
+        self.rule_count = 0
+
+        for course_id, value in mappings.items():
+            if course_id == RULES_KEY:
+                continue
+            destinations = normalize_destinations(value)
+            if destinations:
+                self.exact[course_id] = destinations
+
+        for order, spec in enumerate(mappings.get(RULES_KEY) or ()):
+            try:
+                rule = RoutingRule(order, spec)
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.warning("Regra de roteamento %s ignorada (%s): %s", order, e, spec)
+                continue
+            self._index(rule)
+            self.rule_count += 1
+
+    def _index(self, rule: RoutingRule) -> None:
+        if rule.course_id is not None:
+            self._exact_rules.setdefault(rule.course_id, []).append(rule)
+            return
+
+        literal = rule.prefix or ""
+        if rule.glob is not None:
+            glob_literal = _WILDCARDS.split(rule.glob, 1)[0]
+            literal = max(literal, glob_literal, key=len) # Ambos precisam casar; indexa pelo mais longo
+        if literal:
+            node = self._trie
+            for char in literal:
+                node = node.children.setdefault(char, _TrieNode())
+            node.rules.append(rule)
+        elif rule.tags:
+            self._tag_index.setdefault(min(rule.tags), []).append(rule)
+        else:
+            self._unindexed.append(rule)
+
+    def _candidates(self, course_id: str, tags: Iterable[str]) -> Iterable[RoutingRule]:
+        yield from self._exact_rules.get(course_id, ())
+        node = self._trie
+        yield from node.rules
+        for char in course_id:
+            node = node.children.get(char)
+            if node is None:
+                break
+            yield from node.rules
+        for tag in tags:
+            yield from self._tag_index.get(tag, ())
+        yield from self._unindexed
+
+    def resolve(self, course_id: str, tags: Optional[Iterable[str]] = None, course_version: Optional[int] = None) -> List[str]:
+        """Destinos do curso: a chave exata, se existir; senão os da regra de maior precedência."""
+        destinations = self.exact.get(course_id)
+        if destinations is not None:
+            return destinations
+        if not self.rule_count:
+            return []
+
+        tag_set = frozenset(tags or ())
+        best: Optional[RoutingRule] = None
+        for rule in self._candidates(course_id, tag_set):
+            if (best is None or rule.rank() < best.rank()) and rule.matches(course_id, tag_set, course_version):
+                best = rule
+        return best.destinations if best is not None else []
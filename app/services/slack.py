@@ -4,7 +4,7 @@ from app.settings import settings
 def send_slack_message(message):
     
     # Set up a WebClient with the Slack OAuth token
-    client = WebClient(token=settings.SLACK_TOKEN)
+    client = WebClient(token=settings.SLACK_TOKEN, base_url=settings.SLACK_API_BASE_URL, timeout=settings.SLACK_TIMEOUT_SECONDS)
 
     # Send a message
     client.chat_postMessage(
@@ -0,0 +1,175 @@
+# app/services/traffic_capture.py
+
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TrafficCapture:
+    """
+    Grava os corpos brutos dos postbacks recebidos, com o horário de chegada, em arquivos
+    JSON Lines comprimidos (gzip) e rotativos, para posterior replay (scripts/replay_capture.py).
+
+    O caminho da requisição apenas sorteia e enfileira o corpo; a redação dos dados do aluno
+    (`learner.id`, `firstName`, `lastName`), a compressão e a escrita em disco acontecem em uma
+    thread de fundo. A redação é um HMAC com `redaction_salt`, obrigatório: sem ele o pseudônimo
+    seria revertido calculando o hash de e-mails candidatos.
+    """
+
+    def __init__(self,
+                 output_dir: str,
+                 sample_rate: float = 1.0,
+                 max_file_bytes: int = 64 * 1024 * 1024,
+                 rotate_seconds: float = 3600,
+                 max_files: int = 48,
+                 redaction_salt: str = "",
+                 queue_size: int = 10000):
+        if not redaction_salt:
+            raise ValueError("A captura de tráfego exige CAPTURE_REDACTION_SALT não vazio para pseudonimizar os alunos.")
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.max_file_bytes = max_file_bytes
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.redaction_salt = redaction_salt.encode("utf-8")
+        self.dropped = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened_at = 0.0
+
+    def record(self, body: bytes, arrived_at: Optional[float] = None) -> None:
+        """Enfileira um corpo de requisição para captura, respeitando a taxa de amostragem."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((arrived_at or time.time(), body))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Grava o que está na fila e fecha o arquivo atual."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _pseudonym(self, learner_id: str) -> str:
+        return hmac.new(self.redaction_salt, learner_id.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+    def redact_learner_id(self, learner_id: str) -> str:
+        """Substitui o e-mail do aluno por um pseudônimo estável (o mesmo aluno gera o mesmo valor)."""
+        return f"learner-{self._pseudonym(learner_id)}@redacted.invalid"
+
+    def redact_learner(self, learner: dict) -> None:
+        """Pseudonimiza o e-mail e troca o nome do aluno, mantendo os campos presentes no payload."""
+        learner_id = str(learner.get("id") or "")
+        if learner_id:
+            learner["id"] = self.redact_learner_id(learner_id)
+        if learner.get("firstName"):
+            learner["firstName"] = "Aluno"
+        if learner.get("lastName"):
+            learner["lastName"] = self._pseudonym(learner_id)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._rotate_if_needed()
+                continue
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.error("Erro ao gravar postback capturado: %s", e)
+        self._close_file()
+
+    def _write(self, arrived_at: float, body: bytes) -> None:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            logger.debug("Corpo de postback inválido ignorado pela captura.")
+            return
+
+        learner = payload.get("learner") if isinstance(payload, dict) else None
+        if isinstance(learner, dict):
+            self.redact_learner(learner)
+
+        line = json.dumps({"ts": arrived_at, "body": payload}, ensure_ascii=False, separators=(",", ":")) + "\n"
+        data = line.encode("utf-8")
+
+        self._rotate_if_needed()
+        if self._file is None:
+            self._open_file()
+        self._file.write(data)
+        self._file_bytes += len(data)
+
+    def _rotate_if_needed(self) -> None:
+        if self._file is None:
+            return
+        too_big = self._file_bytes >= self.max_file_bytes
+        too_old = time.time() - self._file_opened_at >= self.rotate_seconds
+        if too_big or too_old:
+            self._close_file()
+
+    def _open_file(self) -> None:
+        name = f"capture-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl.gz"
+        path = os.path.join(self.output_dir, name)
+        self._file = gzip.open(path, "ab")
+        self._file_bytes = 0
+        self._file_opened_at = time.time()
+        logger.info("Capturando postbacks em %s", path)
+        self._prune_old_files()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _prune_old_files(self) -> None:
+        files = sorted(glob.glob(os.path.join(self.output_dir, "capture-*.jsonl.gz")))
+        for path in files[:-self.max_files] if self.max_files > 0 else []:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Não foi possível remover captura antiga %s: %s", path, e)
+
+
+traffic_capture: Optional[TrafficCapture] = None
+if settings.CAPTURE_ENABLED:
+    traffic_capture = TrafficCapture(
+        output_dir=settings.CAPTURE_DIR,
+        sample_rate=settings.CAPTURE_SAMPLE_RATE,
+        max_file_bytes=settings.CAPTURE_MAX_FILE_MB * 1024 * 1024,
+        rotate_seconds=settings.CAPTURE_ROTATE_SECONDS,
+        max_files=settings.CAPTURE_MAX_FILES,
+        redaction_salt=settings.CAPTURE_REDACTION_SALT,
+    )
@@ -21,13 +21,102 @@ class Settings(BaseSettings):
     COMUNITIVE_API_KEY: str
     COMUNITIVE_API_URL: AnyHttpUrl = "https://api.comunitive.com"
     
+    COMUNITIVE_DESTINATION_RETRIES: int = 1 # Novas tentativas por destino em falhas transitórias (rede, 429, 5xx)
+    COMUNITIVE_RETRY_BACKOFF_SECONDS: float = 0.5 # Espera antes da primeira nova tentativa (dobra a cada tentativa)
+    COMUNITIVE_HTTP_TIMEOUT_SECONDS: float = 5.0 # Timeout das chamadas aos webhooks da Comunitive
+    COMUNITIVE_HTTP_MAX_CONNECTIONS: int = 100 # Tamanho do pool de conexões compartilhado por worker
+    COMUNITIVE_NOTIFIER: str = "webhook" # "webhook" (um POST por conclusão e destino) ou "batch" (lotes autenticados em COMUNITIVE_API_URL)
+    COMUNITIVE_BATCH_WINDOW_SECONDS: float = 0.05 # Espera máxima para juntar conclusões em um lote
+    COMUNITIVE_BATCH_MAX_SIZE: int = 100 # Conclusões por lote; um lote cheio é enviado na hora
+
+    # --- Prazos ---
+    POSTBACK_DEADLINE_SECONDS: float = 25.0 # Prazo total de um postback (fila, mapeamento, Comunitive, Slack); 0 desliga
+    GCS_TIMEOUT_SECONDS: float = 10.0 # Timeout de cada chamada ao Google Cloud Storage
+    SLACK_TIMEOUT_SECONDS: float = 5.0 # Timeout de cada chamada à API do Slack
+    
     SLACK_TOKEN: str
+    SLACK_API_BASE_URL: str = "https://slack.com/api/" # Sobrescrito em benchmarks para apontar para um Slack falso
 
     # --- Configurações JWT ---
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256" # Algoritmo de hashing para o JWT
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 # Tempo de expiração do token em minutos
 
+    # --- Servidor de produção (gunicorn.conf.py) ---
+    WEB_CONCURRENCY: int = 0 # Número de workers; 0 usa a quantidade de CPUs
+    DRAIN_TIMEOUT_SECONDS: float = 8.0 # Prazo para concluir postbacks em andamento no desligamento
+    DRAIN_SPOOL_DIR: str = "/tmp/webhook-drain" # Postbacks interrompidos são gravados aqui para reenvio
+
+    # --- Armazenamento dos mapeamentos curso -> destinos ---
+    MAPPING_BACKEND: str = "gcs" # "gcs" (arquivo JSON em bucket_name/file_blob_name) ou "sqlite" (local)
+    MAPPING_DB_PATH: str = "/tmp/webhook-mappings.sqlite3" # Banco do backend "sqlite" (WAL), compartilhado pelos workers
+    MAPPING_REFRESH_SECONDS: float = 60.0 # Intervalo de recarga do cache de mapeamentos
+
+    # --- Prontidão (/readyz) ---
+    STARTUP_WARMUP_TIMEOUT_SECONDS: float = 20.0 # Prazo do warm-up antes de aceitar requisições
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 30.0 # Intervalo das verificações de dependências em segundo plano
+
+    # --- Controle de admissão (load shedding) ---
+    ADMISSION_MAX_INFLIGHT_POSTBACKS: int = 200 # Postbacks simultâneos por worker; 0 desliga o controle
+    ADMISSION_ADAPTIVE: bool = False # Ajusta o limite conforme a latência observada da Comunitive
+    ADMISSION_MIN_INFLIGHT_POSTBACKS: int = 10 # Piso do limite adaptativo
+    ADMISSION_TARGET_LATENCY_MS: float = 1000.0 # Latência alvo da Comunitive para o modo adaptativo
+    ADMISSION_ADMIN_RESERVED: int = 10 # Capacidade reservada aos endpoints /auth e /scorm
+    ADMISSION_RETRY_AFTER_SECONDS: int = 5 # Base do Retry-After (mais jitter de até o mesmo valor)
+
+    # --- Log de eventos de conclusão (segmentos enviados ao GCS) ---
+    EVENT_LOG_ENABLED: bool = True
+    EVENT_LOG_DIR: str = "/tmp/webhook-events" # Segmentos ainda não enviados
+    EVENT_LOG_BUCKET: str = Field(default="") # Vazio usa bucket_name
+    EVENT_LOG_PREFIX: str = "completion-events" # Objetos em <prefixo>/AAAA/MM/DD/segment-*.jsonl.gz
+    EVENT_LOG_SEGMENT_MAX_MB: int = 8 # Tamanho (descomprimido) para selar o segmento
+    EVENT_LOG_SEGMENT_MAX_SECONDS: float = 300 # Idade máxima do segmento ativo
+    EVENT_LOG_MAX_LOCAL_MB: int = 512 # Segmentos mais antigos são descartados acima deste total
+    EVENT_LOG_UPLOAD_RETRY_SECONDS: float = 30 # Intervalo entre tentativas de upload
+
+    # --- Histórico de entregas (consultável em /scorm/deliveries) ---
+    DELIVERY_HISTORY_ENABLED: bool = True
+    DELIVERY_HISTORY_DB_PATH: str = "/tmp/webhook-deliveries.sqlite3" # Banco SQLite (WAL) compartilhado pelos workers
+
+    # --- Estatísticas por curso (consultáveis em /scorm/stats) ---
+    COURSE_STATS_ENABLED: bool = True
+    COURSE_STATS_DB_PATH: str = "/tmp/webhook-course-stats.sqlite3"
+    COURSE_STATS_CHECKPOINT_SECONDS: float = 10.0 # Intervalo de gravação dos contadores em memória
+
+    # --- Dispatcher particionado (ordem por aluno, paralelismo entre alunos) ---
+    DISPATCH_PARTITIONS: int = 64 # Partições (workers asyncio) por processo; 0 processa direto na requisição
+    DISPATCH_PARTITION_QUEUE_SIZE: int = 50 # Itens na fila de cada partição antes de responder 503
+    DISPATCH_PARTITION_KEY: str = "learner" # "learner" (learner.id) ou "registration" (id do registro)
+
+    # --- Fila de mensagens mortas (postbacks que não chegaram à Comunitive, com replay) ---
+    DEAD_LETTER_ENABLED: bool = True
+    DEAD_LETTER_DB_PATH: str = "/tmp/webhook-dead-letters.sqlite3"
+    DEAD_LETTER_REPLAY_CONCURRENCY: int = 20 # Postbacks reenviados ao mesmo tempo em um replay
+    DEAD_LETTER_REPLAY_RATE_PER_SECOND: float = 50.0 # Limite de reenvios por segundo (0 desliga)
+
+    # --- Logging ---
+    LOG_LEVEL: str = "INFO" # Nível do root logger
+    LOG_LEVELS: str = Field(default="") # Níveis por módulo, ex: "app.google_cloud_storage=WARNING,app.services=DEBUG"
+    LOG_FORMAT: str = "json" # "json" (estruturado) ou "text"
+    LOG_QUEUE_SIZE: int = 10000 # Registros além deste limite são descartados para não bloquear o event loop
+
+    # --- Captura de tráfego de postbacks (para replay) ---
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_SAMPLE_RATE: float = 1.0 # Fração dos postbacks capturados
+    CAPTURE_DIR: str = "/tmp/webhook-capture"
+    CAPTURE_MAX_FILE_MB: int = 64 # Tamanho (descomprimido) para rotacionar o arquivo
+    CAPTURE_ROTATE_SECONDS: float = 3600 # Idade máxima de um arquivo de captura
+    CAPTURE_MAX_FILES: int = 48 # Arquivos mais antigos são removidos
+    CAPTURE_REDACTION_SALT: str = Field(default="") # Chave do HMAC que pseudonimiza o aluno; obrigatória com CAPTURE_ENABLED
+
+    # --- Profiling e captura de requisições lentas ---
+    PROFILING_ENABLED: bool = False # Liga o middleware de profiling (sem custo quando False)
+    PROFILING_HEADER_TOKEN: str = Field(default="") # Valor esperado no cabeçalho X-Profile-Token
+    PROFILING_SAMPLE_RATE: float = 0.0 # Fração de requisições perfiladas por amostragem (0.0 a 1.0)
+    PROFILING_OUTPUT_DIR: str = "/tmp/webhook-profiles" # Diretório onde os perfis HTML são gravados
+    SLOW_REQUEST_THRESHOLD_MS: float = 0.0 # Requisições acima deste tempo são logadas (0 desliga)
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.5 # Intervalo de amostragem do atraso do event loop
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,107 +1,298 @@
 # app/usecases/process_scorm_postback.py
 
+import asyncio
 import logging
-from typing import Dict, Any
+import time
+from typing import Callable, Dict, Any, List, Optional, Sequence
 
 from fastapi import HTTPException
 
-from app.api.schemas.scorm_postback import ScormRegistrationPostback # Ajuste o caminho se necessário
 from app.services.gcs_mapper import GCSMapper, GCSMapperError
+from app.services.postback_event import PostbackEvent
 from app.services.slack import send_slack_message # Função para enviar mensagens para o Slack
 from app.services.comunitive import notificacao_curso # Função do serviço Comunitive
+from app.services.delivery_events import (
+    DeliveryRecord, DeliverySink, emit_delivery_record,
+    OUTCOME_DELIVERED, OUTCOME_PARTIAL, OUTCOME_NO_MAPPING, OUTCOME_COMUNITIVE_ERROR, OUTCOME_ERROR,
+)
 
-from app.errors import MappingNotFoundError, ComunitiveNotificationError, ScormPostbackProcessingError
+from app.errors import MappingNotFoundError, ComunitiveNotificationError, ScormPostbackProcessingError, DeadlineExceededError
+from app.observability.deadline import Deadline, deadline_metrics
+from app.observability.stages import track_stage
+from app.settings import settings
 
 logger = logging.getLogger(__name__)
 
+def not_completed_response(completion_status: Optional[str]) -> Dict[str, Any]:
+    """Resposta para postbacks cuja atividade ainda não foi concluída (nada é enviado à Comunitive)."""
+    return {
+        "status": "success",
+        "detail": f"Postback recebido, mas a conclusão da atividade não é 'completed' ou está ausente. Status: {completion_status}"
+    }
+
 class ProcessScormPostbackUseCase:
     """
     Args:
         gcs_mapper (GCSMapper): Instância responsável por carregar os mapeamentos de cursos do GCS.
         slack_messenger (callable, opcional): Função para enviar mensagens ao Slack. **Default**: `send_slack_message`.
-        comunitive_notifier (callable, opcional): Função para notificar a Comunitive sobre a conclusão do curso. **Default**: `notificacao_curso`.
+        comunitive_notifier (callable, opcional): Função para notificar a Comunitive sobre a conclusão do curso. **Default**: `notificacao_curso` (alternativa: `ComunitiveBatchNotifier`, em lotes).
+        downstream_latency_observer (callable, opcional): Recebe a duração (segundos) de cada chamada à Comunitive, ex: o controle de admissão adaptativo.
+        event_sinks (sequência de callables, opcional): Recebem um `DeliveryRecord` para cada postback concluído, qualquer que seja o resultado (ex: o log de eventos de conclusão).
+        destination_retries (int, opcional): Novas tentativas por destino em falhas transitórias. **Default**: `COMUNITIVE_DESTINATION_RETRIES`.
+        retry_backoff_seconds (float, opcional): Espera antes da primeira nova tentativa (dobra a cada tentativa). **Default**: `COMUNITIVE_RETRY_BACKOFF_SECONDS`.
         - Verifica se o status de conclusão da atividade é "completed".
-        - Obtém a URI do webhook da Comunitive correspondente ao curso.
-        - Notifica a Comunitive sobre a conclusão do curso.
-        - Envia mensagens de sucesso ou aviso ao Slack.
+        - Obtém as URIs de webhook da Comunitive (um ou mais destinos) correspondentes ao curso.
+        - Notifica todos os destinos em paralelo; falhas parciais são reportadas por destino.
+        - Envia mensagens de sucesso ou aviso ao Slack (em uma thread, sem bloquear o event loop).
+        - Respeita o prazo total do postback (`deadline`): cada etapa recebe o que sobrou dele, e o que
+          não puder terminar a tempo é abandonado (o postback vai para a fila de mensagens mortas).
         - Lida com exceções específicas e inesperadas, levantando erros apropriados.
     """
     def __init__(self, 
                  gcs_mapper: GCSMapper, 
                  slack_messenger: callable = send_slack_message, 
-                 comunitive_notifier: callable = notificacao_curso):
+                 comunitive_notifier: callable = notificacao_curso,
+                 downstream_latency_observer: Optional[Callable[[float], None]] = None,
+                 event_sinks: Sequence[DeliverySink] = (),
+                 destination_retries: int = settings.COMUNITIVE_DESTINATION_RETRIES,
+                 retry_backoff_seconds: float = settings.COMUNITIVE_RETRY_BACKOFF_SECONDS):
         self.gcs_mapper = gcs_mapper
         self.slack_messenger = slack_messenger
         self.comunitive_notifier = comunitive_notifier # Função para notificar a Comunitive
+        self.downstream_latency_observer = downstream_latency_observer
+        self.event_sinks = event_sinks
+        self.destination_retries = destination_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
 
-    async def execute(self, postback_data: ScormRegistrationPostback) -> Dict[str, Any]:
-        logger.info(f"Iniciando processamento do postback para curso ID: {postback_data.course.id}")
+    async def execute(self,
+                      event: PostbackEvent,
+                      destinations: Optional[Sequence[str]] = None,
+                      deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Processa o postback (já convertido em `PostbackEvent` na entrada). `destinations` restringe a notificação a essas URIs, sem consultar o
+        mapeamento (usado no replay de uma entrega parcial, para não notificar de novo quem já recebeu).
+        `deadline` é o prazo total do postback, criado quando a requisição chegou.
+        """
+        logger.info("Iniciando processamento do postback para curso ID: %s", event.course_id)
 
         # Validação de conclusão
-        completion_status = postback_data.activityDetails.activityCompletion
-        if not completion_status or completion_status.lower() != "completed":
-            logger.info(f"Postback recebido, mas status de conclusão não é 'completed' ou está ausente: {completion_status}")
+        if not event.completed:
+            logger.info("Postback recebido, mas status de conclusão não é 'completed' ou está ausente: %s", event.completion)
+            return not_completed_response(event.completion)
+
+        record = DeliveryRecord(
+            registration_id=event.registration_id,
+            course_id=event.course_id,
+            learner_id=event.learner_id,
+            course_version=event.course_version,
+            registration_success=event.success,
+            completed_date=event.completed_date,
+            score=event.score,
+            seconds_tracked=event.seconds_tracked,
+        )
+        cancelled = False
+        try:
+            response = await self._deliver(event, record, destinations, deadline)
+            if record.outcome != OUTCOME_PARTIAL:
+                record.outcome = OUTCOME_DELIVERED
+            return response
+        except MappingNotFoundError:
+            record.outcome = OUTCOME_NO_MAPPING
+            raise
+        except ComunitiveNotificationError as e:
+            record.outcome = OUTCOME_COMUNITIVE_ERROR
+            record.comunitive_status = e.status_code
+            record.error = str(e.detail)
+            raise
+        except asyncio.CancelledError:
+            # Interrompido (ex: desligamento): o corpo vai para o spool de desligamento, que é a
+            # única fonte do reenvio; registrar aqui duplicaria o postback na fila de mensagens mortas
+            cancelled = True
+            raise
+        except Exception as e:
+            record.outcome = OUTCOME_ERROR
+            record.error = str(e)
+            raise
+        finally:
+            if self.event_sinks and not cancelled:
+                emit_delivery_record(self.event_sinks, record)
+
+    async def _deliver(self,
+                       event: PostbackEvent,
+                       record: DeliveryRecord,
+                       destinations: Optional[Sequence[str]] = None,
+                       deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Obtém os destinos mapeados e notifica a Comunitive, preenchendo o `record` com o que aconteceu."""
+        course_id = event.course_id
+        learner_email = event.learner_id
+        if deadline is not None:
+            deadline.check("queue") # O prazo pode ter acabado na fila do dispatcher
+
+        # Obtém as URIs dos webhooks
+        if destinations:
+            webhook_uris = list(dict.fromkeys(destinations))
+        else:
+            with track_stage("mapping_lookup"):
+                webhook_uris = await self._within(deadline, "mapping_lookup", self._get_comunitive_webhook_uris(
+                    course_id, tags=list(event.tags), course_version=event.course_version, deadline=deadline
+                ))
+        record.webhook_uri = ", ".join(webhook_uris)
+
+        # Notifica todos os destinos em paralelo; apenas os que falharem são tentados de novo
+        notify_started = time.perf_counter()
+        with track_stage("comunitive_notify"):
+            results = await self._notify_destinations(learner_email, webhook_uris, deadline)
+        record.comunitive_latency_ms = round((time.perf_counter() - notify_started) * 1000, 2)
+        record.destinations = [result.to_dict() for result in results]
+
+        failed = [result for result in results if not result.ok]
+        if len(failed) == len(results):
+            # Nenhum destino notificado: mantém o comportamento de um único destino (erro, o SCORM Cloud reenvia)
+            first = failed[0]
+            if first.exception is not None and not isinstance(first.exception, (HTTPException, DeadlineExceededError)):
+                raise ScormPostbackProcessingError(
+                    message=f"Erro inesperado ao chamar o notificador da Comunitive para o curso {course_id}.",
+                    original_exception=first.exception
+                ) from first.exception
+            raise ComunitiveNotificationError(
+                uri=first.uri,
+                status_code=first.status_code,
+                detail=first.detail,
+                message=f"Falha ao notificar Comunitive para o curso {course_id}."
+            ) from first.exception
+
+        record.comunitive_status = failed[0].status_code if failed else 200 # notificacao_curso só retorna em respostas 2xx
+        if failed:
+            record.outcome = OUTCOME_PARTIAL
+            record.error = "; ".join(f"{result.uri}: {result.status_code} {result.detail}" for result in failed)
+            await self.send_alert(
+                f"⚠️ PARCIAL: Postback do SCORM para `{course_id}` enviado a {len(results) - len(failed)} de {len(results)} destinos. "
+                f"Falharam: " + ", ".join(f"`{result.uri}` (status `{result.status_code}`)" for result in failed),
+                deadline
+            )
             return {
-                "status": "success",
-                "detail": f"Postback recebido, mas a conclusão da atividade não é 'completed' ou está ausente. Status: {completion_status}"
+                "status": "parcial",
+                "detalhe": f"Notificação enviada a {len(results) - len(failed)} de {len(results)} destinos da Comunitive.",
+                "destinos": record.destinations,
             }
 
-        course_id = postback_data.course.id
-        learner_email = postback_data.learner.id
+        await self.send_alert(f"✅ SUCESSO: Postback do SCORM para `{course_id}` processado e enviado para Comunitive: `{record.webhook_uri}`.", deadline)
+        if len(results) == 1:
+            return results[0].response
+        return {
+            "status": "sucesso",
+            "detalhe": f"Notificação enviada aos {len(results)} destinos da Comunitive com sucesso.",
+            "destinos": record.destinations,
+        }
 
-        # Obtém a URI do webhook
-        comunitive_webhook_uri = await self._get_comunitive_webhook_uri(course_id)
+    async def _within(self, deadline: Optional[Deadline], stage: str, awaitable):
+        """Aguarda `awaitable` dentro do prazo do postback, se houver um."""
+        if deadline is None:
+            return await awaitable
+        return await deadline.run(stage, awaitable)
 
-        # Chama o serviço da Comunitive
+    async def send_alert(self, message: str, deadline: Optional[Deadline] = None) -> None:
+        """
+        Envia a mensagem ao Slack em uma thread, dentro do prazo restante. O alerta nunca muda o
+        resultado do postback: sem prazo ou com erro no Slack, a mensagem fica só no log.
+        """
+        if deadline is not None and deadline.expired:
+            deadline_metrics.skipped_alerts += 1
+            logger.warning("Alerta ao Slack descartado por falta de prazo: %s", message)
+            return
         try:
-            response = await self.comunitive_notifier(
-                user_email=learner_email,
-                comunitive_webhook_uri=comunitive_webhook_uri
-            )
-            
-            self.slack_messenger(f"✅ SUCESSO: Postback do SCORM para `{course_id}` processado e enviado para Comunitive: `{comunitive_webhook_uri}`.")
-            return response
+            with track_stage("slack"):
+                await self._within(deadline, "slack", asyncio.to_thread(self.slack_messenger, message))
+        except DeadlineExceededError:
+            deadline_metrics.skipped_alerts += 1
+        except Exception as e:
+            logger.error("Erro ao enviar alerta ao Slack: %s. Mensagem: %s", e, message)
+
+    async def _notify_destinations(self,
+                                   learner_email: str,
+                                   webhook_uris: List[str],
+                                   deadline: Optional[Deadline] = None) -> List["DestinationResult"]:
+        """
+        Notifica todas as URIs em paralelo. Destinos com falha transitória (rede, 429 ou 5xx) são
+        tentados novamente até `destination_retries` vezes, com backoff exponencial, sem reenviar
+        aos destinos que já responderam com sucesso. Não há nova tentativa se o prazo do postback
+        não comportar a espera do backoff.
+        """
+        results: Dict[str, DestinationResult] = {}
+        pending = list(webhook_uris)
+        attempt = 0
+        while True:
+            outcomes = await asyncio.gather(*(self._notify_one(learner_email, uri, deadline) for uri in pending))
+            for outcome in outcomes:
+                results[outcome.uri] = outcome
+            pending = [outcome.uri for outcome in outcomes if not outcome.ok and outcome.retryable]
+            if not pending or attempt >= self.destination_retries:
+                break
+            backoff = self.retry_backoff_seconds * 2 ** attempt
+            if deadline is not None and deadline.remaining() <= backoff:
+                logger.info("Sem prazo para nova tentativa em %s destino(s) da Comunitive.", len(pending))
+                break
+            await asyncio.sleep(backoff)
+            attempt += 1
+            logger.info("Nova tentativa (%s) para %s destino(s) da Comunitive.", attempt, len(pending))
+        return [results[uri] for uri in webhook_uris]
 
+    async def _notify_one(self, learner_email: str, webhook_uri: str, deadline: Optional[Deadline] = None) -> "DestinationResult":
+        started = time.perf_counter()
+        try:
+            response = await self._within(deadline, "comunitive_notify", self.comunitive_notifier(
+                user_email=learner_email,
+                comunitive_webhook_uri=webhook_uri
+            ))
+            return DestinationResult(webhook_uri, status_code=200, response=response)
+        except DeadlineExceededError as e:
+            return DestinationResult(webhook_uri, status_code=504, detail=str(e), exception=e)
         except HTTPException as e:
-            raise ComunitiveNotificationError(
-                uri=comunitive_webhook_uri,
-                status_code=e.status_code,
-                detail=e.detail,
-                message=f"Falha ao notificar Comunitive para o curso {course_id}."
-            ) from e
+            return DestinationResult(webhook_uri, status_code=e.status_code, detail=e.detail, exception=e)
         except Exception as e:
-            raise ScormPostbackProcessingError(
-                message=f"Erro inesperado ao chamar o notificador da Comunitive para o curso {course_id}.",
-                original_exception=e
-            ) from e
+            return DestinationResult(webhook_uri, status_code=500, detail=str(e), exception=e)
+        finally:
+            if self.downstream_latency_observer is not None:
+                self.downstream_latency_observer(time.perf_counter() - started)
 
-    async def _get_comunitive_webhook_uri(self, course_id: str) -> str:
+    async def _get_comunitive_webhook_uris(self,
+                                           course_id: str,
+                                           tags: Optional[List[str]] = None,
+                                           course_version: Optional[int] = None,
+                                           deadline: Optional[Deadline] = None) -> List[str]:
         """
-        Obtém a URI do webhook da Comunitive para um determinado curso.
-        Este método tenta recuperar a URI do webhook da Comunitive a partir do mapeamento carregado pelo `GCSMapper`.
-        Se não encontrar a URI correspondente ao `course_id` fornecido, envia um aviso para o Slack e levanta uma exceção `MappingNotFoundError`.
+        Obtém as URIs de webhook da Comunitive (um ou mais destinos) para um determinado curso.
+        Este método resolve as URIs pelo mapeamento carregado pelo `GCSMapper`: a chave exata do curso
+        (uma URI ou uma lista) ou, na falta dela, a regra de roteamento que casar com o curso, as tags e a versão.
+        Se não encontrar nenhuma URI correspondente ao `course_id` fornecido, envia um aviso para o Slack e levanta uma exceção `MappingNotFoundError`.
         Em caso de erro ao carregar os mapeamentos ou qualquer outra exceção inesperada, levanta uma exceção `ScormPostbackProcessingError`.
         Args:
-            course_id (str): **ID do curso** para o qual se deseja obter a URI do webhook da Comunitive.
+            course_id (str): **ID do curso** para o qual se deseja obter as URIs de webhook da Comunitive.
+            tags (List[str], opcional): Tags do postback, usadas pelas regras de roteamento.
+            course_version (int, opcional): Versão do curso, usada pelas regras de roteamento.
+            deadline (Deadline, opcional): Prazo do postback, respeitado pelo aviso ao Slack.
         Returns:
-            str: **URI do webhook** da Comunitive associada ao `course_id` informado.
+            List[str]: **URIs de webhook** da Comunitive associadas ao `course_id` informado, sem repetições.
         
         Raises:
             MappingNotFoundError: Se não houver URI mapeada para o `course_id`.
             ScormPostbackProcessingError: Se ocorrer erro ao carregar os mapeamentos ou qualquer exceção inesperada.
         """
         try:
-            mappings = await self.gcs_mapper.load_mappings()
-            comunitive_webhook_uri = mappings.get(course_id)
+            webhook_uris = await self.gcs_mapper.resolve_destinations(course_id, tags=tags, course_version=course_version)
 
-            if not comunitive_webhook_uri:
+            if not webhook_uris:
                 # Envia um aviso para o Slack antes de levantar a exceção
-                self.slack_messenger(
-                    f"⚠️ AVISO: Postback do SCORM para curso `{course_id}` recebido, mas NENHUMA URI da Comunitive encontrada no mapeamento do GCS. Postback não será enviado à Comunitive."
+                await self.send_alert(
+                    f"⚠️ AVISO: Postback do SCORM para curso `{course_id}` recebido, mas NENHUMA URI da Comunitive encontrada no mapeamento do GCS. Postback não será enviado à Comunitive.",
+                    deadline
                     )
                 raise MappingNotFoundError(course_id=course_id)
             
-            return comunitive_webhook_uri
+            return webhook_uris
+
+        except MappingNotFoundError:
+            raise # Não é um erro de processamento: o registro da entrega fica como no_mapping
         
         except GCSMapperError as e:
             # Re-lança GCSMapperError como uma exceção do Use Case para manter a consistência
@@ -116,3 +307,30 @@ class ProcessScormPostbackUseCase:
                 message=f"Erro inesperado ao obter URI do webhook da Comunitive para curso {course_id}.",
                 original_exception=e
             ) from e
+
+
+class DestinationResult:
+    """Resultado da notificação a um destino (URI) da Comunitive."""
+    __slots__ = ("uri", "status_code", "detail", "response", "exception")
+
+    def __init__(self, uri: str, status_code: int, detail: Any = None,
+                 response: Optional[Dict[str, Any]] = None, exception: Optional[Exception] = None):
+        self.uri = uri
+        self.status_code = status_code
+        self.detail = detail
+        self.response = response
+        self.exception = exception
+
+    @property
+    def ok(self) -> bool:
+        return self.exception is None
+
+    @property
+    def retryable(self) -> bool:
+        """Falhas de rede (502), limite de taxa (429) e erros 5xx podem ser transitórios."""
+        return self.status_code == 429 or self.status_code >= 500
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.ok:
+            return {"uri": self.uri, "status": "sucesso", "status_code": self.status_code}
+        return {"uri": self.uri, "status": "erro", "status_code": self.status_code, "detalhe": str(self.detail)}
@@ -0,0 +1,143 @@
+# app/usecases/replay_dead_letters.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pydantic import ValidationError
+
+from app.api.schemas.scorm_postback import ScormRegistrationPostback
+from app.services.dead_letter import DeadLetter, DeadLetterStore
+from app.services.postback_event import PostbackEvent
+from app.services.delivery_events import DeliverySink
+from app.services.dispatcher import PartitionedDispatcher, PartitionQueueFullError, postback_partition_key
+from app.services.slack import send_slack_message
+from app.usecases.process_scorm_postback import ProcessScormPostbackUseCase
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre gravações do progresso de um replay
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+
+class RateLimiter:
+    """Espaça as chamadas de `wait` para no máximo `rate_per_second` por segundo (0 desliga)."""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval # Reserva o horário antes de dormir, para as tarefas não colidirem
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ReplayDeadLettersUseCase:
+    """
+    Args:
+        store (DeadLetterStore): Fila de mensagens mortas de onde os postbacks são lidos.
+        use_case_factory (callable): Recebe a lista de event sinks e retorna o `ProcessScormPostbackUseCase` usado no replay.
+        event_sinks (sequência de callables, opcional): Destinos dos `DeliveryRecord` gerados no replay, além da própria fila.
+        concurrency (int): Postbacks reenviados ao mesmo tempo.
+        rate_per_second (float): Limite de postbacks reenviados por segundo (0 desliga).
+        slack_messenger (callable, opcional): Recebe o resumo ao final. **Default**: `send_slack_message`.
+        dispatcher (PartitionedDispatcher, opcional): Dispatcher dos postbacks recebidos. Com ele, cada replay entra na partição da mesma chave (registro ou aluno) e fica em ordem com os reenvios do SCORM Cloud.
+        - Reserva as mensagens pendentes que casam com os filtros (nenhum outro replay as pega).
+        - Reenvia cada uma pelo `ProcessScormPostbackUseCase`; entregas parciais só aos destinos que falharam.
+        - O resultado de cada uma atualiza a fila: resolvida no sucesso, uma tentativa a mais na falha.
+        - Mensagens não processadas (ex: shutdown no meio do replay) voltam a ficar pendentes.
+    """
+    def __init__(self,
+                 store: DeadLetterStore,
+                 use_case_factory: Callable[[Sequence[DeliverySink]], ProcessScormPostbackUseCase],
+                 event_sinks: Sequence[DeliverySink] = (),
+                 concurrency: int = 20,
+                 rate_per_second: float = 50.0,
+                 slack_messenger: callable = send_slack_message,
+                 dispatcher: Optional[PartitionedDispatcher] = None):
+        self.store = store
+        self.use_case_factory = use_case_factory
+        self.event_sinks = event_sinks
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.slack_messenger = slack_messenger
+        self.dispatcher = dispatcher
+        self.succeeded = 0
+        self.failed = 0
+
+    async def claim(self, filters: Dict[str, Any], limit: int) -> List[DeadLetter]:
+        """Reserva as mensagens a reenviar."""
+        return await asyncio.to_thread(self.store.claim, limit=limit, **filters)
+
+    async def execute(self, replay_id: str, letters: List[DeadLetter]) -> Dict[str, Any]:
+        logger.info("Iniciando replay %s de %s mensagem(ns) morta(s).", replay_id, len(letters))
+        started = time.perf_counter()
+        pending = {letter.id: letter for letter in letters}
+        iterator = iter(letters)
+        last_progress = time.monotonic()
+
+        async def worker() -> None:
+            nonlocal last_progress
+            for letter in iterator:
+                await self.rate_limiter.wait()
+                if await self._replay_one(letter):
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+                del pending[letter.id]
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                    last_progress = time.monotonic()
+                    await asyncio.to_thread(self.store.update_replay, replay_id, self.succeeded, self.failed)
+
+        state = "failed"
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(letters)))))
+            state = "finished"
+        finally:
+            if pending:
+                # Interrompido: devolve à fila o que não chegou a ser reenviado
+                await asyncio.to_thread(self.store.release, list(pending))
+            await asyncio.to_thread(self.store.update_replay, replay_id, self.succeeded, self.failed, state)
+
+        elapsed = time.perf_counter() - started
+        logger.info("Replay %s concluído em %.1fs: %s entregue(s), %s com falha.", replay_id, elapsed, self.succeeded, self.failed)
+        await asyncio.to_thread(
+            self.slack_messenger,
+            f"🔁 REPLAY: {self.succeeded} de {len(letters)} postback(s) da fila de mensagens mortas entregues à Comunitive "
+            f"em {elapsed:.0f}s ({self.failed} com falha)."
+        )
+        return {"replay_id": replay_id, "total": len(letters), "succeeded": self.succeeded, "failed": self.failed}
+
+    async def _replay_one(self, letter: DeadLetter) -> bool:
+        """Reenvia um postback; retorna True se todos os destinos foram notificados."""
+        try:
+            event = PostbackEvent.from_postback(ScormRegistrationPostback.model_validate_json(letter.payload))
+        except ValidationError as e:
+            logger.error("Mensagem morta %s com corpo inválido: %s", letter.id, e)
+            await asyncio.to_thread(self.store.release, [letter.id], f"Corpo inválido no replay: {e}")
+            return False
+
+        # O resultado (sucesso ou nova falha) volta para a fila pelo sink, como em um postback recebido
+        use_case = self.use_case_factory([*self.event_sinks, self.store.sink_for(letter.payload)])
+        run = lambda: use_case.execute(event, destinations=letter.replay_destinations)
+        try:
+            if self.dispatcher is None:
+                response = await run()
+            else:
+                # Mesma partição dos postbacks recebidos: não corre em paralelo com um reenvio do mesmo registro
+                response = await self.dispatcher.submit(postback_partition_key(event), run, label=event.course_id)
+        except PartitionQueueFullError as e:
+            # Nem chegou a ser processado: volta a ficar pendente para o próximo replay
+            logger.warning("Replay da mensagem morta %s adiado: %s", letter.id, e)
+            await asyncio.to_thread(self.store.release, [letter.id])
+            return False
+        except Exception as e:
+            logger.warning("Replay da mensagem morta %s (registro %s) falhou: %s", letter.id, letter.registration_id, e)
+            return False
+        return response.get("status") != "parcial"
@@ -0,0 +1,60 @@
+# benchmarks/bench_app.py
+
+"""
+A aplicação real (`app.main:app`) com as dependências externas trocadas pelos fakes locais.
+
+Configuração via variáveis de ambiente (definidas por benchmarks/load_test.py):
+- BENCH_COMUNITIVE_URL: URL base do webhook falso da Comunitive;
+- BENCH_MAPPED_COURSES: quantidade de cursos mapeados (course-0, course-1, ...);
+- BENCH_GCS_LATENCY_MS: latência (bloqueante) simulada em cada operação do GCS;
+- SLACK_API_BASE_URL: URL do Slack falso;
+- MAPPING_BACKEND: "gcs" (bucket falso em memória, padrão) ou "sqlite" (banco local em MAPPING_DB_PATH).
+
+Pode ser servida diretamente: `uvicorn benchmarks.bench_app:app`.
+"""
+
+import json
+import os
+
+from benchmarks.env import apply_default_env
+
+apply_default_env()
+
+from app.main import app
+from app.google_cloud_storage.bucket_manager import BucketManager
+from app.observability.loop_lag import loop_lag_monitor
+from app.services.event_log import completion_event_log
+from app.services.gcs_mapper import gcs_mapper
+from app.services.mapping_backends import GCSMappingBackend
+from app.settings import settings
+from benchmarks.fakes import FakeGoogleCloudStorage
+from benchmarks.payloads import mapped_course_ids
+
+fake_gcs = FakeGoogleCloudStorage(latency_ms=float(os.getenv("BENCH_GCS_LATENCY_MS", "0")))
+if isinstance(gcs_mapper.backend, GCSMappingBackend):
+    gcs_mapper.backend.bucket_manager = BucketManager(bucket_name=settings.bucket_name, google_cloud_storage=fake_gcs)
+if completion_event_log is not None:
+    completion_event_log.bucket_manager = BucketManager(bucket_name=settings.bucket_name, google_cloud_storage=fake_gcs)
+
+_comunitive_url = os.getenv("BENCH_COMUNITIVE_URL", "http://127.0.0.1:9")
+_mappings = {
+    course_id: f"{_comunitive_url}/webhooks/{course_id}"
+    for course_id in mapped_course_ids(int(os.getenv("BENCH_MAPPED_COURSES", "20")))
+}
+if isinstance(gcs_mapper.backend, GCSMappingBackend):
+    fake_gcs.client.bucket(settings.bucket_name).blob(settings.file_blob_name).upload_from_string(json.dumps(_mappings))
+else: # MAPPING_BACKEND=sqlite
+    gcs_mapper.backend.replace_all(_mappings)
+
+
+@app.get("/__bench/loop-lag", include_in_schema=False)
+async def bench_loop_lag():
+    """Atraso do event loop do processo que atendeu a chamada (o monitor inicia na primeira chamada)."""
+    if not loop_lag_monitor.running:
+        loop_lag_monitor.interval = 0.05
+        loop_lag_monitor.start()
+    return {
+        "pid": os.getpid(),
+        "last_ms": loop_lag_monitor.last_lag_ms,
+        "recent_max_ms": loop_lag_monitor.recent_max_lag_ms,
+    }
@@ -0,0 +1,89 @@
+# benchmarks/bench_delivery_history.py
+
+"""
+Benchmark do histórico de entregas (DeliveryHistoryStore) com uma tabela grande.
+
+Popula um banco SQLite temporário com --records registros sintéticos (pela thread de escrita,
+como em produção) e mede as consultas usadas pelo /scorm/deliveries: por aluno, por curso com
+intervalo de datas e a paginação profunda por cursor.
+
+Uso: python -m benchmarks.bench_delivery_history [--records 1000000] [--number 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import timeit
+
+from benchmarks.env import apply_default_env
+
+apply_default_env()
+
+from app.services.delivery_events import DeliveryRecord
+from app.services.delivery_history import DeliveryHistoryStore
+
+
+def report(name: str, seconds: float, number: int) -> None:
+    print(f"  {name:<46} {seconds / number * 1e3:>9.3f} ms/consulta")
+
+
+def populate(store: DeliveryHistoryStore, records: int, learners: int, courses: int) -> float:
+    rng = random.Random(7)
+    start_ts = time.time() - 365 * 86400
+    started = time.perf_counter()
+    for i in range(records):
+        ts = start_ts + i * (365 * 86400 / records)
+        store._queue.put(DeliveryRecord(
+            registration_id=f"reg-{i}",
+            course_id=f"course-{rng.randrange(courses)}",
+            learner_id=f"aluno{rng.randrange(learners)}@example.com",
+            outcome="delivered" if rng.random() > 0.02 else "comunitive_error",
+            completed_date=time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(ts)),
+            comunitive_status=200,
+            occurred_at=ts,
+        ))
+    store.close(timeout=3600)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--learners", type=int, default=50_000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeliveryHistoryStore(os.path.join(directory, "deliveries.sqlite3"), queue_size=0)
+        store.start()
+        elapsed = populate(store, args.records, args.learners, args.courses)
+        print(f"{args.records} registros gravados em {elapsed:.1f}s ({args.records / elapsed:,.0f} registros/s)")
+
+        rng = random.Random(11)
+        first_page = store.query(course_id="course-1", limit=50)
+        deep_cursor = first_page["next_cursor"]
+        for _ in range(20):
+            deep_cursor = store.query(course_id="course-1", limit=50, cursor=deep_cursor)["next_cursor"]
+
+        print("\nConsultas")
+        cases = {
+            "por aluno": lambda: store.query(learner_id=f"aluno{rng.randrange(args.learners)}@example.com"),
+            "por aluno e curso": lambda: store.query(
+                learner_id=f"aluno{rng.randrange(args.learners)}@example.com", course_id="course-1"),
+            "por curso, últimos 30 dias": lambda: store.query(
+                course_id=f"course-{rng.randrange(args.courses)}",
+                since=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() - 30 * 86400))),
+            "por curso, página 21 (cursor)": lambda: store.query(course_id="course-1", cursor=deep_cursor),
+            "todos, por intervalo de datas": lambda: store.query(
+                since=time.strftime("%Y-%m-%d", time.gmtime(time.time() - 90 * 86400)),
+                until=time.strftime("%Y-%m-%d", time.gmtime(time.time() - 60 * 86400))),
+        }
+        for name, func in cases.items():
+            report(name, timeit.timeit(func, number=args.number), args.number)
+
+
+if __name__ == "__main__":
+    main()
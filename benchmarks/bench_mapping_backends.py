@@ -0,0 +1,101 @@
+# benchmarks/bench_mapping_backends.py
+
+"""
+Compara os armazenamentos de mapeamento do GCSMapper: o arquivo JSON no GCS (bucket falso em
+memória, com latência configurável por operação) e o SQLite local (WAL, uma linha por curso).
+
+Para cada tamanho mede:
+- carga completa (read_all + compilação do roteamento), feita a cada recarga;
+- recarga periódica sem alterações (o SQLite só consulta a revisão);
+- busca de um curso pelo cache do GCSMapper (resolve_destinations), o caminho dos postbacks;
+- atualização de um único curso (upsert) e a substituição completa (replace_all) com 1% das chaves alteradas.
+
+Uso: python -m benchmarks.bench_mapping_backends [--sizes 1000,10000,100000] [--gcs-latency-ms 30]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.env import apply_default_env
+
+apply_default_env()
+
+from app.google_cloud_storage.bucket_manager import BucketManager
+from app.services.gcs_mapper import GCSMapper
+from app.services.mapping_backends import GCSMappingBackend, MappingBackend, SQLiteMappingBackend
+from benchmarks.fakes import FakeGoogleCloudStorage
+
+
+def build_mappings(size: int) -> dict:
+    return {
+        f"course-{i}": f"https://comunitive.example/webhooks/{i}" if i % 4 else [
+            f"https://comunitive.example/webhooks/{i}", f"https://comunitive.example/extra/{i}"
+        ]
+        for i in range(size)
+    }
+
+
+def timed(func, number: int) -> float:
+    """Média, em ms, de `number` chamadas."""
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - started) / number * 1000
+
+
+async def timed_async(func, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        await func()
+    return (time.perf_counter() - started) / number * 1000
+
+
+async def measure(name: str, backend: MappingBackend, mappings: dict, number: int) -> dict:
+    backend.replace_all(mappings)
+    mapper = GCSMapper(backend=backend, refresh_interval_seconds=0) # Toda chamada é uma recarga periódica
+    last = f"course-{len(mappings) - 1}"
+    loads = max(1, number // 20)
+
+    results = {"backend": name}
+    results["carga completa"] = await timed_async(lambda: mapper.load_mappings(force_reload=True), loads)
+    results["recarga sem alterações"] = await timed_async(mapper.load_mappings, loads)
+    mapper._cache_refresh_interval_seconds = 3600
+    results["resolve_destinations (cache)"] = await timed_async(lambda: mapper.resolve_destinations(last), number)
+    results["upsert de 1 curso"] = timed(lambda: backend.upsert({last: "https://comunitive.example/novo"}), loads)
+    changed = {**mappings, **{f"course-{i}": "https://comunitive.example/alterado" for i in range(0, len(mappings), 100)}}
+    results["replace_all (1% alterado)"] = timed(lambda: (backend.replace_all(changed), backend.replace_all(mappings)), max(1, loads // 4)) / 2
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    directory = tempfile.mkdtemp(prefix="bench-mappings-")
+    for size in args.sizes:
+        mappings = build_mappings(size)
+        fake_gcs = FakeGoogleCloudStorage(latency_ms=args.gcs_latency_ms)
+        backends = {
+            "gcs": GCSMappingBackend(BucketManager(bucket_name="bench", google_cloud_storage=fake_gcs), "mappings.json"),
+            "sqlite": SQLiteMappingBackend(os.path.join(directory, f"mappings-{size}.sqlite3")),
+        }
+        rows = [await measure(name, backend, mappings, args.number) for name, backend in backends.items()]
+
+        print(f"\n{size} cursos (latência do GCS falso: {args.gcs_latency_ms:.0f} ms/operação) — ms por operação")
+        print(f"  {'':<32}" + "".join(f"{row['backend']:>12}" for row in rows))
+        for metric in rows[0]:
+            if metric == "backend":
+                continue
+            print(f"  {metric:<32}" + "".join(f"{row[metric]:>12.3f}" for row in rows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[1000, 10000, 100000])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--gcs-latency-ms", type=float, default=30.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_parsing.py
+
+"""
+Microbenchmark do parsing dos postbacks e da serialização das respostas.
+
+Compara, para payloads representativos (concluídos e intermediários):
+- o caminho antigo: json.loads + ScormRegistrationPostback.model_validate (o que o FastAPI faz
+  com um parâmetro de corpo Pydantic);
+- a validação direta dos bytes com model_validate_json;
+- o pré-check de conclusão (ScormPostbackCompletionProbe) usado pelo caminho rápido;
+- json.dumps vs orjson.dumps para a resposta.
+
+Uso: python -m benchmarks.bench_parsing [--number 20000]
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+import orjson
+
+from benchmarks.env import apply_default_env
+
+apply_default_env()
+
+from app.api.schemas.scorm_postback import ScormPostbackCompletionProbe, ScormRegistrationPostback
+from app.usecases.process_scorm_postback import not_completed_response
+from benchmarks.payloads import build_postback
+
+
+def report(name: str, seconds: float, number: int) -> None:
+    print(f"  {name:<46} {seconds / number * 1e6:>9.2f} µs/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    payloads = {
+        "intermediário": json.dumps(build_postback("reg-1", "course-1", "aluno@example.com", False, rng)).encode(),
+        "concluído": json.dumps(build_postback("reg-2", "course-1", "aluno@example.com", True, rng)).encode(),
+    }
+
+    for label, body in payloads.items():
+        print(f"\nPayload {label} ({len(body)} bytes)")
+        cases = {
+            "json.loads + model_validate (antigo)": lambda: ScormRegistrationPostback.model_validate(json.loads(body)),
+            "model_validate_json (bytes)": lambda: ScormRegistrationPostback.model_validate_json(body),
+            "pré-check de conclusão (probe)": lambda: ScormPostbackCompletionProbe.model_validate_json(body),
+        }
+        for name, func in cases.items():
+            report(name, timeit.timeit(func, number=args.number), args.number)
+
+    response = not_completed_response("INCOMPLETE")
+    print("\nSerialização da resposta")
+    report("json.dumps", timeit.timeit(lambda: json.dumps(response).encode(), number=args.number), args.number)
+    report("orjson.dumps", timeit.timeit(lambda: orjson.dumps(response), number=args.number), args.number)
+
+
+if __name__ == "__main__":
+    main()
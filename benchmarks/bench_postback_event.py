@@ -0,0 +1,76 @@
+# benchmarks/bench_postback_event.py
+
+"""
+Compara o ScormRegistrationPostback (grafo Pydantic completo) com o PostbackEvent compacto
+usado internamente depois da entrada.
+
+Mede:
+- memória por evento retido (ex: na fila do dispatcher), com tracemalloc, para N eventos;
+- custo da conversão na entrada (PostbackEvent.from_postback), comparado à validação do corpo.
+
+Uso: python -m benchmarks.bench_postback_event [--events 10000] [--number 20000]
+"""
+
+import argparse
+import gc
+import json
+import random
+import timeit
+import tracemalloc
+
+from benchmarks.env import apply_default_env
+
+apply_default_env()
+
+from app.api.schemas.scorm_postback import ScormRegistrationPostback
+from app.services.postback_event import PostbackEvent
+from benchmarks.payloads import build_postback
+
+
+def retained_bytes(build) -> int:
+    """Bytes alocados (e ainda vivos) pelos objetos retornados por `build`."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return total
+
+
+def report(name: str, seconds: float, number: int) -> None:
+    print(f"  {name:<46} {seconds / number * 1e6:>9.2f} µs/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    bodies = [
+        json.dumps(build_postback(f"reg-{i}", f"course-{i % 50}", f"aluno{i}@example.com", True, rng)).encode()
+        for i in range(args.events)
+    ]
+
+    print(f"\nMemória retida por evento ({args.events} eventos)")
+    models = retained_bytes(lambda: [ScormRegistrationPostback.model_validate_json(body) for body in bodies])
+    events = retained_bytes(lambda: [PostbackEvent.from_postback(ScormRegistrationPostback.model_validate_json(body)) for body in bodies])
+    raw = retained_bytes(lambda: [bytes(bytearray(body)) for body in bodies]) # Cópias: o corpo retido pela requisição
+    print(f"  {'ScormRegistrationPostback':<46} {models / args.events:>9.0f} bytes")
+    print(f"  {'PostbackEvent':<46} {events / args.events:>9.0f} bytes")
+    print(f"  {'corpo bruto (bytes)':<46} {raw / args.events:>9.0f} bytes")
+
+    body = bodies[0]
+    model = ScormRegistrationPostback.model_validate_json(body)
+
+    print("\nConversão na entrada")
+    report("model_validate_json (entrada)", timeit.timeit(lambda: ScormRegistrationPostback.model_validate_json(body), number=args.number), args.number)
+    report("PostbackEvent.from_postback", timeit.timeit(lambda: PostbackEvent.from_postback(model), number=args.number), args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_routing.py
+
+"""
+Microbenchmark do roteamento compilado (CompiledRouter) com quantidades crescentes de regras.
+
+Para cada tamanho mede o tempo de compilação (feito a cada recarga do mapeamento) e o custo
+por busca de: chave exata, regra por prefixo, regra por glob, regra por tag e curso sem destino.
+O custo por busca deve ficar estável enquanto a quantidade de regras cresce.
+
+Uso: python -m benchmarks.bench_routing [--sizes 10,1000,100000] [--number 20000]
+"""
+
+import argparse
+import time
+import timeit
+
+from app.services.routing import RULES_KEY, CompiledRouter
+
+
+def build_mappings(size: int) -> dict:
+    mappings = {f"course-{i}": f"https://comunitive.example/webhooks/{i}" for i in range(size)}
+    rules = []
+    for i in range(size):
+        kind = i % 3
+        if kind == 0:
+            rules.append({"course_id_prefix": f"trilha-{i}-", "destinations": [f"https://comunitive.example/trilhas/{i}"]})
+        elif kind == 1:
+            rules.append({"course_id_glob": f"seg-{i}-*-v?", "course_version": 2, "destinations": [f"https://comunitive.example/seg/{i}"]})
+        else:
+            rules.append({"tags": [f"tag-{i}"], "priority": 1, "destinations": [f"https://comunitive.example/tags/{i}"]})
+    mappings[RULES_KEY] = rules
+    return mappings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[10, 1000, 100000])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        mappings = build_mappings(size)
+        started = time.perf_counter()
+        router = CompiledRouter(mappings)
+        compile_ms = (time.perf_counter() - started) * 1000
+        last = size - 1
+        prefix_i = last - last % 3
+        glob_i = prefix_i + 1 if prefix_i + 1 < size else 1
+        tag_i = prefix_i + 2 if prefix_i + 2 < size else 2
+        cases = {
+            "chave exata": lambda: router.resolve(f"course-{last}"),
+            "regra por prefixo": lambda: router.resolve(f"trilha-{prefix_i}-avancado"),
+            "regra por glob + versão": lambda: router.resolve(f"seg-{glob_i}-altura-v1", course_version=2),
+            "regra por tag": lambda: router.resolve("curso-livre", tags=["geral", f"tag-{tag_i}"]),
+            "sem destino": lambda: router.resolve("inexistente", tags=["geral"]),
+        }
+        print(f"\n{size} chaves exatas + {router.rule_count} regras (compilação: {compile_ms:.1f} ms)")
+        for name, func in cases.items():
+            seconds = timeit.timeit(func, number=args.number)
+            print(f"  {name:<28} {seconds / args.number * 1e6:>8.2f} µs/busca")
+
+
+if __name__ == "__main__":
+    main()
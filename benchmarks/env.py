@@ -0,0 +1,29 @@
+# benchmarks/env.py
+
+import os
+
+# Valores mínimos para que `Settings` carregue sem um .env real
+BENCH_DEFAULT_ENV = {
+    "ADMIN_USER_EMAIL": "bench@example.com",
+    "ADMIN_USER_PASSWORD": "bench",
+    "SCORM_APP_ID": "bench",
+    "SCORM_APP_SECRET": "bench",
+    "SCORM_POSTBACK_TARGET_URL": "http://127.0.0.1/notifications/scorm-comunitive",
+    "COMUNITIVE_API_KEY": "bench",
+    "SLACK_TOKEN": "xoxb-bench",
+    "JWT_SECRET_KEY": "bench",
+    "bucket_name": "bench-bucket",
+    "file_blob_name": "mappings.json",
+    "LOG_LEVEL": "WARNING",
+    "EVENT_LOG_DIR": "/tmp/webhook-bench-events",
+    "DELIVERY_HISTORY_DB_PATH": "/tmp/webhook-bench-deliveries.sqlite3",
+    "COURSE_STATS_DB_PATH": "/tmp/webhook-bench-course-stats.sqlite3",
+    "DEAD_LETTER_DB_PATH": "/tmp/webhook-bench-dead-letters.sqlite3",
+    "MAPPING_DB_PATH": "/tmp/webhook-bench-mappings.sqlite3",
+}
+
+
+def apply_default_env() -> None:
+    """Define as variáveis de ambiente ausentes; deve rodar antes de importar `app`."""
+    for name, value in BENCH_DEFAULT_ENV.items():
+        os.environ.setdefault(name, value)
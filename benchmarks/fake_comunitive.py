@@ -0,0 +1,31 @@
+# benchmarks/fake_comunitive.py
+
+"""
+Sobe a Comunitive falsa (webhooks e API de lotes) para testar a aplicação localmente, ex:
+
+    python -m benchmarks.fake_comunitive --port 8081 --latency-ms 50 --api-key dev
+    COMUNITIVE_NOTIFIER=batch COMUNITIVE_API_URL=http://127.0.0.1:8081 COMUNITIVE_API_KEY=dev uvicorn app.main:app
+
+GET /__stats mostra as chamadas recebidas (requests, batches, batch_items, errors).
+"""
+
+import argparse
+
+import uvicorn
+
+from benchmarks.fakes import create_fake_comunitive_app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--api-key", help="Chave exigida na API de lotes (Bearer); sem ela, qualquer chave é aceita")
+    args = parser.parse_args()
+    uvicorn.run(create_fake_comunitive_app(args.latency_ms, args.error_rate, api_key=args.api_key), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# benchmarks/fakes.py
+
+"""
+Substitutos locais das dependências externas usados pelos benchmarks:
+- FakeGoogleCloudStorage: bucket em memória com a mesma interface usada pelo BucketManager;
+- create_fake_comunitive_app: webhooks e API de lotes da Comunitive com latência e taxa de erro configuráveis;
+- create_fake_slack_app: endpoint chat.postMessage do Slack;
+- BackgroundServer: roda um app ASGI com uvicorn em uma thread própria.
+"""
+
+import asyncio
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+# --- Google Cloud Storage ---
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def updated(self) -> datetime:
+        return self.bucket.updated_at.get(self.name, datetime.min.replace(tzinfo=timezone.utc))
+
+    def exists(self, timeout: Optional[float] = None) -> bool:
+        self.bucket.simulate_latency()
+        return self.name in self.bucket.objects
+
+    def download_as_string(self, timeout: Optional[float] = None) -> bytes:
+        self.bucket.simulate_latency()
+        return self.bucket.objects[self.name]
+
+    def download_to_file(self, file_obj) -> None:
+        file_obj.write(self.download_as_string())
+
+    def download_to_filename(self, file_name: str, timeout: Optional[float] = None) -> None:
+        with open(file_name, "wb") as f:
+            self.download_to_file(f)
+
+    def upload_from_string(self, content, content_type: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        self.bucket.simulate_latency()
+        self.bucket.objects[self.name] = content.encode("utf-8") if isinstance(content, str) else content
+        self.bucket.updated_at[self.name] = datetime.now(timezone.utc)
+
+    def upload_from_filename(self, file_name: str, timeout: Optional[float] = None) -> None:
+        with open(file_name, "rb") as f:
+            self.upload_from_string(f.read())
+
+
+class FakeBucket:
+    def __init__(self, name: str, latency_ms: float = 0.0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.objects: Dict[str, bytes] = {}
+        self.updated_at: Dict[str, datetime] = {}
+
+    def simulate_latency(self) -> None:
+        # Bloqueante de propósito: o cliente real do GCS também é síncrono
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+
+    def blob(self, blob_name: str) -> FakeBlob:
+        return FakeBlob(self, blob_name)
+
+    def list_blobs(self):
+        return [FakeBlob(self, name) for name in list(self.objects)]
+
+
+class FakeStorageClient:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.buckets: Dict[str, FakeBucket] = {}
+
+    def bucket(self, bucket_name: str) -> FakeBucket:
+        if bucket_name not in self.buckets:
+            self.buckets[bucket_name] = FakeBucket(bucket_name, self.latency_ms)
+        return self.buckets[bucket_name]
+
+
+class FakeGoogleCloudStorage:
+    """Mesma interface de `GoogleCloudStorage` (atributo `client`), para injetar no BucketManager."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.client = FakeStorageClient(latency_ms)
+
+
+# --- Comunitive ---
+
+def create_fake_comunitive_app(latency_ms: float = 0.0, error_rate: float = 0.0, api_key: Optional[str] = None) -> FastAPI:
+    """
+    Comunitive falsa. Os webhooks respondem `{"id": ...}` como a API real, após `latency_ms`,
+    e devolvem HTTP 500 em uma fração `error_rate` das chamadas.
+
+    POST /v1/webhooks/batch recebe os lotes do ComunitiveBatchNotifier: exige `Bearer <api_key>`
+    (quando informada), espera `latency_ms` uma vez por lote e responde um resultado por item,
+    com a mesma `error_rate` aplicada a cada item.
+    """
+    fake = FastAPI()
+    fake.state.stats = {"requests": 0, "errors": 0, "batches": 0, "batch_items": 0}
+
+    @fake.post("/webhooks/{course_id}")
+    async def webhook(course_id: str):
+        fake.state.stats["requests"] += 1
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        if error_rate > 0 and random.random() < error_rate:
+            fake.state.stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": "falha simulada"})
+        return {"id": str(uuid.uuid4())}
+
+    @fake.post("/v1/webhooks/batch")
+    async def batch(request: Request):
+        fake.state.stats["requests"] += 1
+        if api_key is not None and request.headers.get("authorization") != f"Bearer {api_key}":
+            return JSONResponse(status_code=401, content={"error": "chave de API inválida"})
+        events = (await request.json())["events"]
+        fake.state.stats["batches"] += 1
+        fake.state.stats["batch_items"] += len(events)
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        results = []
+        for event in events:
+            if error_rate > 0 and random.random() < error_rate:
+                fake.state.stats["errors"] += 1
+                results.append({"ref": event["ref"], "status": 500, "error": "falha simulada"})
+            else:
+                results.append({"ref": event["ref"], "status": 200, "id": str(uuid.uuid4())})
+        return {"results": results}
+
+    @fake.get("/__stats")
+    async def stats():
+        return fake.state.stats
+
+    return fake
+
+
+# --- Slack ---
+
+def create_fake_slack_app() -> FastAPI:
+    """Endpoint `chat.postMessage` falso; aponte SLACK_API_BASE_URL para ele."""
+    fake = FastAPI()
+    fake.state.stats = {"messages": 0}
+
+    @fake.post("/chat.postMessage")
+    async def post_message():
+        fake.state.stats["messages"] += 1
+        return {"ok": True, "channel": "C000", "ts": f"{time.time():.6f}"}
+
+    @fake.get("/__stats")
+    async def stats():
+        return fake.state.stats
+
+    return fake
+
+
+# --- Servidor em thread ---
+
+def find_free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """
+    Roda um app ASGI com uvicorn em uma thread com event loop próprio. Os fakes ficam
+    fora do loop da aplicação, então chamadas síncronas (ex: Slack) não causam deadlock.
+    """
+
+    def __init__(self, app, host: str = "127.0.0.1", port: Optional[int] = None):
+        self.host = host
+        self.port = port or find_free_port(host)
+        self.server = uvicorn.Server(uvicorn.Config(app, host=self.host, port=self.port, log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "BackgroundServer":
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Servidor falso não iniciou em {self.url}")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
@@ -0,0 +1,294 @@
+# benchmarks/load_test.py
+
+"""
+Benchmark de carga ponta a ponta de /notifications/scorm-comunitive.
+
+Sobe os fakes locais (Comunitive, Slack e GCS em memória), inicia a aplicação em processo
+(httpx.ASGITransport), sob uvicorn ou sob gunicorn (gunicorn.conf.py, N workers) em um
+subprocesso, e dispara postbacks realistas com concorrência crescente. Para cada nível
+reporta vazão, latências p50/p95/p99 e o atraso máximo do event loop da aplicação.
+
+Exemplos:
+    python -m benchmarks.load_test --mode inprocess --concurrency 1,8,32 --requests 500
+    python -m benchmarks.load_test --mode uvicorn --output bench.json --baseline baseline.json
+    python -m benchmarks.load_test --mode gunicorn --workers 1,2,4 --concurrency 64
+    python -m benchmarks.load_test --comunitive-notifier batch --concurrency 128
+
+Com --baseline, o processo termina com código 1 se a vazão cair ou o p99 subir mais que
+--max-regression (fração) em qualquer nível de concorrência (e número de workers).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.env import BENCH_DEFAULT_ENV
+from benchmarks.fakes import BackgroundServer, create_fake_comunitive_app, create_fake_slack_app, find_free_port
+from benchmarks.payloads import generate_postbacks
+
+POSTBACK_PATH = "/notifications/scorm-comunitive"
+LOOP_LAG_PATH = "/__bench/loop-lag"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def sample_loop_lag(client: httpx.AsyncClient, stop: asyncio.Event, interval: float = 0.25) -> float:
+    """Consulta periodicamente o atraso do event loop da aplicação e retorna o maior valor visto."""
+    max_lag = 0.0
+    while not stop.is_set():
+        try:
+            response = await client.get(LOOP_LAG_PATH)
+            max_lag = max(max_lag, response.json()["recent_max_ms"])
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+    return max_lag
+
+
+async def run_level(client: httpx.AsyncClient, payloads: List[bytes], concurrency: int, total_requests: int) -> Dict:
+    latencies: List[float] = []
+    status_counts: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total_requests:
+            body = payloads[next_index % len(payloads)]
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post(POSTBACK_PATH, content=body, headers={"Content-Type": "application/json"})
+                key = str(response.status_code)
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            status_counts[key] = status_counts.get(key, 0) + 1
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(sample_loop_lag(client, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    loop_lag_max_ms = await lag_task
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+        "status_counts": status_counts,
+        "loop_lag_max_ms": round(loop_lag_max_ms, 2),
+    }
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Retorna a lista de regressões (vazão menor ou p99 maior que a tolerância) por nível."""
+    regressions = []
+    baseline_levels = {(level.get("workers", 1), level["concurrency"]): level for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        reference = baseline_levels.get((level["workers"], level["concurrency"]))
+        if reference is None:
+            continue
+        label = f"w={level['workers']} c={level['concurrency']}"
+        if level["throughput_rps"] < reference["throughput_rps"] * (1 - max_regression):
+            regressions.append(
+                f"{label}: vazão {level['throughput_rps']} req/s < baseline {reference['throughput_rps']} req/s"
+            )
+        if level["latency_ms"]["p99"] > reference["latency_ms"]["p99"] * (1 + max_regression):
+            regressions.append(
+                f"{label}: p99 {level['latency_ms']['p99']}ms > baseline {reference['latency_ms']['p99']}ms"
+            )
+    return regressions
+
+
+def print_report(results: Dict) -> None:
+    print(f"\nModo: {results['config']['mode']} | payloads: {results['config']['distinct_payloads']}")
+    print(f"{'workers':>7} {'conc':>6} {'req':>7} {'req/s':>10} {'p50':>9} {'p95':>9} {'p99':>9} {'lag máx':>9}  status")
+    for level in results["levels"]:
+        latency = level["latency_ms"]
+        print(
+            f"{level['workers']:>7} {level['concurrency']:>6} {level['requests']:>7} {level['throughput_rps']:>10.1f} "
+            f"{latency['p50']:>8.1f}ms {latency['p95']:>7.1f}ms {latency['p99']:>7.1f}ms "
+            f"{level['loop_lag_max_ms']:>7.1f}ms  {level['status_counts']}"
+        )
+
+
+def start_server_process(mode: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    if mode == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "benchmarks.bench_app:app",
+                   "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "benchmarks.bench_app:app",
+                   "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("A aplicação não respondeu dentro do tempo limite.")
+        await asyncio.sleep(0.1)
+
+
+async def run_benchmark(args: argparse.Namespace, env: Dict[str, str], workers: int) -> List[Dict]:
+    payloads = [
+        json.dumps(p).encode("utf-8")
+        for p in generate_postbacks(
+            args.distinct_payloads,
+            mapped_courses=args.mapped_courses,
+            completed_ratio=args.completed_ratio,
+            unmapped_ratio=args.unmapped_ratio,
+            duplicate_ratio=args.duplicate_ratio,
+        )
+    ]
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 10, max_keepalive_connections=max(args.concurrency) + 10)
+    levels = []
+    process: Optional[subprocess.Popen] = None
+
+    if args.mode == "inprocess":
+        os.environ.update(env)
+        from benchmarks.bench_app import app
+
+        transport = httpx.ASGITransport(app=app)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=args.timeout)
+    else:
+        port = find_free_port()
+        process = start_server_process(args.mode, port, workers, {**BENCH_DEFAULT_ENV, **os.environ, **env})
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout)
+        lifespan = None
+
+    try:
+        await wait_until_up(client)
+        await run_level(client, payloads, concurrency=min(args.concurrency), total_requests=args.warmup)
+        for concurrency in args.concurrency:
+            level = await run_level(client, payloads, concurrency, args.requests)
+            levels.append({"workers": workers, **level})
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    return levels
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de carga do webhook SCORM -> Comunitive")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "gunicorn"], default="inprocess")
+    parser.add_argument("--workers", type=lambda v: [int(w) for w in v.split(",")], default=[1],
+                        help="Números de workers a comparar (apenas --mode gunicorn)")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=1000, help="Requisições por nível de concorrência")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--distinct-payloads", type=int, default=2000)
+    parser.add_argument("--mapped-courses", type=int, default=20)
+    parser.add_argument("--completed-ratio", type=float, default=0.3)
+    parser.add_argument("--unmapped-ratio", type=float, default=0.05)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--comunitive-latency-ms", type=float, default=50.0)
+    parser.add_argument("--comunitive-error-rate", type=float, default=0.0)
+    parser.add_argument("--comunitive-notifier", choices=["webhook", "batch"], default="webhook",
+                        help="COMUNITIVE_NOTIFIER da aplicação: um POST por conclusão ou lotes na API falsa")
+    parser.add_argument("--gcs-latency-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default=os.path.join(tempfile.gettempdir(), "bench_output.json"),
+                        help="Arquivo JSON com os resultados (padrão: diretório temporário, fora do repositório)")
+    parser.add_argument("--baseline", help="Resultados anteriores para comparação")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    fake_comunitive = create_fake_comunitive_app(args.comunitive_latency_ms, args.comunitive_error_rate, api_key=BENCH_DEFAULT_ENV["COMUNITIVE_API_KEY"])
+    comunitive = BackgroundServer(fake_comunitive).start()
+    slack = BackgroundServer(create_fake_slack_app()).start()
+    env = {
+        "BENCH_COMUNITIVE_URL": comunitive.url,
+        "COMUNITIVE_NOTIFIER": args.comunitive_notifier,
+        "COMUNITIVE_API_URL": comunitive.url,
+        "BENCH_MAPPED_COURSES": str(args.mapped_courses),
+        "BENCH_GCS_LATENCY_MS": str(args.gcs_latency_ms),
+        "SLACK_API_BASE_URL": f"{slack.url}/",
+    }
+
+    worker_counts = args.workers if args.mode == "gunicorn" else [1]
+    results = {"levels": []}
+    try:
+        for workers in worker_counts:
+            results["levels"].extend(asyncio.run(run_benchmark(args, env, workers)))
+    finally:
+        comunitive.stop()
+        slack.stop()
+    results["comunitive"] = dict(fake_comunitive.state.stats) # Chamadas recebidas pela Comunitive falsa
+
+    results["config"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+    }
+    results["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+    print_report(results)
+    print(f"\nChamadas à Comunitive falsa ({args.comunitive_notifier}): {results['comunitive']}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados salvos em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\nREGRESSÕES em relação ao baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\nSem regressões em relação ao baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# benchmarks/payloads.py
+
+"""Geração de payloads `ScormRegistrationPostback` realistas para os benchmarks."""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+
+def mapped_course_ids(count: int) -> List[str]:
+    return [f"course-{i}" for i in range(count)]
+
+
+def build_postback(registration_id: str,
+                   course_id: str,
+                   learner_id: str,
+                   completed: bool,
+                   rng: random.Random) -> Dict:
+    """Monta um postback no formato enviado pelo SCORM Cloud (ApiRollupRegistrationFormat=course)."""
+    now = datetime.now(timezone.utc)
+    first_access = now - timedelta(days=rng.randint(0, 30), minutes=rng.randint(1, 600))
+    seconds_tracked = float(rng.randint(60, 7200))
+    completion = "COMPLETED" if completed else "INCOMPLETE"
+    success = rng.choice(["PASSED", "FAILED"]) if completed else "UNKNOWN"
+    scaled = round(rng.uniform(0.4, 1.0), 2) if completed else None
+
+    return {
+        "id": registration_id,
+        "instance": 0,
+        "xapiRegistrationId": f"{registration_id}-xapi",
+        "updated": now.isoformat(),
+        "registrationCompletion": completion,
+        "registrationSuccess": success,
+        "totalSecondsTracked": seconds_tracked,
+        "firstAccessDate": first_access.isoformat(),
+        "lastAccessDate": now.isoformat(),
+        "completedDate": now.isoformat() if completed else None,
+        "createdDate": first_access.isoformat(),
+        "course": {"id": course_id, "title": f"Curso {course_id}", "version": rng.randint(0, 3)},
+        "learner": {"id": learner_id, "firstName": "Aluno", "lastName": learner_id.split("@")[0]},
+        "activityDetails": {
+            "id": f"{course_id}-root",
+            "title": f"Curso {course_id}",
+            "attempts": rng.randint(1, 3),
+            "activityCompletion": completion,
+            "activitySuccess": success,
+            "timeTracked": f"{int(seconds_tracked // 3600):04d}:{int(seconds_tracked % 3600 // 60):02d}:00",
+            "completionAmount": {"scaled": 1.0 if completed else round(rng.uniform(0, 0.9), 2)},
+            "suspended": not completed,
+            "staticProperties": {
+                "completionThreshold": "0.8",
+                "launchData": "",
+                "maxTimeAllowed": "",
+                "scaledPassingScore": 0.7,
+                "scaledPassingScoreUsed": True,
+                "timeLimitAction": "Undefined",
+            },
+            "activityProgress": {"score": {"scaled": scaled}} if scaled is not None else None,
+        },
+        "registrationCompletionAmount": 1.0 if completed else round(rng.uniform(0, 0.9), 2),
+        "tags": rng.sample(["obrigatorio", "onboarding", "compliance", "lideranca"], k=rng.randint(0, 2)),
+    }
+
+
+def generate_postbacks(count: int,
+                       mapped_courses: int = 20,
+                       completed_ratio: float = 0.3,
+                       unmapped_ratio: float = 0.05,
+                       duplicate_ratio: float = 0.05,
+                       learners: int = 5000,
+                       seed: int = 42) -> List[Dict]:
+    """
+    Gera `count` postbacks com a mistura observada em produção: maioria de atualizações
+    intermediárias, uma fração de conclusões, cursos sem mapeamento e reenvios duplicados.
+    """
+    rng = random.Random(seed)
+    courses = mapped_course_ids(mapped_courses)
+    postbacks: List[Dict] = []
+
+    for i in range(count):
+        if postbacks and rng.random() < duplicate_ratio:
+            postbacks.append(rng.choice(postbacks))
+            continue
+
+        course_id = f"unmapped-{rng.randint(0, 9)}" if rng.random() < unmapped_ratio else rng.choice(courses)
+        learner_id = f"aluno{rng.randint(0, learners - 1)}@example.com"
+        postbacks.append(build_postback(f"reg-{i}", course_id, learner_id, rng.random() < completed_ratio, rng))
+
+    return postbacks
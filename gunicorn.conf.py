@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+
+"""
+Configuração do servidor de produção: `gunicorn -c gunicorn.conf.py app.main:app`.
+
+- WEB_CONCURRENCY workers (padrão: número de CPUs) com uvloop/httptools;
+- preload_app: a aplicação e o cache de mapeamentos são carregados antes do fork;
+- desligamento coordenado: os workers têm DRAIN_TIMEOUT_SECONDS para concluir os postbacks
+  em andamento (os interrompidos são persistidos em DRAIN_SPOOL_DIR) antes do SIGKILL.
+"""
+
+import multiprocessing
+import os
+
+from app.settings import settings
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+worker_class = "app.api.server.workers.ProductionUvicornWorker"
+preload_app = True
+keepalive = 5
+# Margem além do prazo de drenagem para persistir o que foi interrompido e rodar o lifespan
+graceful_timeout = int(settings.DRAIN_TIMEOUT_SECONDS) + 2
+
+
+def when_ready(server):
+    from app.api.server.prefork import warm_shared_state
+
+    warm_shared_state()
+
+
+def post_fork(server, worker):
+    from app.api.server.prefork import reinitialize_after_fork
+
+    reinitialize_after_fork()
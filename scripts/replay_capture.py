@@ -0,0 +1,166 @@
+# scripts/replay_capture.py
+
+"""
+Reproduz postbacks capturados (CAPTURE_ENABLED=true) contra uma instância alvo,
+preservando os intervalos entre chegadas.
+
+Exemplos:
+    python scripts/replay_capture.py /tmp/webhook-capture/*.jsonl.gz --target http://localhost:8080
+    python scripts/replay_capture.py captures/ --target http://staging:8080 --speed 10
+    python scripts/replay_capture.py captures/ --target http://staging:8080 --speed max --max-in-flight 64
+
+--speed 1 reproduz em tempo real, --speed N comprime os intervalos N vezes e --speed max
+envia o mais rápido possível (limitado por --max-in-flight). Cada worker grava seus próprios
+arquivos (capture-<ts>-<pid>), então os arquivos são intercalados pelo horário de chegada,
+reconstruindo a linha do tempo e a concorrência originais. A leitura é em streaming, então
+capturas grandes não precisam caber em memória.
+"""
+
+import argparse
+import asyncio
+import glob
+import gzip
+import heapq
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_PATH = "/notifications/scorm-comunitive"
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    files: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, "capture-*.jsonl.gz")))
+        else:
+            files.extend(glob.glob(item))
+    return sorted(set(files))
+
+
+def iter_file(path: str) -> Iterator[Tuple[float, bytes]]:
+    """Produz (horário de chegada, corpo JSON) de um arquivo, na ordem em que foi gravado."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            yield entry["ts"], json.dumps(entry["body"], ensure_ascii=False).encode("utf-8")
+
+
+def iter_capture(files: List[str]) -> Iterator[Tuple[float, bytes]]:
+    """
+    Intercala os arquivos (um por worker e período) pelo horário de chegada. Cada arquivo já
+    está em ordem, então basta um merge em streaming, com um registro aberto por arquivo.
+    """
+    return heapq.merge(*(iter_file(path) for path in files), key=lambda entry: entry[0])
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))]
+
+
+async def replay(files: List[str], target: str, path: str, speed: Optional[float], max_in_flight: int,
+                 timeout: float, limit: Optional[int]) -> Dict:
+    semaphore = asyncio.Semaphore(max_in_flight)
+    latencies: List[float] = []
+    status_counts: Dict[str, int] = {}
+    max_schedule_lag = 0.0
+    tasks = set()
+    sent = 0
+
+    async def send(client: httpx.AsyncClient, body: bytes):
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, content=body, headers={"Content-Type": "application/json"})
+            key = str(response.status_code)
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        finally:
+            semaphore.release()
+        latencies.append((time.perf_counter() - start) * 1000)
+        status_counts[key] = status_counts.get(key, 0) + 1
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        first_ts: Optional[float] = None
+        started = time.monotonic()
+
+        for arrived_at, body in iter_capture(files):
+            if limit is not None and sent >= limit:
+                break
+            if first_ts is None:
+                first_ts = arrived_at
+
+            if speed is not None:
+                due = started + (arrived_at - first_ts) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_schedule_lag = max(max_schedule_lag, -delay)
+
+            await semaphore.acquire()
+            task = asyncio.create_task(send(client, body))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "sent": sent,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(sent / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+        },
+        "status_counts": status_counts,
+        "max_schedule_lag_s": round(max_schedule_lag, 3),
+    }
+
+
+def parse_speed(value: str) -> Optional[float]:
+    if value.lower() == "max":
+        return None
+    speed = float(value.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("--speed deve ser maior que zero ou 'max'")
+    return speed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay de postbacks SCORM capturados")
+    parser.add_argument("inputs", nargs="+", help="Arquivos capture-*.jsonl.gz, globs ou diretórios")
+    parser.add_argument("--target", required=True, help="URL base da instância alvo")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1, N (ex: 10 ou 10x) ou max")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--limit", type=int, help="Número máximo de postbacks a enviar")
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("Nenhum arquivo de captura encontrado.", file=sys.stderr)
+        return 1
+
+    print(f"Reproduzindo {len(files)} arquivo(s) contra {args.target}{args.path} (velocidade: {args.speed or 'max'})")
+    summary = asyncio.run(replay(files, args.target, args.path, args.speed, args.max_in_flight, args.timeout, args.limit))
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())